@@ -0,0 +1,120 @@
+import asyncio
+import queue
+import threading
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+
+
+class AsyncDeviceEngine:
+    """
+    Обслуживает очереди команд всех TuyaDevice корутинами на одном
+    (или нескольких) asyncio event loop вместо отдельного потока на устройство.
+
+    Семантика очереди устройства не меняется: приоритеты, TTL и порядок
+    выполнения остаются за ``TuyaDevice._enqueue``/``_run_task``. На каждое
+    устройство приходится одна корутина, поэтому команды одного устройства
+    выполняются строго последовательно. tinytuya блокирующая, поэтому сами
+    вызовы транспорта уходят в небольшой общий пул ``io_threads``.
+    """
+
+    def __init__(self, logger, loops: int = 1, io_threads: int = 8):
+        self._logger = logger
+        self._loops: list[asyncio.AbstractEventLoop] = []
+        self._threads: list[threading.Thread] = []
+        self._executor = ThreadPoolExecutor(
+            max_workers=max(1, io_threads), thread_name_prefix="TuyaEngine-io"
+        )
+        # dev_id -> (loop, wakeup event)
+        self._consumers: dict[str, tuple[asyncio.AbstractEventLoop, asyncio.Event]] = {}
+        self._lock = threading.Lock()
+
+        for idx in range(max(1, loops)):
+            loop = asyncio.new_event_loop()
+            th = threading.Thread(
+                target=self._run_loop, args=(loop,), daemon=True, name=f"TuyaEngine-loop-{idx}"
+            )
+            th.start()
+            self._loops.append(loop)
+            self._threads.append(th)
+        self._logger.info(
+            f"Asyncio device engine started: {len(self._loops)} loop(s), {io_threads} I/O thread(s)"
+        )
+
+    # ------------------------------------------------------------------ #
+    # API used by TuyaDevice                                             #
+    # ------------------------------------------------------------------ #
+    def attach(self, device):
+        loop = self._loops[zlib.crc32(device.dev_id.encode()) % len(self._loops)]
+        wakeup = asyncio.Event()
+        with self._lock:
+            self._consumers[device.dev_id] = (loop, wakeup)
+        loop.call_soon_threadsafe(self._spawn, device, wakeup)
+
+    def detach(self, device):
+        with self._lock:
+            entry = self._consumers.pop(device.dev_id, None)
+        if entry:
+            loop, wakeup = entry
+            # consumer sees the stop flag after wakeup and exits by itself
+            self._call_soon(loop, wakeup.set)
+
+    def notify(self, device):
+        with self._lock:
+            entry = self._consumers.get(device.dev_id)
+        if entry:
+            loop, wakeup = entry
+            self._call_soon(loop, wakeup.set)
+
+    def stop(self):
+        for loop in self._loops:
+            self._call_soon(loop, loop.stop)
+        for th in self._threads:
+            th.join(timeout=1.0)
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        self._logger.debug("Asyncio device engine stopped")
+
+    # ------------------------------------------------------------------ #
+    # Internals                                                          #
+    # ------------------------------------------------------------------ #
+    @staticmethod
+    def _run_loop(loop):
+        asyncio.set_event_loop(loop)
+        try:
+            loop.run_forever()
+        finally:
+            pending = asyncio.all_tasks(loop)
+            for task in pending:
+                task.cancel()
+            loop.run_until_complete(asyncio.gather(*pending, return_exceptions=True))
+            loop.close()
+
+    @staticmethod
+    def _call_soon(loop, fn):
+        try:
+            loop.call_soon_threadsafe(fn)
+        except RuntimeError:
+            pass  # loop already closed on shutdown
+
+    def _spawn(self, device, wakeup):
+        asyncio.get_running_loop().create_task(
+            self._consume(device, wakeup), name=f"TuyaDevice-{device.dev_id}"
+        )
+        # tasks may have been queued before the consumer existed
+        wakeup.set()
+
+    async def _consume(self, device, wakeup: asyncio.Event):
+        loop = asyncio.get_running_loop()
+        while not device._stop_worker_flag.is_set():
+            await wakeup.wait()
+            wakeup.clear()
+            while not device._stop_worker_flag.is_set():
+                try:
+                    task = device._cmd_queue.get_nowait()
+                except queue.Empty:
+                    break
+                if device._drop_if_expired(task):
+                    continue
+                try:
+                    await loop.run_in_executor(self._executor, device._run_task, task)
+                except Exception as exc:
+                    self._logger.error(f"Engine error for {device.dev_id}: {exc}")
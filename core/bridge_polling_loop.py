@@ -10,6 +10,7 @@ import concurrent.futures
 
 from core.tuya import tuya_constants as const
 from core.mqtt_client_wrapper import MqttModule
+from core.mqtt_publish_policy import PublishPolicyTable
 from core.utility_functions import *
 
 from extensions.homie.common.homie_device_model import HomieDevice
@@ -23,20 +24,61 @@ from core.settings_loader import load_settings
 from core.logger_setup import configure_logger 
 from extensions.metrics.metrics_collection_extension import Extension as MetricsExtension
 from core.device_repository import DeviceStore
+from core.device_registry_backend import make_registry_backend
+from core.async_device_engine import AsyncDeviceEngine
+from core.pooled_device_engine import PooledDeviceEngine
+from core.poll_scheduler import PollScheduler
+from core.device_push_listener import PushListener
+from core.circuit_breaker import DeviceBreakers, BreakerState
+from core.status_publisher import StatusPublisher, AggregateStatusPublisher
 from core.signal_manager import SignalManager
 from core.tuya.cloud.tuya_openapi_rest_client import CloudAPI
+from core.tuya.cloud.cloud_metadata_cache import CloudMetadataCache
 from core.tuya.discovery.tuya_udp_device_scanner import Scanner
+from core.tuya.discovery.tuya_udp_discovery_listener import DiscoveryListener
 #------------------------------------
 
 
 class Tuya2MqttBridge:
+    # how often the poll scheduler picks up added/removed devices (seconds)
+    _SCHEDULER_SYNC_PERIOD = 1.0
+    # how often late/coalesced polls are reported (seconds)
+    _OVERRUN_REPORT_PERIOD = 60.0
+
     def __init__(self):
         self._logger = configure_logger()
         # Identifier used in MQTT topics
         self.service_id = const.SERVICE_ID
         # self._config = load_settings("/home/tsmolyanin/wk/ttmp/tuya2mqtt/settings/config.toml")
         self._config = load_settings()
-        self._device_store = DeviceStore(self._logger)
+        self._engine = self._init_device_engine()
+        push_cfg = self._config.get("push", {})
+        self._poll_scheduler = PollScheduler.from_config(
+            self._config.get("polling", {}),
+            const.POLL_INTERVAL,
+            push_interval=push_cfg.get("consistency_interval", 300.0),
+        )
+        self._breakers = DeviceBreakers.from_config(self._config.get("breaker", {}))
+
+        # metrics observe device queues, so they are created before devices
+        metrics_cfg = self._config.get("extensions", {}).get("metrics", {})
+        if metrics_cfg.get("enabled", False):
+            self._metrics = MetricsExtension()
+        else:
+            self._metrics = None
+
+        store_cfg = self._config.get("store", {})
+        self._device_store = DeviceStore(
+            self._logger,
+            engine=self._engine,
+            on_command=self._poll_scheduler.on_command,
+            observer=self._metrics,
+            persist_delay=store_cfg.get("persist_delay", 1.0),
+            backend=make_registry_backend(
+                store_cfg, const.DEVICES_CONF_FILE, const.LOCAL_SCAN_FILE, self._logger,
+                sqlite_path=const.DEVICES_DB_FILE,
+            ),
+        )
         SignalManager(self._graceful_shutdown, self._logger).install()
 
         self._state = const.BridgeState.OFFLINE
@@ -44,20 +86,45 @@ class Tuya2MqttBridge:
         self._state_lock = threading.Lock() # to change flag frome diff threads
 
         self._mqtt = self._init_mqtt_module()
-        tuya_devices_conf = self._device_store.read(const.DEVICES_CONF_FILE)
-
-        if tuya_devices_conf:
-            self._device_store.load_devices(tuya_devices_conf)
-        
+        status_cfg = self._config.get("status", {})
+        self._status_publisher = StatusPublisher.from_config(
+            self._mqtt.publish, self.service_id, status_cfg
+        )
+        aggregate_cfg = status_cfg.get("aggregate", {})
+        if aggregate_cfg.get("enabled", False):
+            self._status_aggregate = AggregateStatusPublisher.from_config(
+                self._mqtt.publish, self.service_id, self._logger, aggregate_cfg
+            )
+        else:
+            self._status_aggregate = None
+        self._device_store.open()
         self._device_store.make_hum_name_to_id()
 
+        self._push_listener = PushListener(
+            self._device_store,
+            self._handle_devices_status,
+            self._logger,
+            heartbeat_interval=push_cfg.get("heartbeat_interval", 10.0),
+        )
+
+        discovery_cfg = self._config.get("discovery", {})
+        if discovery_cfg.get("enabled", True):
+            self._discovery = DiscoveryListener(self._logger, on_seen=self._on_device_announced)
+        else:
+            self._discovery = None
+
         ext_cfg = self._config.get("extensions", {})
         homie_cfg = ext_cfg.get("homie", {})
         lifecycle_cfg = homie_cfg.get("lifecycle", {})
         if lifecycle_cfg.get("enabled", False):
             self._homie_converter = TuyaHomieConverter(TemplateManager("extensions/homie/common/templates/"))
             self._sync = HomieLifecycleExtension(
-                self._mqtt, self._device_store, self._homie_converter, logger=self._logger
+                self._mqtt,
+                self._device_store,
+                self._homie_converter,
+                logger=self._logger,
+                teardown_rate=lifecycle_cfg.get("teardown_rate", 100.0),
+                teardown_burst=lifecycle_cfg.get("teardown_burst", 20),
             )
         else:
             self._homie_converter = None
@@ -71,27 +138,32 @@ class Tuya2MqttBridge:
         else:
             self._broadcast = None
         
-        self._tuya_cloud = CloudAPI(self._logger)
+        cloud_cfg = self._config.get("cloud", {})
+        self._tuya_cloud = CloudAPI(
+            self._logger,
+            cache=CloudMetadataCache.from_config(cloud_cfg, self._logger),
+            max_concurrency=cloud_cfg.get("max_concurrency", 4),
+        )
 
         if self._tuya_cloud:
             self._set_state(const.BridgeState.ONLINE)
         else:
             self._set_state(const.BridgeState.LAN_ONLY)
 
-        self._scanner = Scanner(self._mqtt, self._tuya_cloud, self._logger, self._device_store)
+        self._scanner = Scanner(
+            self._mqtt, self._tuya_cloud, self._logger, self._device_store,
+            cloud_batch_size=cloud_cfg.get("scan_batch_size", 20),
+            cloud_batch_delay=cloud_cfg.get("scan_batch_delay", 0.5),
+            discovery=self._discovery,
+            discovery_max_age=discovery_cfg.get("max_age", 60.0),
+            discovery_warmup=discovery_cfg.get("warmup", 12.0),
+            fresh_window=discovery_cfg.get("fresh_window", 5.0),
+        )
 
         self._register_mqtt_handlers()
         self._shutdown_event = threading.Event()
         self._daemon_thread_pool = concurrent.futures.ThreadPoolExecutor(max_workers=4)
 
-        metrics_cfg = ext_cfg.get("metrics", {})
-        if metrics_cfg.get("enabled", False):
-            self._metrics = MetricsExtension()
-        else:
-            self._metrics = None
-
-        self._test_all_devs_statuses = {}
-
     # ------------------------------------------------------------------
     # Homie 5 helpers
     # ------------------------------------------------------------------
@@ -118,7 +190,33 @@ class Tuya2MqttBridge:
             except Exception as exc:
                 self._logger.error(f"Failed to init Homie for {dev_id}: {exc}")
 
+    def _init_device_engine(self):
+        """
+        thread  - each TuyaDevice owns a worker thread (default)
+        asyncio - all device queues are served by coroutines on shared event loops
+        pool    - all device queues are served by a fixed pool of worker threads
+        """
+        engine_cfg = self._config.get("engine", {})
+        mode = engine_cfg.get("mode", "thread")
+        match mode:
+            case "thread":
+                return None
+            case "asyncio":
+                return AsyncDeviceEngine(
+                    self._logger,
+                    loops=engine_cfg.get("loops", 1),
+                    io_threads=engine_cfg.get("io_threads", 8),
+                )
+            case "pool":
+                return PooledDeviceEngine(self._logger, workers=engine_cfg.get("pool_size", 8))
+            case _:
+                self._logger.warning(f"Unknown engine mode '{mode}', fallback to 'thread'")
+                return None
+
     def _init_mqtt_module(self):
+        policy = PublishPolicyTable.from_config(
+            self._config.get("mqtt", {}).get("policy", {}), self.service_id
+        )
         if const.MQTT_USERNAME and const.MQTT_PASSWORD:
             mqtt_mod = MqttModule(
                 input_topics={},
@@ -127,7 +225,8 @@ class Tuya2MqttBridge:
                 mqtt_broker_ip=const.MQTT_BROKER_HOST,
                 mqtt_broker_port=const.MQTT_BROKER_PORT,
                 username=const.MQTT_USERNAME,
-                user_passwd=const.MQTT_PASSWORD
+                user_passwd=const.MQTT_PASSWORD,
+                publish_policy=policy,
                 )
         else:
             mqtt_mod = MqttModule(
@@ -135,7 +234,8 @@ class Tuya2MqttBridge:
                 module_name="Tuya2MQTT",
                 logger=self._logger,
                 mqtt_broker_ip=const.MQTT_BROKER_HOST,
-                mqtt_broker_port=const.MQTT_BROKER_PORT
+                mqtt_broker_port=const.MQTT_BROKER_PORT,
+                publish_policy=policy,
             )
         return mqtt_mod
     
@@ -167,6 +267,11 @@ class Tuya2MqttBridge:
 
         self._poll_thread = threading.Thread(target=self._poll_loop, daemon=True)
         self._poll_thread.start()
+        self._push_listener.start()
+        if self._discovery:
+            self._discovery.start()
+        if self._status_aggregate:
+            self._status_aggregate.start()
 
         self._publish_bridge_status()
 
@@ -226,28 +331,30 @@ class Tuya2MqttBridge:
     @require_state(const.BridgeState.LAN_ONLY, const.BridgeState.ONLINE)
     def on_scan_gen_command(self, *args):
         """
-        payload: ""
+        payload: "" | {"scan_time": <s>, "fresh": true}
         """
         self._logger.info("Received SCAN request via MQTT.")
         _, scan_time_obj = args[0], json.loads(args[1])
         if not scan_time_obj:
-            scan_time = None
+            scan_time, fresh = None, False
         else:
-            scan_time = scan_time_obj["scan_time"]
-        self._daemon_thread_pool.submit(self._scanner.scan_gen_local_network, scan_time)
+            scan_time = scan_time_obj.get("scan_time")
+            fresh = bool(scan_time_obj.get("fresh", False))
+        self._daemon_thread_pool.submit(self._scanner.scan_gen_local_network, scan_time, fresh)
     
     @require_state(const.BridgeState.LAN_ONLY, const.BridgeState.ONLINE)
     def on_scan_gen_all_command(self, *args):
         """
-        payload: ""
+        payload: "" | {"scan_time": <s>, "fresh": true}
         """
         self._logger.info("Received SCAN request via MQTT.")
         _, scan_time_obj = args[0], json.loads(args[1])
         if not scan_time_obj:
-            scan_time = None
+            scan_time, fresh = None, False
         else:
-            scan_time = scan_time_obj["scan_time"]
-        self._daemon_thread_pool.submit(self._scanner.scan_gen_all_local_network, scan_time)
+            scan_time = scan_time_obj.get("scan_time")
+            fresh = bool(scan_time_obj.get("fresh", False))
+        self._daemon_thread_pool.submit(self._scanner.scan_gen_all_local_network, scan_time, fresh)
     
     @require_state(const.BridgeState.ONLINE)
     def on_add_devices(self, *args):
@@ -324,13 +431,11 @@ class Tuya2MqttBridge:
             self._mqtt.mqtt_publish_value_to_topic(response_topic, [])
             raise ValueError("No one Tuya Device ID was given")
         
-        device_id_list = ", ".join(tuya_devices_id_list)
-        self._tuya_cloud.set_device_id(device_id_list)
-
         tuya_cloud_answer = {}
         self._logger.info("Calling cloud.getdevices(include_map=True)...")
         try:
-            tuya_cloud_answer =  self._tuya_cloud.tuya_cloud_request()
+            # all requested devices or the error: a stale cache must not drop some silently
+            tuya_cloud_answer = self._tuya_cloud.get_devices(tuya_devices_id_list, partial=False)
             if "Error" in tuya_cloud_answer:
                 error = tuya_cloud_answer["Error"]
                 payload = tuya_cloud_answer["Payload"]
@@ -346,7 +451,7 @@ class Tuya2MqttBridge:
             )
             if not isinstance(new_devices_conf, list):
                 new_devices_conf = []
-            self._device_store.write(const.DEVICES_CONF_FILE, joined_devices_config)
+            self._device_store.replace_records(joined_devices_config)
             self._device_store.load_devices(joined_devices_config)
             self._device_store.make_hum_name_to_id()
             if self._sync:
@@ -378,15 +483,11 @@ class Tuya2MqttBridge:
                         tuya_dev.stop_worker()
                     
                     self._device_store.remove_device(dev_id)
+                    self._breakers.forget(dev_id)
+                    self._status_publisher.forget(dev_id)
+                    if self._status_aggregate:
+                        self._status_aggregate.forget(dev_id)
                     removed_devices.append(dev_id)
-
-                    devs_conf_tmp = []
-                    devs_conf = self._device_store.read(const.DEVICES_CONF_FILE)
-                    for dev in devs_conf:
-                        if dev["id"] != dev_id:
-                            devs_conf_tmp.append(dev)
-                    
-                    self._device_store.write(const.DEVICES_CONF_FILE, devs_conf_tmp)
             
             self._logger.info(f"Removed device {removed_devices}")
             if self._sync:
@@ -413,14 +514,8 @@ class Tuya2MqttBridge:
             self._device_store.get_devices(dev_id).friendly_name = friendly_name
             self._device_store.set_id_to_friendly_name(friendly_name, dev_id)
 
-            devs_conf_tmp = []
-            devs_conf = self._device_store.read(const.DEVICES_CONF_FILE)
-            for dev in devs_conf:
-                if dev["id"] == dev_id:
-                    dev["friendly_name"] = friendly_name
-                devs_conf_tmp.append(dev)
-            self._device_store.load_devices(devs_conf_tmp)
-            self._device_store.write(const.DEVICES_CONF_FILE, devs_conf_tmp)
+            self._device_store.update_record(dev_id, friendly_name=friendly_name)
+            self._device_store.load_devices(self._device_store.records())
 
             if self._sync:
                 self._sync.on_device_renamed(dev_id, friendly_name)
@@ -435,28 +530,26 @@ class Tuya2MqttBridge:
         response_topic = "tuya2mqtt/bridge/response/update_key"
 
         _, tuya_device_id = args[0], json.loads(args[1])["device_id"]
-        self._tuya_cloud.set_device_id(tuya_device_id)
 
         tmp_dict = self._device_store.get_devices(tuya_device_id).to_dict()
         local_key = tmp_dict["key"]
 
         self._logger.info(f"Update local key for device {tuya_device_id}") 
         try:
-            tuya_cloud_devices = self._tuya_cloud.tuya_cloud_request()
+            # the key was rotated: the cached one is wrong by definition
+            if self._tuya_cloud.cache is not None:
+                self._tuya_cloud.cache.invalidate(tuya_device_id)
+            tuya_cloud_devices = self._tuya_cloud.get_devices(
+                [tuya_device_id], force=True, allow_stale=False
+            )
             if "Error" in tuya_cloud_devices: return
             # print(tuya_cloud_devices)
             for dev in tuya_cloud_devices:
                 if dev["id"] == tuya_device_id:
                     local_key = dev["key"]
             
-            devs_conf_tmp = []
-            devs_conf = self._device_store.read(const.DEVICES_CONF_FILE)
-            for dev in devs_conf:
-                if dev["id"] == tuya_device_id:
-                    dev["key"] = local_key
-                devs_conf_tmp.append(dev)
-            self._device_store.load_devices(devs_conf_tmp)
-            self._device_store.write(const.DEVICES_CONF_FILE, devs_conf_tmp)
+            self._device_store.update_record(tuya_device_id, key=local_key)
+            self._device_store.load_devices(self._device_store.records())
             if self._sync:
                 self._sync.on_device_key_changed(tuya_device_id)
             self._logger.info(f"Local key for device {tuya_device_id} updated with {local_key}") 
@@ -465,80 +558,132 @@ class Tuya2MqttBridge:
             self._logger.error(f"Exception calling cloud.getdevices: {e}")
             return
 
+    def _on_device_announced(self, announced, old_ip):
+        """DiscoveryListener: a device broadcast from a new address."""
+        dev_id = announced.gw_id
+        if not self._device_store.relocate_device(dev_id, announced.ip):
+            return
+        # the old address failed - probe the new one right away
+        self._breakers.forget(dev_id)
+        self._poll_scheduler.on_command(dev_id)
+
     # def _check_network(self, *args):
     #     self._set_state(_determine_net_state())
     
     def _poll_loop(self):
-        """Deamon Thread: every POLL_INTERVAL seconds send tasks."""
+        """Deamon Thread: send status poll to every device when its own poll is due."""
+        device_id = None
+        last_sync = 0.0
+        last_report = time.monotonic()
+        coalesced = 0
         while not self._shutdown_event.is_set():
             try:
-                for device_id, device_obj in self._device_store.get_devices().items():
-                    device_obj.update_status_async(self._handle_devices_status)
+                now = time.monotonic()
+                if now - last_sync >= self._SCHEDULER_SYNC_PERIOD:
+                    self._poll_scheduler.sync(self._device_store.get_devices())
+                    last_sync = now
+                for device_id in self._poll_scheduler.pop_due(now):
+                    device_obj = self._device_store.get_devices(device_id)
+                    if not device_obj:
+                        continue
+                    allowed, next_probe = self._breakers.allow(device_id, now)
+                    if not allowed:
+                        # circuit breaker is open - do not waste a worker on a dead device
+                        self._poll_scheduler.defer(device_id, next_probe)
+                        continue
+                    queued = device_obj.update_status_async(self._handle_devices_status)
+                    if not queued:
+                        coalesced += 1
                     if self._metrics:
-                        self._metrics.inc_total()
-                time.sleep(const.POLL_INTERVAL)
+                        if queued:
+                            self._metrics.inc_total()
+                        else:
+                            self._metrics.inc_coalesced()
+                if now - last_report >= self._OVERRUN_REPORT_PERIOD:
+                    self._report_poll_overruns(coalesced)
+                    last_report, coalesced = now, 0
+                self._poll_scheduler.wait(self._SCHEDULER_SYNC_PERIOD)
             except Exception as e:
                 if self._metrics:
                     self._metrics.record_error(str(type(e)))
                 self._logger.error(f"Error polling {device_id}: {e}")
+
+    def _report_poll_overruns(self, coalesced: int):
+        """
+        Poll cycle overrun: the poll thread dispatched polls more than one
+        interval late, or a device's previous poll was still in flight
+        when the next one became due.
+        """
+        late, max_lag = self._poll_scheduler.take_overruns()
+        if not (late or coalesced):
+            return
+        self._logger.warning(
+            f"Poll cycle overrun: {late} poll(s) dispatched late (max lag {max_lag:.1f}s), "
+            f"{coalesced} poll(s) still in flight at due time"
+        )
+        if self._metrics and late:
+            self._metrics.record_overruns(late)
     
     def _handle_devices_status(self, *args):
         device_id, raw_feedback, estimated_time = args
         if "Error" in raw_feedback:
+            err_code = raw_feedback.get("Err")
+            self._poll_scheduler.on_error(device_id, err_code)
+            transition = self._breakers.on_failure(device_id, err_code)
+            if transition is None and self._breakers.state(device_id) is BreakerState.OPEN:
+                # failed probe of a known dead device - nothing new to publish
+                if self._metrics:
+                    self._metrics.record_error(f"ERR_{err_code}")
+                return
             self._handle_error_answer(device_id, raw_feedback)
+            if transition:
+                self._on_breaker_changed(device_id, transition)
         else:
+            self._poll_scheduler.on_status(device_id, raw_feedback.get("dps") or {})
+            transition = self._breakers.on_success(device_id)
             human_readable_dps = self._parse_answer_from_devs(device_id, raw_feedback)
             human_readable_dps["request_status_time"] = round(estimated_time, 3)
+            if transition:
+                human_readable_dps["breaker"] = transition.value
             if estimated_time > 5:
                 if self._metrics:
                     self._metrics.inc_slow()
             self._publish_device_status(device_id, human_readable_dps)
+            if transition:
+                self._on_breaker_changed(device_id, transition)
             # print(device_id, human_readable_dps)
             # print()
 
+    def _on_breaker_changed(self, dev_id: str, state: BreakerState):
+        self._logger.info(f"Circuit breaker of {dev_id} → {state.value}")
+        if self._sync:
+            self._sync.on_device_availability(dev_id, state is BreakerState.CLOSED)
+
     def _publish_device_status(self, dev_id: str, dps: dict):
         # forward to Homie representation
         if self._sync:
             br = self._sync.device_bridges.get(dev_id)
             if br:
                 br.publish_status(dps)
-        topic = f"{const.SERVICE_ID}/devices/{dev_id}/status"
-        self._mqtt.mqtt_publish_value_to_topic(topic, json.dumps(dps))
-        """
-        @ ADDED FOR TEST 
-        """
-        self._test_all_devs_statuses[dev_id] = dps
-        test_topic_for_all_statuses = f"{const.SERVICE_ID}/devices/statuses"
-        self._mqtt.mqtt_publish_value_to_topic(test_topic_for_all_statuses, json.dumps(self._test_all_devs_statuses))
+        self._status_publisher.publish(dev_id, dps)
+        if self._status_aggregate:
+            device = self._device_store.get_devices(dev_id)
+            self._status_aggregate.update(dev_id, dps, getattr(device, "category", ""))
     
     def _parse_answer_from_devs(self, dev_id: str, data: dict):
-        tmp_dict = {}
-        dps = data.get("dps")
-        if dev_id not in self._device_store.get_devices():
+        dps = data.get("dps") or {}
+        device = self._device_store.get_devices(dev_id)
+        if not device:
             return {}
         try:
-            device = self._device_store.get_devices(dev_id)
-            for dp_num, dp_num_value in dps.items():
-                dp_desc = device.get_mapping().get(dp_num)
-                if dp_desc:
-                    dp_human_name = dp_desc.get("code", dp_num)
-                    tmp_dict[dp_human_name] = dp_num_value
-                else:
-                    self._device_store._insert_unknown_dp_number(dev_id, dp_num)
-        
-            if tmp_dict.get("bright_value", ""):
-                tmp_dict["bright_value"] = self._transform_tuya_format_to_percents({"bright_value": tmp_dict["bright_value"]})
-            if tmp_dict.get("bright_value_v2", ""):
-                tmp_dict["bright_value_v2"] = self._transform_tuya_format_to_percents({"bright_value_v2": tmp_dict["bright_value_v2"]})
-            if tmp_dict.get("temp_value", ""):
-                tmp_dict["temp_value"] = self._transform_tuya_format_to_percents({"temp_value": tmp_dict["temp_value"]})
-            if tmp_dict.get("temp_value_v2", ""):
-                tmp_dict["temp_value_v2"] = self._transform_tuya_format_to_percents({"temp_value_v2": tmp_dict["temp_value_v2"]})
-
-            return tmp_dict
+            # mapping is compiled into a per-device decoder once
+            human_readable_dps, unknown = device.decode_dps(dps)
+            if unknown:
+                self._device_store.insert_unknown_dps(dev_id, unknown)
+            return human_readable_dps
         except AttributeError as attrerror:
             self._logger.error(f"Error while _parse_answer_from_devs: {attrerror}")
-            self._device_store.get_devices(dev_id).stop_worker()
+            device.stop_worker()
 
     def _handle_error_answer(self, dev_id, raw_data):
         err_code = raw_data.get("Err")
@@ -550,6 +695,7 @@ class Tuya2MqttBridge:
                 error_data[err_name] = err_desc
         except AttributeError as attr_er:
             self._logger.error(f"Unknown error code {err_code} from {dev_id}")
+        error_data["breaker"] = self._breakers.state(dev_id).value
         if self._metrics:
             self._metrics.record_error(f"ERR_{err_code}")
         self._publish_device_status(dev_id, error_data)
@@ -565,36 +711,6 @@ class Tuya2MqttBridge:
             case const.ErrorStatus.ERR_KEY_OR_VER:
                 self._publish_device_update_key(dev_id)
     
-    def _transform_tuya_format_to_percents(self, parameter: dict) -> int:
-        """
-        Transform «raw» values of Tuya-devices (bright and color_temp) to percents (0-100).
-        parameter : dict
-            * ``{"bright_value | bright_value_v2": <int>}``     - bright, Tuya range 10-1000  
-            * ``{"temp_value | temp_value_v2": <int>}`` - temperature color Tuya range 0-1000  
-        """
-        parameter_name, value = next(iter(parameter.items()))
-        match parameter_name:
-            case "bright_value" | "bright_value_v2":
-                # Tuya 10-1000
-                MIN_RAW, MAX_RAW = 10, 1000
-                if value < MIN_RAW:
-                    return 0
-                if value > MAX_RAW:
-                    return 100
-                return int((value - MIN_RAW) * 100 / (MAX_RAW - MIN_RAW))
-
-            case "temp_value" | "temp_value_v2":
-                # Tuya 0-1000
-                if value <= 0:
-                    return 0
-                if value >= 1000:
-                    return 100
-                return int(value / 10)
-            case _:
-                self._logger.warning(f"Unknown parameter key '{parameter_name}' for percent conversion")
-                return -1
-        return -1 
-        
     def _publish_device_remove(self, dev_id: str):
         topic = f"{const.SERVICE_ID}/bridge/request/remove"
         payload = json.dumps({"device_ids": [dev_id]})
@@ -622,11 +738,23 @@ class Tuya2MqttBridge:
         self._shutdown_event.set()
         self._logger.debug("Shutdown-event-flag is set")
 
+        self._push_listener.stop()
+        if self._discovery:
+            self._discovery.stop()
+        if self._status_aggregate:
+            self._status_aggregate.stop()
+
         # Shutdown all daemon threads of TuyaDevice
         for device in  self._device_store.get_devices().values():
             device.stop_worker()
         self._logger.debug("All daemon threads of TuyaDevice stoped")
 
+        if self._engine:
+            self._engine.stop()
+
+        # write pending registry changes to devices.json
+        self._device_store.close()
+
         self._daemon_thread_pool.shutdown(wait=False, cancel_futures=True)
         self._logger.debug("ThreadPoolExecutor stoped")
 
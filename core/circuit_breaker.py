@@ -0,0 +1,147 @@
+import enum
+import random
+import threading
+import time
+
+from core.tuya import tuya_constants as const
+
+
+# Errors meaning the device itself is unreachable
+BREAKER_ERRORS = {
+    const.ErrorStatus.ERR_CONNECT.value,
+    const.ErrorStatus.ERR_OFFLINE.value,
+    const.ErrorStatus.ERR_TIMEOUT.value,
+}
+
+
+class BreakerState(enum.Enum):
+    CLOSED    = "closed"      # device answers, poll as usual
+    OPEN      = "open"        # device is dead, wait for the next probe
+    HALF_OPEN = "half_open"   # one probe poll is in flight
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker of one device.
+
+    Opens after ``failure_threshold`` consecutive unreachable errors, then
+    lets a single probe through after ``base_delay`` seconds, doubling the
+    delay (plus ``±jitter``) after every failed probe up to ``max_delay``.
+    The first success closes it.
+    """
+
+    def __init__(
+        self,
+        failure_threshold: int = 3,
+        base_delay: float = 10.0,
+        max_delay: float = 600.0,
+        jitter: float = 0.2,
+        rng: random.Random | None = None,
+    ):
+        self.failure_threshold = failure_threshold
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.jitter = jitter
+        self._rng = rng or random.Random()
+
+        self.state = BreakerState.CLOSED
+        self.failures = 0
+        self.next_probe = 0.0
+        self._delay = base_delay
+        self._probe_started = 0.0
+
+    def allow(self, now: float) -> bool:
+        """May a poll be sent now? Moves OPEN -> HALF_OPEN when the probe is due."""
+        match self.state:
+            case BreakerState.CLOSED:
+                return True
+            case BreakerState.OPEN:
+                if now < self.next_probe:
+                    return False
+            case BreakerState.HALF_OPEN:
+                # probe result never came back (e.g. dropped by TTL) - probe again
+                if now - self._probe_started < self._delay:
+                    return False
+        self.state = BreakerState.HALF_OPEN
+        self._probe_started = now
+        return True
+
+    def record_success(self) -> BreakerState | None:
+        """Return CLOSED if this success has just closed the breaker."""
+        self.failures = 0
+        self._delay = self.base_delay
+        if self.state is BreakerState.CLOSED:
+            return None
+        self.state = BreakerState.CLOSED
+        return self.state
+
+    def record_failure(self, now: float) -> BreakerState | None:
+        """Return OPEN if this failure has just opened the breaker."""
+        self.failures += 1
+        match self.state:
+            case BreakerState.CLOSED:
+                if self.failures < self.failure_threshold:
+                    return None
+            case BreakerState.HALF_OPEN:
+                self._delay = min(self._delay * 2, self.max_delay)
+            case BreakerState.OPEN:
+                return None
+        was_open = self.state is not BreakerState.CLOSED
+        self.state = BreakerState.OPEN
+        self.next_probe = now + self._delay * (1 + self._rng.uniform(-self.jitter, self.jitter))
+        return None if was_open else self.state
+
+
+class DeviceBreakers:
+    """Lazily created circuit breakers of all devices, keyed by device id."""
+
+    def __init__(self, **breaker_kw):
+        self._breaker_kw = breaker_kw
+        self._breakers: dict[str, CircuitBreaker] = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, cfg: dict) -> "DeviceBreakers":
+        """Build from ``[breaker]`` section of settings/config.toml."""
+        return cls(
+            failure_threshold=cfg.get("failure_threshold", 3),
+            base_delay=cfg.get("base_delay", 10.0),
+            max_delay=cfg.get("max_delay", 600.0),
+            jitter=cfg.get("jitter", 0.2),
+        )
+
+    def _get(self, dev_id: str) -> CircuitBreaker:
+        br = self._breakers.get(dev_id)
+        if br is None:
+            br = self._breakers[dev_id] = CircuitBreaker(**self._breaker_kw)
+        return br
+
+    def state(self, dev_id: str) -> BreakerState:
+        with self._lock:
+            br = self._breakers.get(dev_id)
+            return br.state if br else BreakerState.CLOSED
+
+    def allow(self, dev_id: str, now: float | None = None) -> tuple[bool, float]:
+        """Return (allowed, next probe time)."""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            br = self._get(dev_id)
+            return br.allow(now), br.next_probe
+
+    def on_success(self, dev_id: str) -> BreakerState | None:
+        with self._lock:
+            return self._get(dev_id).record_success()
+
+    def on_failure(self, dev_id: str, err_code: str | None) -> BreakerState | None:
+        """Count only unreachable errors; other Tuya errors mean the device answered."""
+        with self._lock:
+            br = self._get(dev_id)
+            if err_code in BREAKER_ERRORS:
+                return br.record_failure(time.monotonic())
+            if err_code is not None:
+                return br.record_success()
+            return None
+
+    def forget(self, dev_id: str) -> None:
+        with self._lock:
+            self._breakers.pop(dev_id, None)
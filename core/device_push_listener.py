@@ -0,0 +1,81 @@
+import select
+import threading
+import time
+
+
+class PushListener:
+    """
+    Один поток на все устройства в push-режиме (``persistent=True``).
+
+    Слушает сокеты постоянных соединений через ``select`` и, когда устройство
+    само присылает кадр, ставит чтение в очередь этого устройства
+    (``receive_push_async``) - сам сокет читает только воркер устройства,
+    поэтому команды, опрос и push не мешают друг другу. Раз в
+    ``heartbeat_interval`` секунд устройству отправляется heartbeat, он же
+    переоткрывает соединение, если устройство его закрыло.
+    """
+
+    # how often the list of persistent devices is refreshed from the store
+    _REFRESH_PERIOD = 1.0
+
+    def __init__(self, device_store, on_status, logger, heartbeat_interval: float = 10.0):
+        self._store = device_store
+        self._on_status = on_status
+        self._logger = logger
+        self._heartbeat_interval = heartbeat_interval
+        self._last_heartbeat: dict[str, float] = {}
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._loop, daemon=True, name="TuyaPushListener")
+
+    def start(self):
+        self._thread.start()
+        self._logger.info(f"Push listener started, heartbeat every {self._heartbeat_interval}s")
+
+    def stop(self, timeout: float = 2.0):
+        self._stop.set()
+        self._thread.join(timeout)
+
+    # ------------------------------------------------------------------ #
+    # Internals                                                          #
+    # ------------------------------------------------------------------ #
+    def _loop(self):
+        devices = []
+        last_refresh = 0.0
+        while not self._stop.is_set():
+            now = time.monotonic()
+            if now - last_refresh >= self._REFRESH_PERIOD:
+                devices = [d for d in self._store.get_devices().values() if d.persistent]
+                last_refresh = now
+                self._send_heartbeats(devices, now)
+
+            by_fd = {}
+            for dev in devices:
+                try:
+                    fd = dev.push_fileno()
+                except Exception as exc:
+                    # one broken transport must not stop push for every device
+                    self._logger.debug(f"Push socket of {dev.dev_id} unavailable: {exc}")
+                    continue
+                if fd is not None:
+                    by_fd[fd] = dev
+            if not by_fd:
+                self._stop.wait(self._REFRESH_PERIOD)
+                continue
+            try:
+                readable, _, _ = select.select(list(by_fd), [], [], self._REFRESH_PERIOD)
+            except (OSError, ValueError):
+                # a socket was closed by its worker meanwhile - rebuild the fd set
+                continue
+            for fd in readable:
+                by_fd[fd].receive_push_async(self._on_status)
+
+    def _send_heartbeats(self, devices, now: float):
+        alive = set()
+        for dev in devices:
+            alive.add(dev.dev_id)
+            last = self._last_heartbeat.get(dev.dev_id)
+            if last is None or now - last >= self._heartbeat_interval:
+                self._last_heartbeat[dev.dev_id] = now
+                dev.heartbeat_async(ttl=self._heartbeat_interval)
+        for dev_id in self._last_heartbeat.keys() - alive:
+            del self._last_heartbeat[dev_id]
@@ -0,0 +1,292 @@
+"""
+Хранилища реестра устройств для ``DeviceStore``.
+
+* ``JsonRegistryBackend`` (по умолчанию) - devices.json + local_scan.json,
+  каждый снимок пишется целиком;
+* ``SqliteRegistryBackend`` - stdlib ``sqlite3`` в режиме WAL для больших
+  инсталляций: изменения пишутся построчно в одной транзакции, поиск идёт по
+  индексам ``DeviceStore`` в памяти.
+
+Перенос существующих файлов в базу и обратно::
+
+    python -m core.device_registry_backend import devices.db devices.json local_scan.json
+    python -m core.device_registry_backend export devices.db devices.json local_scan.json
+"""
+import json
+import logging
+import os
+import sqlite3
+import stat
+import sys
+import tempfile
+import threading
+
+
+def atomic_write_json(path: str, data, indent=4):
+    """tmp file in the same dir + fsync + rename: a crash leaves old or new file, never half."""
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(prefix=".tmp-", suffix=".json", dir=directory)
+    try:
+        # mkstemp creates 0600 and os.replace keeps it - keep the target's mode
+        os.fchmod(fd, _file_mode(path))
+        with os.fdopen(fd, "w") as fh:
+            json.dump(data, fh, indent=indent)
+            fh.flush()
+            os.fsync(fh.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+    try:
+        dir_fd = os.open(directory, os.O_RDONLY)
+    except OSError:
+        return      # e.g. no directory fds on this platform
+    try:
+        os.fsync(dir_fd)
+    finally:
+        os.close(dir_fd)
+
+
+def _file_mode(path: str) -> int:
+    """Permission bits of ``path``, or what open() would give a new file."""
+    try:
+        return stat.S_IMODE(os.stat(path).st_mode)
+    except FileNotFoundError:
+        umask = os.umask(0)
+        os.umask(umask)
+        return 0o666 & ~umask
+
+
+def _read_json(path: str | None, default, logger):
+    if not path:
+        return default
+    try:
+        with open(path, "r") as fh:
+            return json.load(fh)
+    except FileNotFoundError:
+        logger.warning(f"{path} not found.")
+    except Exception as exc:
+        logger.error(f"Error reading {path}: {exc}")
+    return default
+
+
+class JsonRegistryBackend:
+    """devices.json / local_scan.json, snapshots are written whole."""
+
+    name = "json"
+
+    def __init__(self, devices_path: str | None, local_scan_path: str | None, logger=None):
+        self.devices_path = devices_path
+        self.local_scan_path = local_scan_path
+        self._logger = logger or logging.getLogger("DeviceRegistry")
+
+    def load_devices(self) -> list:
+        return _read_json(self.devices_path, [], self._logger)
+
+    def save_devices(self, records: list, changed: set | None = None, removed: set | None = None):
+        if self.devices_path:
+            atomic_write_json(self.devices_path, records)
+            self._logger.info(f"Saved {len(records)} devices to {self.devices_path}")
+
+    def load_local_scan(self) -> dict:
+        return _read_json(self.local_scan_path, {}, self._logger) or {}
+
+    def save_local_scan(self, scan: dict):
+        if self.local_scan_path:
+            atomic_write_json(self.local_scan_path, scan)
+
+    def close(self):
+        pass
+
+
+class SqliteRegistryBackend:
+    """
+    SQLite (WAL) registry. Every device record is stored whole as JSON in
+    ``data``; friendly_name/ip/product_id/gwId are plain copies for ad-hoc
+    queries, lookups are served by the in-memory indexes of ``DeviceStore``.
+    """
+
+    name = "sqlite"
+
+    _SCHEMA = """
+        CREATE TABLE IF NOT EXISTS devices (
+            id            TEXT PRIMARY KEY,
+            position      INTEGER NOT NULL,
+            friendly_name TEXT,
+            ip            TEXT,
+            product_id    TEXT,
+            data          TEXT NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS local_scan (
+            ip   TEXT PRIMARY KEY,
+            gwId TEXT,
+            data TEXT NOT NULL
+        );
+        DROP INDEX IF EXISTS devices_friendly_name;
+        DROP INDEX IF EXISTS devices_ip;
+        DROP INDEX IF EXISTS devices_product_id;
+        DROP INDEX IF EXISTS local_scan_gwid;
+    """
+
+    def __init__(self, path: str, logger=None):
+        self.path = path
+        self._logger = logger or logging.getLogger("DeviceRegistry")
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(self._SCHEMA)
+
+    # ------------------------------------------------------------------ #
+    # Devices                                                            #
+    # ------------------------------------------------------------------ #
+    def load_devices(self) -> list:
+        with self._lock:
+            rows = self._db.execute("SELECT data FROM devices ORDER BY position").fetchall()
+        return [json.loads(data) for (data,) in rows]
+
+    def save_devices(self, records: list, changed: set | None = None, removed: set | None = None):
+        """
+        Apply the registry state in one transaction: only ``changed``/``removed``
+        ids, or a full replace when ``changed`` is None.
+        """
+        with self._lock, self._transaction():
+            if changed is None:
+                self._db.execute("DELETE FROM devices")
+            elif removed:
+                self._db.executemany("DELETE FROM devices WHERE id = ?", [(i,) for i in removed])
+            rows = [
+                self._device_row(rec) for rec in records if changed is None or rec["id"] in changed
+            ]
+            # an updated row keeps its position, a new one goes to the end
+            self._db.executemany(
+                "INSERT INTO devices (id, position, friendly_name, ip, product_id, data) "
+                "VALUES (?, (SELECT IFNULL(MAX(position), -1) + 1 FROM devices), ?, ?, ?, ?) "
+                "ON CONFLICT(id) DO UPDATE SET friendly_name = excluded.friendly_name, "
+                "ip = excluded.ip, product_id = excluded.product_id, data = excluded.data",
+                rows,
+            )
+        self._logger.debug(f"Saved {len(rows)} device(s) to {self.path}")
+
+    # ------------------------------------------------------------------ #
+    # Local scan                                                         #
+    # ------------------------------------------------------------------ #
+    def load_local_scan(self) -> dict:
+        with self._lock:
+            rows = self._db.execute("SELECT ip, data FROM local_scan").fetchall()
+        return {ip: json.loads(data) for ip, data in rows}
+
+    def save_local_scan(self, scan: dict):
+        with self._lock, self._transaction():
+            self._db.execute("DELETE FROM local_scan")
+            self._db.executemany(
+                "INSERT INTO local_scan (ip, gwId, data) VALUES (?, ?, ?)",
+                [(ip, entry.get("gwId"), json.dumps(entry)) for ip, entry in scan.items()],
+            )
+
+    # ------------------------------------------------------------------ #
+    # Import / export of the JSON files                                  #
+    # ------------------------------------------------------------------ #
+    def is_empty(self) -> bool:
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM devices").fetchone()[0] == 0
+
+    def import_json(self, devices_path: str | None, local_scan_path: str | None = None) -> int:
+        json_backend = JsonRegistryBackend(devices_path, local_scan_path, self._logger)
+        records = json_backend.load_devices()
+        self.save_devices(records)
+        if local_scan_path:
+            self.save_local_scan(json_backend.load_local_scan())
+        self._logger.info(f"Imported {len(records)} devices into {self.path}")
+        return len(records)
+
+    def export_json(self, devices_path: str, local_scan_path: str | None = None) -> int:
+        json_backend = JsonRegistryBackend(devices_path, local_scan_path, self._logger)
+        records = self.load_devices()
+        json_backend.save_devices(records)
+        if local_scan_path:
+            json_backend.save_local_scan(self.load_local_scan())
+        return len(records)
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+    # ------------------------------------------------------------------ #
+    # Internals                                                          #
+    # ------------------------------------------------------------------ #
+    def _transaction(self):
+        return _Transaction(self._db)
+
+    @staticmethod
+    def _device_row(rec: dict) -> tuple:
+        return (rec["id"], rec.get("friendly_name"), rec.get("ip"), rec.get("product_id"), json.dumps(rec))
+
+
+class _Transaction:
+    def __init__(self, db):
+        self._db = db
+
+    def __enter__(self):
+        self._db.execute("BEGIN IMMEDIATE")
+
+    def __exit__(self, exc_type, exc, tb):
+        self._db.execute("ROLLBACK" if exc_type else "COMMIT")
+        return False
+
+
+def resolve_sqlite_path(cfg: dict, devices_path: str | None, env_path: str | None = None) -> str:
+    """
+    ``TUYA2MQTT_DEVICES_DB_FILE`` (``env_path``), then ``[store] sqlite_path``,
+    then ``devices.db`` next to devices.json. A relative ``sqlite_path`` is
+    taken from the devices.json directory, never from the working directory:
+    the database holds local keys.
+    """
+    if env_path:
+        return env_path
+    path = cfg.get("sqlite_path") or "devices.db"
+    if os.path.isabs(path):
+        return path
+    if not devices_path:
+        raise ValueError("Relative sqlite_path needs TUYA2MQTT_DEV_CONF_FILE or TUYA2MQTT_DEVICES_DB_FILE")
+    return os.path.join(os.path.dirname(os.path.abspath(devices_path)), path)
+
+
+def make_registry_backend(cfg: dict, devices_path, local_scan_path, logger, sqlite_path=None):
+    """
+    Backend from the ``[store]`` section of settings/config.toml. On the
+    first start with ``backend = "sqlite"`` the existing JSON files are
+    imported into the empty database.
+    """
+    if cfg.get("backend", "json") != "sqlite":
+        return JsonRegistryBackend(devices_path, local_scan_path, logger)
+    backend = SqliteRegistryBackend(resolve_sqlite_path(cfg, devices_path, sqlite_path), logger)
+    if backend.is_empty() and devices_path and os.path.exists(devices_path):
+        backend.import_json(devices_path, local_scan_path)
+    return backend
+
+
+def main(argv: list[str]) -> int:
+    if len(argv) < 3 or argv[0] not in ("import", "export"):
+        print(__doc__)
+        return 2
+    action, db_path, devices_path, *rest = argv
+    local_scan_path = rest[0] if rest else None
+    logging.basicConfig(level=logging.INFO)
+    backend = SqliteRegistryBackend(db_path)
+    try:
+        if action == "import":
+            count = backend.import_json(devices_path, local_scan_path)
+        else:
+            count = backend.export_json(devices_path, local_scan_path)
+    finally:
+        backend.close()
+    print(f"{action}: {count} devices")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
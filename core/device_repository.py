@@ -3,21 +3,48 @@ import threading
 from typing import List, Dict
 from core.tuya_device_entity import TuyaDevice
 from core.tuya import tuya_constants as const
+from core.device_registry_backend import JsonRegistryBackend, atomic_write_json
 
 
 class DeviceStore:
     """
-    Чтение / запись devices.json + полезные утилиты для слияния
-    локальной информации со сканом из облака.
+    Реестр устройств + полезные утилиты для слияния локальной информации
+    со сканом из облака.
+
+    Рабочая копия конфигурации устройств (записи devices.json) живёт в
+    памяти, все изменения идут через ``update_record``/``remove_device``/
+    ``replace_records``. Хранилище (``backend``, по умолчанию devices.json,
+    см. core/device_registry_backend.py) - только снимок: фоновый поток
+    сохраняет изменения не чаще раза в ``persist_delay`` секунд (несколько
+    изменений подряд сливаются в одну запись).
     """
 
-    def __init__(self, logger):
+    def __init__(self, logger, engine=None, on_command=None, observer=None,
+                 persist_delay: float = 1.0, backend=None):
         self._logger = logger
+        self._engine = engine
+        self._on_command = on_command
+        self._observer = observer
         self._lock = threading.RLock()
         self._devices: Dict[str, TuyaDevice] = {}
 
         self._name_to_id: Dict[str, str] = {}
 
+        # authoritative device configs, dev_id -> record (devices.json entry)
+        self._records: Dict[str, dict] = {}
+        self._backend = backend
+        # local scan results and their gwId index, loaded on first use
+        self._local_scan: dict | None = None
+        self._scan_by_gwid: Dict[str, dict] = {}
+        # ids changed / removed since the last save, None - everything changed
+        self._changed: set | None = set()
+        self._removed: set = set()
+        self._persist_delay = persist_delay
+        self._dirty = threading.Event()
+        self._closed = threading.Event()
+        self._writer = threading.Thread(target=self._persist_loop, daemon=True, name="DeviceStoreWriter")
+        self._writer.start()
+
     def get_devices(self, dev_id: str=None):
         if not dev_id:
             return self._devices
@@ -33,8 +60,161 @@ class DeviceStore:
             return device_id
     
     def remove_device(self, dev_id: str):
-        del self._devices[dev_id]
+        with self._lock:
+            if self._records.pop(dev_id, None) is not None:
+                self._schedule_persist(removed=dev_id)
+            del self._devices[dev_id]
+
+    # ------------------------------------------------------------------ #
+    # Registry                                                           #
+    # ------------------------------------------------------------------ #
+    def open(self, path: str | None = None) -> list:
+        """
+        Load the registry from the backend (devices.json at ``path`` if no
+        backend was given) and create the devices.
+        """
+        if self._backend is None:
+            self._backend = JsonRegistryBackend(path, const.LOCAL_SCAN_FILE, self._logger)
+        conf = self._backend.load_devices()
+        self._logger.info(f"Loaded {len(conf)} devices from {self._backend.name} registry")
+        with self._lock:
+            self._records = {rec["id"]: rec for rec in conf}
+        if conf:
+            self.load_devices(conf)
+        return conf
+
+    def records(self) -> list:
+        """Copy of all device records, in registry order."""
+        with self._lock:
+            return json.loads(json.dumps(list(self._records.values())))
 
+    def record(self, dev_id: str) -> dict | None:
+        with self._lock:
+            rec = self._records.get(dev_id)
+            return json.loads(json.dumps(rec)) if rec is not None else None
+
+    def update_record(self, dev_id: str, **fields) -> bool:
+        """Change fields of one record; the snapshot is written later."""
+        with self._lock:
+            rec = self._records.get(dev_id)
+            if rec is None:
+                return False
+            rec.update(fields)
+            self._schedule_persist(changed=dev_id)
+            return True
+
+    def relocate_device(self, dev_id: str, ip: str) -> bool:
+        """
+        The device announced itself from ``ip`` (DHCP change): update its
+        record and rebuild the live transport in place. False if unknown or
+        already there.
+        """
+        with self._lock:
+            rec = self._records.get(dev_id)
+            dev = self._devices.get(dev_id)
+            if rec is None or dev is None or rec.get("ip") == ip:
+                return False
+            rec["ip"] = ip
+            self._schedule_persist(changed=dev_id)
+            conf = dict(rec)
+        dev.update_from_dict(conf)
+        self._logger.info(f"Device {dev_id} relocated to {ip}")
+        return True
+
+    def replace_records(self, records: list) -> None:
+        with self._lock:
+            self._records = {rec["id"]: rec for rec in records}
+            self._changed = None
+            self._schedule_persist()
+
+    def load_local_scan(self) -> dict:
+        """Saved results of local network scans, ip -> scan entry (read once, then cached)."""
+        with self._lock:
+            if self._local_scan is None:
+                if self._backend is None:
+                    scan = self.read(const.LOCAL_SCAN_FILE) or {}
+                else:
+                    scan = self._backend.load_local_scan()
+                self._index_local_scan(scan)
+            return dict(self._local_scan)
+
+    def save_local_scan(self, scan: dict) -> None:
+        with self._lock:
+            self._index_local_scan(dict(scan))
+        try:
+            if self._backend is None:
+                self.write(const.LOCAL_SCAN_FILE, scan)
+            else:
+                self._backend.save_local_scan(scan)
+        except Exception as exc:
+            self._logger.error(f"Error saving local scan: {exc}")
+
+    def scan_entry_by_gwid(self, gw_id: str) -> dict | None:
+        """Latest local scan entry of the device, O(1)."""
+        if self._local_scan is None:
+            self.load_local_scan()
+        return self._scan_by_gwid.get(gw_id)
+
+    def _index_local_scan(self, scan: dict) -> None:
+        # later entries (newer ip of the same device) win
+        self._local_scan = scan
+        self._scan_by_gwid = {
+            entry["gwId"]: entry
+            for entry in scan.values()
+            if isinstance(entry, dict) and "Error" not in entry and entry.get("gwId")
+        }
+
+    def flush(self) -> None:
+        """Write the snapshot now if there are unsaved changes."""
+        if self._dirty.is_set():
+            self._persist()
+
+    def close(self) -> None:
+        self._closed.set()
+        self._dirty.set()           # wake the writer up
+        self._writer.join(timeout=2.0)
+        self.flush()
+        if self._backend is not None:
+            self._backend.close()
+
+    def _schedule_persist(self, changed: str | None = None, removed: str | None = None):
+        """Mark the registry dirty (caller holds the lock)."""
+        if self._changed is not None and changed:
+            self._changed.add(changed)
+        if removed:
+            self._removed.add(removed)
+            if self._changed is not None:
+                self._changed.discard(removed)
+        if self._backend is not None:
+            self._dirty.set()
+
+    def _persist_loop(self):
+        while not self._closed.is_set():
+            self._dirty.wait()
+            if self._closed.is_set():
+                break
+            # coalesce a burst of changes into one write
+            self._closed.wait(self._persist_delay)
+            self._persist()
+
+    def _persist(self):
+        with self._lock:
+            self._dirty.clear()
+            snapshot = json.loads(json.dumps(list(self._records.values())))
+            changed, removed = self._changed, self._removed
+            self._changed, self._removed = set(), set()
+        try:
+            self._backend.save_devices(snapshot, changed, removed)
+        except Exception as exc:
+            self._logger.error(f"Error saving device registry: {exc}")
+            # keep the changes for the next attempt
+            with self._lock:
+                self._changed = None
+                self._dirty.set()
+
+    # ------------------------------------------------------------------ #
+    # Files                                                              #
+    # ------------------------------------------------------------------ #
     def read(self, path: str) -> list:
         """Read JSON form file, return list or dict of devices or empty list."""
         with self._lock:
@@ -51,24 +231,54 @@ class DeviceStore:
                 return []
 
     def write(self, path: str, data):
-        with self._lock:
-            try:
-                with open(path, "w") as fh:
-                    json.dump(data, fh, indent=4)
-                self._logger.info(f"Saved {len(data)} devices to {path}")
-            except Exception as exc:
-                self._logger.error(f"Error writing {path}: {exc}")
+        try:
+            atomic_write_json(path, data)
+            self._logger.info(f"Saved {len(data)} devices to {path}")
+        except Exception as exc:
+            self._logger.error(f"Error writing {path}: {exc}")
     
     def load_devices(self, conf):
-        try:
-            cnt_of_devices = 0
+        """
+        Reconcile live devices with ``conf``: new entries get a TuyaDevice,
+        changed ones are updated in place (transport rebuilt only when a
+        connection field changed), devices missing from ``conf`` are stopped.
+        Unchanged devices are not touched, so the cost is O(changed).
+        """
+        added, updated, reconnected = 0, 0, 0
+        with self._lock:
+            wanted = set()
             for obj in conf:
-                dev = TuyaDevice.from_dict(obj)
-                self._devices[dev.dev_id] = dev
-                cnt_of_devices += 1
-            self._logger.info(f"Loaded {cnt_of_devices} devices")
-        except Exception as e:
-            self._logger.error(f"Error loading: {e}")
+                try:
+                    dev_id = obj["id"]
+                    wanted.add(dev_id)
+                    dev = self._devices.get(dev_id)
+                    if dev is None:
+                        self._devices[dev_id] = TuyaDevice.from_dict(
+                            obj, engine=self._engine, on_command=self._on_command, observer=self._observer
+                        )
+                        added += 1
+                    elif self._differs(dev, obj):
+                        reconnected += dev.update_from_dict(obj)
+                        updated += 1
+                except Exception as e:
+                    self._logger.error(f"Error loading {obj.get('id')}: {e}")
+            stale = [dev_id for dev_id in self._devices if dev_id not in wanted]
+            removed = [self._devices.pop(dev_id) for dev_id in stale]
+        for dev in removed:
+            dev.stop_worker()
+        self._logger.info(
+            f"Loaded {len(self._devices)} devices: {added} added, {updated} updated "
+            f"({reconnected} reconnected), {len(removed)} removed"
+        )
+
+    @staticmethod
+    def _differs(dev: TuyaDevice, obj: dict) -> bool:
+        return (
+            dev.connection_of() != TuyaDevice.connection_from_dict(obj)
+            or dev.friendly_name != obj.get("friendly_name")
+            or dev.product_id != obj.get("product_id")
+            or dev.mapping != (obj.get("mapping", {}) or {})
+        )
 
     def make_hum_name_to_id(self):
         self._name_to_id = {dev.friendly_name: dev_id for dev_id, dev in self._devices.items() if dev.friendly_name}
@@ -82,26 +292,26 @@ class DeviceStore:
         devices_id_to_add: List[str] | None,
     ) -> tuple[list, list]:
         
-        local_scan_devices = self.read(const.LOCAL_SCAN_FILE)
-        if not local_scan_devices:
+        if not self.load_local_scan():
             raise FileNotFoundError("local_scan.json file not found")
         
         joined_devs = []
         new_devices_conf = []
 
+        # one gwId index lookup per cloud device instead of a scan of local_scan
         for dev_obj in cloud_devs_conf:
-            for key in local_scan_devices.keys():
-                if "Error" in local_scan_devices[key]: continue
-                if dev_obj["id"] in local_scan_devices[key]["gwId"]:
-                    dev_obj["ip"] = local_scan_devices[key]["ip"]
-                    dev_obj["version"] = local_scan_devices[key]["version"]
-                    joined_devs.append(dev_obj)
+            scan_entry = self.scan_entry_by_gwid(dev_obj["id"])
+            if scan_entry is not None:
+                dev_obj["ip"] = scan_entry["ip"]
+                dev_obj["version"] = scan_entry["version"]
+                joined_devs.append(dev_obj)
 
         add_only = set(devices_id_to_add) if devices_id_to_add else set()
 
-        current_devices_conf = self.read(const.DEVICES_CONF_FILE)
-        if current_devices_conf:
-            present = {d["id"] for d in current_devices_conf}
+        with self._lock:
+            present = set(self._records)
+        if present:
+            current_devices_conf = self.records()
             for dev in joined_devs:
                 dev_id = dev.get("id")
                 if dev_id not in present and (dev_id in add_only):
@@ -111,7 +321,7 @@ class DeviceStore:
         else:
             filtered_joined_devs = []
             for device in joined_devs:
-                if device["id"] in devices_id_to_add:
+                if device["id"] in add_only:
                     filtered_joined_devs.append(device)
 
             joined_devs = filtered_joined_devs
@@ -119,16 +329,24 @@ class DeviceStore:
 
         return new_devices_conf, joined_devs
 
-    def _insert_unknown_dp_number(self, tuya_device_id: str, dp_num: str):
-        devs_conf_tmp = []
-        devs_conf = self.read(const.DEVICES_CONF_FILE)
-        for dev in devs_conf:
-            if dev["id"] == tuya_device_id:
-                dev["mapping"][dp_num] = {"code": dp_num, "type": "Unknown", "values": {}}
-            devs_conf_tmp.append(dev)
-        self.load_devices(devs_conf_tmp)
-        self.write(const.DEVICES_CONF_FILE, devs_conf_tmp)
-        self._logger.info(f"Unknown DP {dp_num} add to device {tuya_device_id}")
+    def insert_unknown_dps(self, tuya_device_id: str, dp_nums: list):
+        """Add DPs missing from the cloud mapping, all of one poll answer at once."""
+        with self._lock:
+            rec = self._records.get(tuya_device_id)
+            if rec is None:
+                return
+            mapping = dict(rec.get("mapping") or {})
+            new = [dp for dp in dp_nums if dp not in mapping]
+            if not new:
+                return
+            for dp_num in new:
+                mapping[dp_num] = {"code": dp_num, "type": "Unknown", "values": {}}
+            self.update_record(tuya_device_id, mapping=mapping)
+            # the live device learns the DPs in place, no reload needed
+            device = self._devices.get(tuya_device_id)
+            if device:
+                device.mapping = dict(mapping)
+        self._logger.info(f"Unknown DP {', '.join(new)} add to device {tuya_device_id}")
     
     def make_device_brief(self, dev: dict) -> dict:
         """
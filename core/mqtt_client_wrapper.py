@@ -5,6 +5,9 @@ import logging
 import threading
 from typing import Callable, Any
 
+from core.mqtt_publish_policy import PublishPolicyTable
+from core.mqtt_topic_router import TopicRouter
+
 class MqttModule:
     """Wrapper around *paho‑mqtt* with Homie‑friendly defaults.
 
@@ -19,6 +22,9 @@ class MqttModule:
       (``paho_debug=False`` by default).
     """
 
+    # topic filters per SUBSCRIBE packet
+    _SUBSCRIBE_BATCH = 100
+
     def __init__(
         self,
         input_topics: dict[str, Callable[[str, str], Any]] | None,
@@ -36,6 +42,8 @@ class MqttModule:
         lwt_retain: bool = True,
         # Logging
         paho_debug: bool = False,
+        # QoS / retain / expiry per topic class
+        publish_policy: PublishPolicyTable | None = None,
     ):
         self._MODULE_NAME = module_name
         self._logger = logger
@@ -67,7 +75,8 @@ class MqttModule:
         if lwt_topic:
             self._client.will_set(lwt_topic, lwt_payload, qos=lwt_qos, retain=lwt_retain)
 
-        self._topic_handlers: dict[str, Callable[[str, str], Any]] = input_topics or {}
+        self._policy = publish_policy or PublishPolicyTable({})
+        self._topic_handlers = TopicRouter(input_topics)
         self._stop = threading.Event()
 
     # ------------------------------------------------------------------ #
@@ -99,23 +108,44 @@ class MqttModule:
         self,
         topic: str,
         payload: str | bytes,
-        qos: int = 2,
-        retain: bool = True,
+        qos: int | None = None,
+        retain: bool | None = None,
+        expiry: int | None = None,
     ) -> None:
-        """Publish with Homie defaults (qos2+retain)."""
+        """
+        Publish with the policy of the topic class (Homie defaults qos2+retain
+        without a policy). Explicit ``qos``/``retain``/``expiry`` win, e.g.
+        clearing a retained topic always passes ``retain=True``.
+        """
+        policy = self._policy.resolve(topic)
+        qos = policy.qos if qos is None else qos
+        retain = policy.retain if retain is None else retain
+        expiry = policy.expiry if expiry is None else expiry
         p = payload if isinstance(payload, (bytes, bytearray)) else str(payload)
         try:
-            self._client.publish(topic, p, qos=qos, retain=retain)
+            self._client.publish(
+                topic, p, qos=qos, retain=retain, properties=self._policy.properties(expiry)
+            )
         except Exception as exc:
             self._logger.error(f"Failed to publish to {topic}: {exc}")
 
     def update_topic_handlers(self, mapping: dict[str, Callable[[str, str], Any]]) -> None:
         """Merge *mapping* into current handler table and (re)subscribe."""
         added = [t for t in mapping if t not in self._topic_handlers]
-        self._topic_handlers.update(mapping)
+        for topic, handler in mapping.items():
+            self._topic_handlers.add(topic, handler)
         if added and self._client.is_connected():
             self._subscribe(extra=added)
 
+    def remove_topic_handlers(self, topics: list[str]) -> None:
+        """Drop handlers of *topics* and unsubscribe from them."""
+        removed = [t for t in topics if self._topic_handlers.remove(t)]
+        if removed and self._client.is_connected():
+            try:
+                self._client.unsubscribe(removed)
+            except Exception as exc:
+                self._logger.error(f"Exception unsubscribing from {removed}: {exc}")
+
     # ------------------------------------------------------------------ #
     # Internals                                                          #
     # ------------------------------------------------------------------ #
@@ -134,16 +164,18 @@ class MqttModule:
         return False
 
     def _subscribe(self, initial: bool = False, extra: list[str] | None = None) -> None:
-        topics = (extra or []) + (list(self._topic_handlers) if initial else [])
-        for t in topics:
+        topics = (extra or []) + (self._topic_handlers.filters() if initial else [])
+        # many topic filters per SUBSCRIBE packet instead of one round-trip each
+        for idx in range(0, len(topics), self._SUBSCRIBE_BATCH):
+            batch = topics[idx : idx + self._SUBSCRIBE_BATCH]
             try:
-                res, _ = self._client.subscribe(t)
+                res, _ = self._client.subscribe([(t, 0) for t in batch])
                 if res == mqtt.MQTT_ERR_SUCCESS:
-                    self._logger.debug(f"Subscribed to {t}")
+                    self._logger.debug(f"Subscribed to {batch}")
                 else:
-                    self._logger.error(f"Subscribe error {res} for {t}")
+                    self._logger.error(f"Subscribe error {res} for {batch}")
             except Exception as exc:
-                self._logger.error(f"Exception subscribing to {t}: {exc}")
+                self._logger.error(f"Exception subscribing to {batch}: {exc}")
 
     # ------------------------------------------------------------------ #
     # Callbacks                                                          #
@@ -159,13 +191,11 @@ class MqttModule:
         self._logger.warning(f"MQTT disconnected, reason={reason}")
 
     def _on_message(self, client, userdata, msg):
-        handled = False
-        for sub, cb in self._topic_handlers.items():
-            if mqtt.topic_matches_sub(sub, msg.topic):
-                handled = True
-                try:
-                    cb(msg.topic, msg.payload.decode())
-                except Exception as exc:
-                    self._logger.error(f"Handler error for {msg.topic}: {exc}")
-        if not handled:
+        handlers = self._topic_handlers.match(msg.topic)
+        for cb in handlers:
+            try:
+                cb(msg.topic, msg.payload.decode())
+            except Exception as exc:
+                self._logger.error(f"Handler error for {msg.topic}: {exc}")
+        if not handlers:
             self._logger.debug(f"Unhandled topic {msg.topic}")
@@ -0,0 +1,113 @@
+from dataclasses import dataclass
+
+import paho.mqtt.client as mqtt
+from paho.mqtt.packettypes import PacketTypes
+from paho.mqtt.properties import Properties
+
+
+@dataclass(frozen=True)
+class PublishPolicy:
+    qos: int = 2
+    retain: bool = True
+    expiry: int = 0         # MQTTv5 message expiry interval (s), 0 - never expires
+
+
+# Topic classes in match order; "{service}" is replaced with the service id.
+# The first class with a matching filter wins, unmatched topics use "default".
+DEFAULT_TOPIC_CLASSES: dict[str, list[str]] = {
+    "status": [
+        "{service}/devices/+/status",
+        "{service}/devices/+/status/delta",
+        "{service}/devices/statuses",
+        "{service}/devices/statuses/+",
+    ],
+    "metrics": ["{service}/bridge/metrics", "{service}/bridge/metrics/#"],
+    "bridge-response": ["{service}/bridge/response/#"],
+    "log": ["homie/5/+/$log/#"],
+    "homie-lifecycle": ["homie/5/+/$state", "homie/5/+/$description", "homie/5/+/$alert/#"],
+    "homie-property": ["homie/5/+/+/+", "homie/5/+/+/+/$target"],
+}
+
+
+class PublishPolicyTable:
+    """
+    QoS / retain / message-expiry per topic class.
+
+    Built from the ``[mqtt.policy]`` section of settings/config.toml::
+
+        [mqtt.policy.status]
+        qos = 0
+        retain = true
+        expiry = 600
+        # topics = ["..."]   - optional, replaces the built-in filters
+
+    Classes without a section keep the legacy QoS 2 + retain. Resolution is
+    cached per topic, so the filters are matched once per topic only.
+    """
+
+    # resolved topics kept in the cache, the set of topics is bounded anyway
+    _CACHE_LIMIT = 10000
+
+    def __init__(self, classes: dict[str, tuple[list[str], PublishPolicy]],
+                 default: PublishPolicy = PublishPolicy()):
+        self._classes = classes
+        self._default = default
+        self._cache: dict[str, tuple[str, PublishPolicy]] = {}
+        self._properties: dict[int, Properties] = {}
+
+    @classmethod
+    def from_config(cls, cfg: dict, service_id: str) -> "PublishPolicyTable":
+        default = cls._policy(cfg.get("default", {}), PublishPolicy())
+        classes = {}
+        # user-defined classes (any other section with its own "topics") are
+        # more specific, so they are matched before the built-in ones
+        for name, section in cfg.items():
+            if name not in DEFAULT_TOPIC_CLASSES and name != "default" and "topics" in section:
+                classes[name] = (
+                    [f.replace("{service}", service_id) for f in section["topics"]],
+                    cls._policy(section, default),
+                )
+        for name, filters in DEFAULT_TOPIC_CLASSES.items():
+            section = cfg.get(name, {})
+            filters = section.get("topics", filters)
+            classes[name] = (
+                [f.replace("{service}", service_id) for f in filters],
+                cls._policy(section, default),
+            )
+        return cls(classes, default)
+
+    def classify(self, topic: str) -> tuple[str, PublishPolicy]:
+        hit = self._cache.get(topic)
+        if hit is not None:
+            return hit
+        hit = ("default", self._default)
+        for name, (filters, policy) in self._classes.items():
+            if any(mqtt.topic_matches_sub(f, topic) for f in filters):
+                hit = (name, policy)
+                break
+        if len(self._cache) >= self._CACHE_LIMIT:
+            self._cache.clear()
+        self._cache[topic] = hit
+        return hit
+
+    def resolve(self, topic: str) -> PublishPolicy:
+        return self.classify(topic)[1]
+
+    def properties(self, expiry: int) -> Properties | None:
+        """PUBLISH properties carrying the message expiry interval (MQTTv5)."""
+        if not expiry:
+            return None
+        props = self._properties.get(expiry)
+        if props is None:
+            props = Properties(PacketTypes.PUBLISH)
+            props.MessageExpiryInterval = expiry
+            self._properties[expiry] = props
+        return props
+
+    @staticmethod
+    def _policy(section: dict, base: PublishPolicy) -> PublishPolicy:
+        return PublishPolicy(
+            qos=section.get("qos", base.qos),
+            retain=section.get("retain", base.retain),
+            expiry=section.get("expiry", base.expiry),
+        )
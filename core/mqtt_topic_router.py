@@ -0,0 +1,113 @@
+import threading
+from typing import Any, Callable
+
+Handler = Callable[[str, str], Any]
+
+
+class _Node:
+    __slots__ = ("children", "handler", "multi")
+
+    def __init__(self):
+        self.children: dict[str, "_Node"] = {}
+        self.handler: Handler | None = None     # filter ends at this level
+        self.multi: Handler | None = None       # "<this level>/#"
+
+
+class TopicRouter:
+    """
+    Topic filter → handler table for incoming MQTT messages.
+
+    Filters without wildcards live in a plain dict (one lookup per message),
+    filters with ``+``/``#`` - in a trie keyed by topic level, so resolving a
+    topic costs O(topic depth) instead of matching every registered filter.
+    Matching follows MQTT rules: ``#`` also matches the parent level and
+    wildcards at the first level do not match ``$``-topics.
+    """
+
+    def __init__(self, mapping: dict[str, Handler] | None = None):
+        self._lock = threading.Lock()
+        self._exact: dict[str, Handler] = {}
+        self._root = _Node()
+        self._filters: dict[str, Handler] = {}
+        for topic_filter, handler in (mapping or {}).items():
+            self.add(topic_filter, handler)
+
+    def __contains__(self, topic_filter: str) -> bool:
+        return topic_filter in self._filters
+
+    def __len__(self) -> int:
+        return len(self._filters)
+
+    def filters(self) -> list[str]:
+        with self._lock:
+            return list(self._filters)
+
+    def add(self, topic_filter: str, handler: Handler) -> None:
+        """Register (or replace) the handler of ``topic_filter``."""
+        with self._lock:
+            self._filters[topic_filter] = handler
+            if "+" not in topic_filter and "#" not in topic_filter:
+                self._exact[topic_filter] = handler
+                return
+            node = self._root
+            levels = topic_filter.split("/")
+            for level in levels[:-1]:
+                node = node.children.setdefault(level, _Node())
+            if levels[-1] == "#":
+                node.multi = handler
+            else:
+                node = node.children.setdefault(levels[-1], _Node())
+                node.handler = handler
+
+    def remove(self, topic_filter: str) -> bool:
+        """Unregister ``topic_filter``; return False if it was not registered."""
+        with self._lock:
+            if self._filters.pop(topic_filter, None) is None:
+                return False
+            if self._exact.pop(topic_filter, None) is not None:
+                return True
+            levels = topic_filter.split("/")
+            path = [self._root]
+            for level in levels[:-1]:
+                path.append(path[-1].children[level])
+            last = path[-1]
+            if levels[-1] == "#":
+                last.multi = None
+            else:
+                path.append(last.children[levels[-1]])
+                path[-1].handler = None
+            # prune empty branches bottom-up
+            for idx in range(len(path) - 1, 0, -1):
+                node = path[idx]
+                if node.children or node.handler or node.multi:
+                    break
+                del path[idx - 1].children[levels[idx - 1]]
+            return True
+
+    def match(self, topic: str) -> list[Handler]:
+        """All handlers whose filter matches ``topic``."""
+        with self._lock:
+            found = []
+            exact = self._exact.get(topic)
+            if exact is not None:
+                found.append(exact)
+            levels = topic.split("/")
+            self._walk(self._root, levels, 0, found, topic.startswith("$"))
+            return found
+
+    def _walk(self, node: _Node, levels: list[str], idx: int, found: list, dollar: bool):
+        # no wildcard matches a $-topic at the first level
+        wildcards = not (dollar and idx == 0)
+        if wildcards and node.multi is not None:
+            found.append(node.multi)
+        if idx == len(levels):
+            if node.handler is not None:
+                found.append(node.handler)
+            return
+        child = node.children.get(levels[idx])
+        if child is not None:
+            self._walk(child, levels, idx + 1, found, dollar)
+        if wildcards:
+            child = node.children.get("+")
+            if child is not None:
+                self._walk(child, levels, idx + 1, found, dollar)
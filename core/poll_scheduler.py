@@ -0,0 +1,227 @@
+import heapq
+import random
+import threading
+import time
+import zlib
+from dataclasses import dataclass, replace
+
+from core.tuya import tuya_constants as const
+
+
+# Errors meaning "device is not reachable right now" - back off hard
+_UNREACHABLE_ERRORS = {const.ErrorStatus.ERR_CONNECT.value, const.ErrorStatus.ERR_OFFLINE.value}
+
+
+@dataclass(frozen=True)
+class PollPolicy:
+    min_interval: float
+    max_interval: float
+    backoff_factor: float = 1.5     # interval growth while state is unchanged
+    error_interval: float = 120.0   # upper bound of the backoff for unreachable devices
+
+
+@dataclass
+class _DeviceSchedule:
+    policy: PollPolicy
+    interval: float
+    due: float
+    last_dps: dict | None = None
+
+
+class PollScheduler:
+    """
+    Per-device poll scheduler: each device has its own next-due time.
+
+    * after a command or a DP change the interval drops to ``min_interval``;
+    * while the state does not change it grows by ``backoff_factor`` up to
+      ``max_interval``;
+    * 901/905 answers push it to ``max_interval`` and then double it up to
+      ``error_interval``.
+
+    To avoid a burst of polls at one instant, a new device starts at a phase
+    offset derived from its id (spread over ``min_interval``) and every
+    periodic reschedule is jittered by ``±jitter`` of the interval.
+
+    Thread-safe: ``pop_due``/``wait`` are used by the polling thread, the
+    ``on_*`` feedback comes from device workers and MQTT handlers.
+    """
+
+    def __init__(
+        self,
+        default_policy: PollPolicy,
+        device_policies: dict[str, PollPolicy] | None = None,
+        category_policies: dict[str, PollPolicy] | None = None,
+        push_policy: PollPolicy | None = None,
+        jitter: float = 0.0,
+        rng: random.Random | None = None,
+    ):
+        self._default = default_policy
+        self._by_device = device_policies or {}
+        self._by_category = category_policies or {}
+        # devices in push mode are polled only as a slow consistency check
+        self._push = push_policy
+        self._jitter = jitter
+        self._rng = rng or random.Random()
+        self._overruns = 0
+        self._max_lag = 0.0
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._devices: dict[str, _DeviceSchedule] = {}
+        self._heap: list[tuple[float, str]] = []
+
+    @classmethod
+    def from_config(
+        cls, cfg: dict, default_interval: float, push_interval: float | None = None
+    ) -> "PollScheduler":
+        """
+        Build from ``[polling]`` section of settings/config.toml. Without the
+        section every device is polled each ``default_interval`` seconds,
+        i.e. the legacy fixed sweep. ``push_interval`` is the consistency
+        poll period of devices in push mode.
+        """
+        default = PollPolicy(
+            min_interval=cfg.get("min_interval", default_interval),
+            max_interval=cfg.get("max_interval", default_interval),
+            backoff_factor=cfg.get("backoff_factor", 1.5),
+            error_interval=cfg.get("error_interval", max(default_interval, 120.0)),
+        )
+        categories = {k: replace(default, **v) for k, v in cfg.get("categories", {}).items()}
+        devices = {k: replace(default, **v) for k, v in cfg.get("devices", {}).items()}
+        push = None
+        if push_interval:
+            push = replace(default, min_interval=push_interval, max_interval=push_interval)
+        return cls(default, devices, categories, push, jitter=cfg.get("jitter", 0.1))
+
+    # ------------------------------------------------------------------ #
+    # Device set                                                         #
+    # ------------------------------------------------------------------ #
+    def policy_for(self, dev_id: str, category: str = "", persistent: bool = False) -> PollPolicy:
+        if dev_id in self._by_device:
+            return self._by_device[dev_id]
+        if persistent and self._push:
+            return self._push
+        return self._by_category.get(category) or self._default
+
+    def sync(self, devices: dict) -> None:
+        """Add new devices (due immediately) and forget removed ones."""
+        now = time.monotonic()
+        with self._lock:
+            for dev_id in self._devices.keys() - devices.keys():
+                del self._devices[dev_id]
+            for dev_id in devices.keys() - self._devices.keys():
+                dev = devices[dev_id]
+                policy = self.policy_for(
+                    dev_id, getattr(dev, "category", ""), getattr(dev, "persistent", False)
+                )
+                due = now + self._phase(dev_id, policy.min_interval)
+                self._devices[dev_id] = _DeviceSchedule(policy, policy.min_interval, due)
+                heapq.heappush(self._heap, (due, dev_id))
+
+    # ------------------------------------------------------------------ #
+    # Polling thread                                                     #
+    # ------------------------------------------------------------------ #
+    def pop_due(self, now: float | None = None) -> list[str]:
+        """Return devices whose poll is due and provisionally reschedule them."""
+        now = time.monotonic() if now is None else now
+        due = []
+        with self._lock:
+            while self._heap and self._heap[0][0] <= now:
+                when, dev_id = heapq.heappop(self._heap)
+                sched = self._devices.get(dev_id)
+                if sched is None or sched.due != when:
+                    continue            # removed or rescheduled - stale heap entry
+                lag = now - when
+                if lag > sched.interval:
+                    # the poll thread is more than a whole cycle behind schedule
+                    self._overruns += 1
+                    self._max_lag = max(self._max_lag, lag)
+                due.append(dev_id)
+                self._schedule(dev_id, sched, self._next_due(now, sched.interval))
+        return due
+
+    def take_overruns(self) -> tuple[int, float]:
+        """Return (count, max lag in seconds) of late polls since the last call."""
+        with self._lock:
+            stats = (self._overruns, self._max_lag)
+            self._overruns, self._max_lag = 0, 0.0
+        return stats
+
+    def wait(self, max_wait: float) -> None:
+        """Sleep until the next poll is due, a command arrives or ``max_wait`` passes."""
+        with self._lock:
+            delay = self._heap[0][0] - time.monotonic() if self._heap else max_wait
+        if delay > 0:
+            self._wakeup.wait(min(delay, max_wait))
+        self._wakeup.clear()
+
+    # ------------------------------------------------------------------ #
+    # Feedback                                                           #
+    # ------------------------------------------------------------------ #
+    def on_command(self, dev_id: str) -> None:
+        """A command was queued for the device - follow up quickly."""
+        with self._lock:
+            sched = self._devices.get(dev_id)
+            if sched is None:
+                return
+            sched.interval = sched.policy.min_interval
+            due = time.monotonic() + sched.interval
+            if due < sched.due:
+                self._schedule(dev_id, sched, due)
+        self._wakeup.set()
+
+    def defer(self, dev_id: str, due: float) -> None:
+        """Do not poll the device before ``due`` (e.g. its circuit breaker is open)."""
+        with self._lock:
+            sched = self._devices.get(dev_id)
+            if sched is not None and due > sched.due:
+                self._schedule(dev_id, sched, due)
+
+    def on_status(self, dev_id: str, dps: dict) -> None:
+        """Successful poll: speed up on change, slow down while idle."""
+        with self._lock:
+            sched = self._devices.get(dev_id)
+            if sched is None:
+                return
+            policy = sched.policy
+            if sched.last_dps is None or dps != sched.last_dps:
+                sched.interval = policy.min_interval
+            else:
+                sched.interval = min(sched.interval * policy.backoff_factor, policy.max_interval)
+            sched.last_dps = dict(dps)
+            self._schedule(dev_id, sched, self._next_due(time.monotonic(), sched.interval))
+
+    def on_error(self, dev_id: str, err_code: str | None) -> None:
+        with self._lock:
+            sched = self._devices.get(dev_id)
+            if sched is None:
+                return
+            policy = sched.policy
+            if err_code in _UNREACHABLE_ERRORS:
+                sched.interval = min(
+                    max(sched.interval * 2, policy.max_interval), policy.error_interval
+                )
+            else:
+                sched.interval = min(sched.interval * policy.backoff_factor, policy.max_interval)
+            self._schedule(dev_id, sched, self._next_due(time.monotonic(), sched.interval))
+
+    def interval(self, dev_id: str) -> float | None:
+        with self._lock:
+            sched = self._devices.get(dev_id)
+            return sched.interval if sched else None
+
+    # ------------------------------------------------------------------ #
+    # Internals                                                          #
+    # ------------------------------------------------------------------ #
+    @staticmethod
+    def _phase(dev_id: str, period: float) -> float:
+        """Stable per-device offset in [0, period) derived from the device id."""
+        return zlib.crc32(dev_id.encode()) / 2**32 * period
+
+    def _next_due(self, now: float, interval: float) -> float:
+        if not self._jitter:
+            return now + interval
+        return now + interval * (1 + self._rng.uniform(-self._jitter, self._jitter))
+
+    def _schedule(self, dev_id: str, sched: _DeviceSchedule, due: float) -> None:
+        sched.due = due
+        heapq.heappush(self._heap, (due, dev_id))
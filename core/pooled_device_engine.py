@@ -0,0 +1,117 @@
+import itertools
+import queue
+import threading
+from dataclasses import dataclass
+
+
+@dataclass
+class _DeviceSlot:
+    device: object
+    running: bool = False
+    queued_prio: int | None = None    # priority of the valid entry in the ready queue
+
+
+class PooledDeviceEngine:
+    """
+    Фиксированный пул потоков обслуживает очереди команд всех TuyaDevice.
+
+    Транспорт остаётся блокирующим (tinytuya), но число потоков ограничено
+    ``workers`` вместо одного потока на устройство. Устройство, у которого
+    есть задачи, стоит в общей очереди готовности с приоритетом головы своей
+    очереди, поэтому команды управления (priority=0) обгоняют опросы и
+    внутри устройства, и между устройствами. Одно устройство в каждый момент
+    обслуживает не более одного потока - порядок команд сохраняется.
+    """
+
+    def __init__(self, logger, workers: int = 8):
+        self._logger = logger
+        self._ready = queue.PriorityQueue()
+        self._seq = itertools.count()
+        self._slots: dict[str, _DeviceSlot] = {}
+        self._lock = threading.Lock()
+        self._threads = [
+            threading.Thread(target=self._worker, daemon=True, name=f"TuyaPool-{idx}")
+            for idx in range(max(1, workers))
+        ]
+        for th in self._threads:
+            th.start()
+        self._logger.info(f"Pooled device engine started: {len(self._threads)} worker(s)")
+
+    # ------------------------------------------------------------------ #
+    # API used by TuyaDevice                                             #
+    # ------------------------------------------------------------------ #
+    def attach(self, device):
+        with self._lock:
+            self._slots[device.dev_id] = _DeviceSlot(device)
+        self.notify(device)
+
+    def detach(self, device):
+        with self._lock:
+            slot = self._slots.get(device.dev_id)
+            if slot is not None and slot.device is device:
+                del self._slots[device.dev_id]
+
+    def notify(self, device):
+        with self._lock:
+            slot = self._slots.get(device.dev_id)
+            if slot is None or slot.device is not device or slot.running:
+                return      # a running device is re-queued by its worker
+            self._schedule(slot)
+
+    def stop(self):
+        for _ in self._threads:
+            self._ready.put((-1, next(self._seq), None))
+        for th in self._threads:
+            th.join(timeout=1.0)
+        self._logger.debug("Pooled device engine stopped")
+
+    # ------------------------------------------------------------------ #
+    # Internals                                                          #
+    # ------------------------------------------------------------------ #
+    @staticmethod
+    def _head_priority(device) -> int | None:
+        q = device._cmd_queue
+        with q.mutex:
+            return q.queue[0][0] if q.queue else None
+
+    def _schedule(self, slot: _DeviceSlot):
+        """Put the device into the ready queue (caller holds the lock)."""
+        prio = self._head_priority(slot.device)
+        if prio is None:
+            return
+        # a better (lower) priority adds a new entry, older ones become stale
+        if slot.queued_prio is None or prio < slot.queued_prio:
+            slot.queued_prio = prio
+            self._ready.put((prio, next(self._seq), slot.device.dev_id))
+
+    def _worker(self):
+        while True:
+            prio, _, dev_id = self._ready.get()
+            if dev_id is None:
+                break
+            with self._lock:
+                slot = self._slots.get(dev_id)
+                if slot is None or slot.running or slot.queued_prio != prio:
+                    continue            # stale entry
+                slot.running = True
+                slot.queued_prio = None
+            try:
+                self._run_one(slot.device)
+            finally:
+                with self._lock:
+                    slot.running = False
+                    if self._slots.get(dev_id) is slot and not slot.device._stop_worker_flag.is_set():
+                        self._schedule(slot)
+
+    def _run_one(self, device):
+        """Run a single task, so that one busy device cannot hold a worker forever."""
+        try:
+            task = device._cmd_queue.get_nowait()
+        except queue.Empty:
+            return
+        if device._drop_if_expired(task):
+            return
+        try:
+            device._run_task(task)
+        except Exception as exc:
+            self._logger.error(f"Engine error for {device.dev_id}: {exc}")
@@ -0,0 +1,209 @@
+import json
+import threading
+import time
+
+
+class StatusPublisher:
+    """
+    Публикация ``<service>/devices/<id>/status`` только при изменении.
+
+    Режимы (секция ``[status]`` settings/config.toml):
+
+    * ``full``  - legacy: полный JSON на каждый опрос;
+    * ``delta`` - полный JSON публикуется, только если изменилось хоть одно
+      значение (или раз в ``refresh_interval`` секунд, если он задан), а
+      изменившиеся DP дополнительно уходят в ``.../status/delta``, если
+      включён ``delta_topic``.
+
+    Служебные поля (``request_status_time``) на сравнение не влияют.
+    """
+
+    # fields that change on every poll and do not describe the device state
+    VOLATILE_FIELDS = frozenset({"request_status_time"})
+
+    def __init__(self, publish, service_id: str, mode: str = "full",
+                 refresh_interval: float = 0.0, delta_topic: bool = False):
+        if mode not in ("full", "delta"):
+            raise ValueError(f"Unknown status publish mode: {mode}")
+        self._publish = publish
+        self._service_id = service_id
+        self._delta = mode == "delta"
+        self._refresh_interval = refresh_interval
+        self._delta_topic = delta_topic
+        self._lock = threading.Lock()
+        # dev_id -> (last published state without volatile fields, publish time)
+        self._published: dict[str, tuple[dict, float]] = {}
+
+    @classmethod
+    def from_config(cls, publish, service_id: str, cfg: dict) -> "StatusPublisher":
+        return cls(
+            publish,
+            service_id,
+            mode=cfg.get("mode", "full"),
+            refresh_interval=cfg.get("refresh_interval", 0.0),
+            delta_topic=cfg.get("delta_topic", False),
+        )
+
+    def publish(self, dev_id: str, status: dict, now: float | None = None) -> bool:
+        """Publish ``status`` of the device; return False if it was suppressed."""
+        topic = f"{self._service_id}/devices/{dev_id}/status"
+        if not self._delta:
+            self._publish(topic, json.dumps(status))
+            return True
+
+        now = time.monotonic() if now is None else now
+        state = {k: v for k, v in status.items() if k not in self.VOLATILE_FIELDS}
+        with self._lock:
+            last, last_time = self._published.get(dev_id, (None, 0.0))
+            changed = self._changed(last, state)
+            refresh = bool(self._refresh_interval) and now - last_time >= self._refresh_interval
+            if not (last is None or changed or refresh):
+                return False
+            self._published[dev_id] = (state, now)
+
+        self._publish(topic, json.dumps(status))
+        if self._delta_topic and changed:
+            # a delta is an event, not a state - never retain it
+            self._publish(f"{topic}/delta", json.dumps(changed), retain=False)
+        return True
+
+    def forget(self, dev_id: str) -> None:
+        with self._lock:
+            self._published.pop(dev_id, None)
+
+    @staticmethod
+    def _changed(last: dict | None, state: dict) -> dict:
+        """DPs that differ from the last published state (all of them at first)."""
+        if last is None:
+            return dict(state)
+        changed = {k: v for k, v in state.items() if last.get(k, object()) != v}
+        # a field that vanished (e.g. "err" after recovery) is a change too
+        changed.update({k: None for k in last.keys() - state.keys()})
+        return changed
+
+
+class AggregateStatusPublisher:
+    """
+    Сводный снимок статусов всех устройств в ``<service>/devices/statuses``.
+
+    Обновления устройств только помечают снимок «грязным», а фоновый поток
+    публикует его не чаще раза в ``window`` секунд - один publish на окно
+    вместо N публикаций N-размерного JSON за цикл опроса.
+
+    ``shard``:
+
+    * ``none``     - один топик ``devices/statuses``;
+    * ``category`` - ``devices/statuses/<category>``;
+    * ``prefix``   - ``devices/statuses/<первые prefix_len символов id>``.
+
+    При шардировании публикуются только изменившиеся шарды. Служебные поля
+    (``request_status_time``) шард «грязным» не делают, а опустевший шард
+    очищается пустым retained-сообщением и больше не публикуется.
+    """
+
+    def __init__(self, publish, service_id: str, logger, window: float = 1.0,
+                 shard: str = "none", prefix_len: int = 2):
+        if shard not in ("none", "category", "prefix"):
+            raise ValueError(f"Unknown status shard mode: {shard}")
+        self._publish = publish
+        self._topic = f"{service_id}/devices/statuses"
+        self._logger = logger
+        self._window = window
+        self._shard = shard
+        self._prefix_len = prefix_len
+        self._lock = threading.Lock()
+        # shard key -> {dev_id: status}
+        self._shards: dict[str, dict[str, dict]] = {}
+        self._shard_of: dict[str, str] = {}
+        self._dirty: set[str] = set()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._loop, daemon=True, name="StatusAggregate")
+
+    @classmethod
+    def from_config(cls, publish, service_id: str, logger, cfg: dict) -> "AggregateStatusPublisher":
+        return cls(
+            publish,
+            service_id,
+            logger,
+            window=cfg.get("window", 1.0),
+            shard=cfg.get("shard", "none"),
+            prefix_len=cfg.get("prefix_len", 2),
+        )
+
+    def start(self):
+        self._thread.start()
+        self._logger.info(f"Aggregated status snapshot every {self._window}s, shard={self._shard}")
+
+    def stop(self, timeout: float = 2.0):
+        self._stop.set()
+        self._thread.join(timeout)
+        self.flush()
+
+    def update(self, dev_id: str, status: dict, category: str = "") -> None:
+        key = self._shard_key(dev_id, category)
+        with self._lock:
+            old_key = self._shard_of.get(dev_id)
+            if old_key is not None and old_key != key:
+                self._drop(dev_id)
+            shard = self._shards.setdefault(key, {})
+            last = shard.get(dev_id)
+            shard[dev_id] = status
+            self._shard_of[dev_id] = key
+            if last is None or self._state(last) != self._state(status):
+                self._dirty.add(key)
+
+    def forget(self, dev_id: str) -> None:
+        with self._lock:
+            self._drop(dev_id)
+
+    def flush(self) -> int:
+        """Publish dirty shards now; return the number of publishes."""
+        with self._lock:
+            dirty, self._dirty = self._dirty, set()
+            # serialize under the lock, statuses are replaced, never mutated;
+            # a shard without devices is gone and gets an empty payload
+            payloads = [
+                (key, json.dumps(self._shards[key]) if key in self._shards else "")
+                for key in dirty
+            ]
+        for key, payload in payloads:
+            topic = self._topic if self._shard == "none" else f"{self._topic}/{key}"
+            if payload:
+                self._publish(topic, payload)
+            else:
+                # clear the retained snapshot of the removed shard
+                self._publish(topic, payload, retain=True)
+        return len(payloads)
+
+    # ------------------------------------------------------------------ #
+    # Internals                                                          #
+    # ------------------------------------------------------------------ #
+    def _shard_key(self, dev_id: str, category: str) -> str:
+        match self._shard:
+            case "category":
+                return category or "unknown"
+            case "prefix":
+                return dev_id[: self._prefix_len]
+        return ""
+
+    @staticmethod
+    def _state(status: dict) -> dict:
+        return {k: v for k, v in status.items() if k not in StatusPublisher.VOLATILE_FIELDS}
+
+    def _drop(self, dev_id: str) -> None:
+        """Remove the device from its shard (caller holds the lock)."""
+        key = self._shard_of.pop(dev_id, None)
+        if key is None:
+            return
+        shard = self._shards.get(key, {})
+        shard.pop(dev_id, None)
+        if not shard:
+            self._shards.pop(key, None)
+        self._dirty.add(key)
+
+    def _loop(self):
+        while not self._stop.wait(self._window):
+            try:
+                self.flush()
+            except Exception as exc:
+                self._logger.error(f"Aggregated status publish failed: {exc}")
@@ -0,0 +1,142 @@
+"""
+Кэш метаданных Tuya Cloud (name, product_name, mac, icon, mapping, key ...).
+
+``getdevices`` отдаёт весь список устройств аккаунта с DP-маппингами, а
+скан и add спрашивали облако заново на каждое устройство. Ответы облака
+сохраняются здесь:
+
+* по id устройства - запись без ``mapping`` + время получения;
+* по productKey (``product_id``) - ``mapping``/``product_name``/``category``,
+  общие для всех устройств одного продукта, поэтому маппинг хранится один раз
+  и доступен даже для ещё неизвестного облаку устройства из UDP-скана.
+
+Запись свежая ``ttl`` секунд; устаревшая отдаётся только когда облако
+недоступно (``lookup(..., stale=True)``). Файл пишется атомарно после
+каждого ответа облака - они редкие.
+"""
+import logging
+import os
+import threading
+import time
+
+from core.device_registry_backend import _read_json, atomic_write_json
+from core.tuya import tuya_constants as const
+
+# поля продукта, одинаковые для всех устройств с одним productKey
+_PRODUCT_FIELDS = ("product_name", "category", "mapping")
+
+
+class CloudMetadataCache:
+    def __init__(self, path: str | None, ttl: float = 86400.0, logger=None, clock=time.time):
+        self.path = path
+        self.ttl = ttl
+        self._logger = logger or logging.getLogger("CloudCache")
+        self._clock = clock
+        self._lock = threading.Lock()
+        data = _read_json(path, {}, self._logger) if path else {}
+        self._devices: dict[str, dict] = data.get("devices", {})
+        self._products: dict[str, dict] = data.get("products", {})
+
+    @classmethod
+    def from_config(cls, cfg: dict, logger=None) -> "CloudMetadataCache":
+        return cls(cls.resolve_path(cfg), cfg.get("cache_ttl", 86400.0), logger)
+
+    @staticmethod
+    def resolve_path(cfg: dict) -> str | None:
+        """
+        ``TUYA2MQTT_CLOUD_CACHE_FILE``, then ``[cloud] cache_file``, then
+        ``cloud_cache.json`` next to ``TUYA2MQTT_LOCAL_SCAN_FILE``; None keeps
+        the cache in memory only. Never relative to the working directory.
+        """
+        path = const.CLOUD_CACHE_FILE or cfg.get("cache_file")
+        if path:
+            return path
+        if const.LOCAL_SCAN_FILE:
+            return os.path.join(os.path.dirname(os.path.abspath(const.LOCAL_SCAN_FILE)), "cloud_cache.json")
+        return None
+
+    # ------------------------------------------------------------------ #
+    # Lookups                                                            #
+    # ------------------------------------------------------------------ #
+    def get(self, dev_id: str, stale: bool = False) -> dict | None:
+        """Cloud record of ``dev_id`` (a copy with ``mapping``), None if absent or expired."""
+        with self._lock:
+            item = self._devices.get(dev_id)
+            if item is None or (not stale and self._expired(item)):
+                return None
+            return self._entry(item)
+
+    def lookup(self, dev_ids: list[str], stale: bool = False) -> tuple[dict[str, dict], list[str]]:
+        """(found id -> record, missing ids); with ``stale`` expired records count as found."""
+        found, missing = {}, []
+        for dev_id in dev_ids:
+            entry = self.get(dev_id, stale)
+            if entry is None:
+                missing.append(dev_id)
+            else:
+                found[dev_id] = entry
+        return found, missing
+
+    def product(self, product_key: str) -> dict | None:
+        """product_name / category / mapping by productKey, regardless of age."""
+        with self._lock:
+            info = self._products.get(product_key)
+            return dict(info) if info else None
+
+    def age(self, dev_id: str) -> float | None:
+        with self._lock:
+            item = self._devices.get(dev_id)
+            return None if item is None else self._clock() - item["fetched"]
+
+    # ------------------------------------------------------------------ #
+    # Updates                                                            #
+    # ------------------------------------------------------------------ #
+    def put_many(self, cloud_devices: list[dict]) -> None:
+        """Store a ``getdevices(include_map=True)`` answer and persist the cache."""
+        now = self._clock()
+        with self._lock:
+            for dev in cloud_devices:
+                dev_id = dev.get("id")
+                if not dev_id:
+                    continue
+                record = {k: v for k, v in dev.items() if k != "mapping"}
+                product_id = dev.get("product_id")
+                if product_id:
+                    info = self._products.setdefault(product_id, {})
+                    info.update({k: dev[k] for k in _PRODUCT_FIELDS if dev.get(k)})
+                elif dev.get("mapping"):
+                    record["mapping"] = dev["mapping"]
+                self._devices[dev_id] = {"fetched": now, "device": record}
+            self._save_locked()
+
+    def invalidate(self, dev_id: str | None = None) -> None:
+        """Drop one device (e.g. its local key was rotated) or the whole cache."""
+        with self._lock:
+            if dev_id is None:
+                self._devices.clear()
+            elif self._devices.pop(dev_id, None) is None:
+                return
+            self._save_locked()
+
+    # ------------------------------------------------------------------ #
+    # Internals                                                          #
+    # ------------------------------------------------------------------ #
+    def _expired(self, item: dict) -> bool:
+        return self._clock() - item["fetched"] > self.ttl
+
+    def _entry(self, item: dict) -> dict:
+        entry = dict(item["device"])
+        info = self._products.get(entry.get("product_id"))
+        if info:
+            for key in _PRODUCT_FIELDS:
+                if key in info:
+                    entry.setdefault(key, info[key])
+        return entry
+
+    def _save_locked(self):
+        if not self.path:
+            return
+        try:
+            atomic_write_json(self.path, {"devices": self._devices, "products": self._products})
+        except OSError as exc:
+            self._logger.error(f"Error writing {self.path}: {exc}")
@@ -1,22 +1,38 @@
+import copy
 import sys
+import threading
 import tinytuya
 from .tinytuya_cloud_transport import TinyCloud
 import requests.exceptions as req_exc
 from core.tuya import tuya_constants as const
+from .cloud_metadata_cache import CloudMetadataCache
 
 
 class CloudAPI:
     """
     Тонкая обёртка над tinytuya.Cloud:
     • следит за наличием учётных данных,
-    • умеет переинициализироваться при потере соединения.
+    • умеет переинициализироваться при потере соединения,
+    • отвечает из CloudMetadataCache, пока записи свежие,
+    • id устройств передаются в каждый вызов: запрос идёт через собственную
+      копию tinytuya.Cloud с общим токеном, параллельно - не больше
+      ``max_concurrency`` запросов.
     """
 
-    def __init__(self, logger):
+    def __init__(self, logger, cache: CloudMetadataCache | None = None, max_concurrency: int = 4):
         self._logger = logger
         self._cloud = None
+        self._cache = cache
+        self._limiter = threading.BoundedSemaphore(max(1, max_concurrency))
+        # idle per-request copies of self._cloud
+        self._clients: list = []
+        self._clients_lock = threading.Lock()
         self._init_cloud()
 
+    @property
+    def cache(self) -> CloudMetadataCache | None:
+        return self._cache
+
     def _init_cloud(self):
         if not all((const.API_KEY, const.API_SECRET, const.API_REGION)):
             self._logger.critical("Нет учётных данных Tuya Cloud в .env")
@@ -42,21 +58,77 @@ class CloudAPI:
             self._logger.error(f"Unexpected Cloud init error: {exc}")
             self._cloud = None
     
-    def tuya_cloud_request(self):
-        tuya_cloud_answer = {}
-        try:
-            tuya_cloud_answer = self._cloud.getdevices(verbose=False, include_map=True)
-            return tuya_cloud_answer
-        except Exception as e:
-            self._logger.error(f"Exception calling cloud.getdevices: {e}")
-            return
-    
+    def get_devices(self, dev_ids: list[str], force: bool = False, allow_stale: bool = True,
+                    partial: bool = True):
+        """
+        Cloud records of ``dev_ids`` (with DP mapping) or the cloud error dict.
+
+        Fresh cached records are returned without a cloud call; ``force``
+        skips the cache. Every cloud answer refreshes the cache for the whole
+        account. If the cloud fails and ``allow_stale`` is set, expired
+        records are served instead - with ``partial=False`` only when all of
+        ``dev_ids`` are cached, otherwise the error lists the ``Missing`` ids.
+        """
+        if self._cache is not None and not force:
+            found, missing = self._cache.lookup(dev_ids)
+            if not missing:
+                return list(found.values())
+        answer = self._request_devices(dev_ids)
+        if isinstance(answer, list):
+            if self._cache is not None:
+                self._cache.put_many(answer)
+            wanted = set(dev_ids)
+            return [dev for dev in answer if dev.get("id") in wanted]
+        if allow_stale and self._cache is not None:
+            found, missing = self._cache.lookup(dev_ids, stale=True)
+            if missing and not partial:
+                self._logger.warning(f"Tuya Cloud unavailable, no cached data for {missing}")
+                return {**answer, "Missing": missing}
+            if found:
+                self._logger.warning(
+                    f"Tuya Cloud unavailable, using cached data for {list(found)}"
+                    + (f", no data for {missing}" if missing else "")
+                )
+                return list(found.values())
+        return answer
+
+    def _request_devices(self, dev_ids: list[str]):
+        if self.is_cloud_init() is None:
+            return {"Error": "Tuya Cloud is not initialized", "Payload": None}
+        with self._limiter:
+            client = self._acquire_client(dev_ids)
+            issued_token = client.token
+            try:
+                answer = client.getdevices(verbose=False, include_map=True)
+            except Exception as e:
+                self._logger.error(f"Exception calling cloud.getdevices: {e}")
+                answer = None
+            finally:
+                self._release_client(client, issued_token)
+        if answer is None:
+            return {"Error": "Exception calling cloud.getdevices", "Payload": None}
+        return answer
+
+    def _acquire_client(self, dev_ids: list[str]):
+        """Idle copy of the shared client, carrying the current token and these ids."""
+        with self._clients_lock:
+            client = self._clients.pop() if self._clients else copy.copy(self._cloud)
+            client.token = self._cloud.token
+        client.apiDeviceID = ", ".join(dev_ids)
+        return client
+
+    def _release_client(self, client, issued_token):
+        with self._clients_lock:
+            # tinytuya renews an expired token on the copy - share it
+            if client.token and client.token != issued_token:
+                self._cloud.token = client.token
+            client.apiDeviceID = ""
+            self._clients.append(client)
+
     def is_cloud_init(self):
         if self._cloud is None:
-            self._init_cloud()
+            with self._clients_lock:
+                if self._cloud is None:
+                    self._clients.clear()
+                    self._init_cloud()
         return self._cloud
-
-    def set_device_id(self, dev_id: list):
-        print(dev_id)
-        self._cloud.apiDeviceID = dev_id
-        print(self._cloud)
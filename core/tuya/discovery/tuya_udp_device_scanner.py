@@ -5,6 +5,7 @@ from core.tuya import tuya_constants as const
 import threading
 import socket
 import json
+import queue
 import select
 import time
 import threading
@@ -16,10 +17,144 @@ UDPPORTS = tuya_constants.UDPPORTS        # Tuya 3.3 encrypted UDP Port
 UDPPORTAPP = tuya_constants.UDPPORTAPP    # Tuya app encrypted UDP Port
 
 
+def open_discovery_sockets() -> list[socket.socket]:
+    """
+    UDP sockets on the three Tuya broadcast ports. SO_REUSEADDR and
+    SO_REUSEPORT let a scan, the background DiscoveryListener and
+    ``tinytuya.deviceScan`` (binds with SO_REUSEPORT only) listen at the same
+    time: broadcasts are delivered to every socket bound to the port.
+    """
+    sockets = []
+    try:
+        for port in (UDPPORT, UDPPORTS, UDPPORTAPP):
+            sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM, socket.IPPROTO_UDP)
+            sockets.append(sock)
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+            if hasattr(socket, "SO_REUSEPORT"):
+                # on Linux a SO_REUSEPORT bind fails unless every socket on the port has it
+                sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_BROADCAST, 1)
+            sock.bind(("", port))
+    except OSError:
+        for sock in sockets:
+            sock.close()
+        raise
+    return sockets
+
+
+def decode_discovery_packet(data: bytes) -> dict | None:
+    """Decrypted device announcement, None if it is not a Tuya broadcast."""
+    try:
+        result = json.loads(tinytuya.decrypt_udp(data))
+    except Exception:
+        return None
+    if not isinstance(result, dict) or 'gwId' not in result:
+        return None
+    return result
+
+
+def make_scan_entry(result: dict, ip: str, lookup=None) -> dict:
+    """Scan response entry of a decoded announcement; ``lookup(gwId)`` -> (name, key, mac)."""
+    entry = dict(result)
+    (dname, dkey, mac) = lookup(entry['gwId']) if lookup else ("", "", "")
+    entry["name"] = dname
+    entry["key"] = dkey
+    entry["mac"] = mac
+    entry["ip"] = ip
+    entry["origin"] = "broadcast"
+
+    if 'id' not in entry:
+        entry['id'] = entry['gwId']
+
+    # Format 20-digit IDs
+    if not mac and len(entry['gwId']) == 20:
+        try:
+            mac = bytearray.fromhex(entry['gwId'][-12:])
+            entry["mac"] = '%02x:%02x:%02x:%02x:%02x:%02x' % tuple(mac)
+        except ValueError:
+            pass
+    return entry
+
+
+class _CloudBatcher:
+    """
+    Resolves discovered devices against the cloud off the UDP loop.
+
+    Devices submitted by the scan are grouped into batches of up to
+    ``batch_size`` ids (or whatever arrived within ``max_delay`` seconds)
+    and merged with one cloud request per batch in a background thread;
+    every merged device is handed to ``on_merged`` as soon as its batch is
+    resolved. ``close()`` flushes the rest and waits for it.
+    """
+
+    _CLOSE = object()
+
+    def __init__(self, merge_batch, on_merged, logger, batch_size: int = 20, max_delay: float = 0.5):
+        self._merge_batch = merge_batch
+        self._on_merged = on_merged
+        self._logger = logger
+        self._batch_size = batch_size
+        self._max_delay = max_delay
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._loop, daemon=True, name="ScanCloudBatcher")
+        self._thread.start()
+
+    def submit(self, device: dict):
+        """``device`` is one ``{ip: scan data}`` item from the scan generator."""
+        for item in device.items():
+            self._queue.put(item)
+
+    def close(self):
+        self._queue.put(self._CLOSE)
+        self._thread.join()
+
+    def _loop(self):
+        closed = False
+        while not closed:
+            item = self._queue.get()
+            if item is self._CLOSE:
+                break
+            batch = [item]
+            deadline = time.monotonic() + self._max_delay
+            while len(batch) < self._batch_size:
+                timeout = deadline - time.monotonic()
+                try:
+                    item = self._queue.get(timeout=timeout) if timeout > 0 else self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is self._CLOSE:
+                    closed = True
+                    break
+                batch.append(item)
+            self._resolve(batch)
+
+    def _resolve(self, batch):
+        try:
+            merged = self._merge_batch(batch)
+        except Exception as exc:
+            self._logger.error(f"Cloud merge of {len(batch)} scanned device(s) failed: {exc}")
+            return
+        for device in merged:
+            try:
+                self._on_merged(device)
+            except Exception as exc:
+                self._logger.error(f"Publishing scanned device failed: {exc}")
+
+
 class Scanner:
     """Инкапсулирует все три варианта скана локальной сети + мердж с облаком."""
-    def __init__(self, mqtt, cloud_api, logger, device_store, scan_time: int = 15):
+    def __init__(self, mqtt, cloud_api, logger, device_store, scan_time: int = 15,
+                 cloud_batch_size: int = 20, cloud_batch_delay: float = 0.5,
+                 discovery=None, discovery_max_age: float = 60.0, discovery_warmup: float = 12.0,
+                 fresh_window: float = 5.0):
         self._mqtt = mqtt
+        # DiscoveryListener: scans are answered from its index once it is warm
+        self._discovery = discovery
+        self._discovery_max_age = discovery_max_age
+        self._discovery_warmup = discovery_warmup
+        self._fresh_window = fresh_window
+        self._cloud_batch_size = max(1, cloud_batch_size)
+        self._cloud_batch_delay = cloud_batch_delay
         self._tuya_cloud = cloud_api
         self._logger = logger
         self._scan_time = scan_time
@@ -40,18 +175,17 @@ class Scanner:
         response_topic = "tuya2mqtt/bridge/response/scan"
         self._logger.info("Starting scan local network.")
         try:
-            # @ Need to remove tinytuya function deviceScan 
-            devices = devices = tinytuya.deviceScan()
+            # discovery cache when warm, otherwise our own UDP scan; the
+            # basic scan has no scan_time, do not inherit the last scan_gen one
+            devices = {}
+            for device in self._discovered_devices(scan_time=self._DEFAULT_SCAN_TIME):
+                devices.update(device)
             self._process_basic_scan(devices, response_topic)
             self._logger.info("Scan local network finished")
-        except OSError as oserror:
-            if oserror.errno == 101:
-                self._logger.error(f"{oserror.errno}: {oserror.strerror}")
-                # self._set_state(const.BridgeState.OFFLINE)
         except Exception as e:
-            self._logger.error(f"Unknown error scan local devices: {e}")
+            self._scan_failed(response_topic, e)
 
-    def scan_gen_local_network(self, scan_time: int | None):
+    def scan_gen_local_network(self, scan_time: int | None, fresh: bool = False):
         response_topic = "tuya2mqtt/bridge/response/scan_gen"
         self._logger.info("Starting SCAN local network by generator func.")
         self.set_scan_time(scan_time)
@@ -59,19 +193,22 @@ class Scanner:
         if self._stop_scan_event.is_set():
             self._stop_scan_event.clear()
         try:
-            gen = self._scan_local_network_gen(
-                verbose=False,
-                scantime=self._scan_time,
-                color=False,
-                poll=False
-            )
-            for device in gen:
-                merged_device = next(self._merge_scan_with_cloud(device), None)
-                if merged_device:
+            gen = self._discovered_devices(fresh, scan_time, self._scan_time)
+            lock = threading.Lock()
+
+            def _publish(merged_device):
+                with lock:
                     self._mqtt.mqtt_publish_value_to_topic(
-                    response_topic,
-                    json.dumps(merged_device))
+                        response_topic,
+                        json.dumps(merged_device))
                     results.update(merged_device)
+
+            batcher = self._cloud_batcher(_publish)
+            try:
+                for device in gen:
+                    batcher.submit(device)
+            finally:
+                batcher.close()
             if not results:
                 self._mqtt.mqtt_publish_value_to_topic(
                     response_topic,
@@ -80,14 +217,10 @@ class Scanner:
             self._update_local_scan_file(results)
             self._logger.info("SCAN local network by generator func finished")
             # self._stop_scan_event.clear()
-        except OSError as oserror:
-            if oserror.errno == 101:
-                self._logger.error(f"{oserror.errno}: {oserror.strerror}")
-                # self._set_state(const.BridgeState.OFFLINE)
         except Exception as e:
-            self._logger.error(f"Unknown error scan local devices: {e}")
+            self._scan_failed(response_topic, e)
     
-    def scan_gen_all_local_network(self, scan_time: int | None):
+    def scan_gen_all_local_network(self, scan_time: int | None, fresh: bool = False):
         """
         Generator-based full-scan: incrementally publishes the entire
         set of discovered devices on each new detection, preserving insertion order.
@@ -98,22 +231,25 @@ class Scanner:
         if self._stop_scan_event.is_set():
             self._stop_scan_event.clear()
         try:
-            gen = self._scan_local_network_gen(
-                verbose=False,
-                scantime=self._scan_time,
-                color=False,
-                poll=False
-            )
+            gen = self._discovered_devices(fresh, scan_time, self._scan_time)
             all_results = OrderedDict()
-            for device in gen:
-                merged_device = next(self._merge_scan_with_cloud(device), None)
-                if merged_device:
+            lock = threading.Lock()
+
+            def _publish(merged_device):
                 # Add to cumulative OrderedDict and publish full snapshot
+                with lock:
                     all_results.update(merged_device)
                     self._mqtt.mqtt_publish_value_to_topic(
                         response_topic,
                         json.dumps(all_results)
                     )
+
+            batcher = self._cloud_batcher(_publish)
+            try:
+                for device in gen:
+                    batcher.submit(device)
+            finally:
+                batcher.close()
             if not all_results:
                 self._mqtt.mqtt_publish_value_to_topic(
                     response_topic,
@@ -123,13 +259,59 @@ class Scanner:
             self._update_local_scan_file(all_results)
             # self._stop_scan_event.clear()
             self._logger.info("SCAN ALL local network by generator func finished")
-        except OSError as oserror:
-            if oserror.errno == 101:
-                self._logger.error(f"{oserror.errno}: {oserror.strerror}")
-                # self._set_state(const.BridgeState.OFFLINE)
         except Exception as e:
-            self._logger.error(f"Unknown error scan local devices: {e}")
+            self._scan_failed(response_topic, e)
+
+
+    def _scan_failed(self, response_topic: str, exc: Exception):
+        """Log the failure and answer the request with an error instead of silence."""
+        if isinstance(exc, OSError):
+            self._logger.error(f"Scan local devices failed: {exc.errno}: {exc.strerror}")
+            error = {"Error": "Local network scan failed", "Err": exc.errno, "Payload": str(exc)}
+        else:
+            self._logger.error(f"Unknown error scan local devices: {exc}")
+            error = {"Error": "Unknown error scan local devices", "Payload": str(exc)}
+        self._mqtt.mqtt_publish_value_to_topic(response_topic, json.dumps(error))
+
+    def _discovery_ready(self) -> bool:
+        return self._discovery is not None and self._discovery.is_warm(self._discovery_warmup)
 
+    def _cached_devices(self):
+        for dev in self._discovery.recent(self._discovery_max_age):
+            yield {dev.ip: make_scan_entry(dev.data, dev.ip)}
+
+    def _discovered_devices(self, fresh: bool = False, window: float | None = None,
+                            scan_time: float | None = None):
+        """
+        Scanned devices as ``{ip: entry}``: straight from the discovery cache
+        when the listener is warm (with ``fresh`` - plus devices first heard
+        during the next ``window`` seconds, ``fresh_window`` by default),
+        otherwise from a UDP scan of ``scan_time`` seconds (``_DEFAULT_SCAN_TIME``
+        by default).
+        """
+        if not self._discovery_ready():
+            yield from self._scan_local_network_gen(
+                verbose=False,
+                scantime=self._DEFAULT_SCAN_TIME if scan_time is None else scan_time,
+                color=False,
+                poll=False
+            )
+            return
+        since = self._discovery.now()
+        known = set()
+        for device in self._cached_devices():
+            known.update(entry["gwId"] for entry in device.values())
+            yield device
+        if not fresh:
+            return
+        deadline = time.monotonic() + (self._fresh_window if window is None else window)
+        while not self._stop_scan_event.is_set():
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            for dev in self._discovery.wait_new(known, since, min(remaining, 1.0)):
+                known.add(dev.gw_id)
+                yield {dev.ip: make_scan_entry(dev.data, dev.ip)}
 
     def _process_basic_scan(self, local_scan_data, response_topic):
         """
@@ -161,40 +343,61 @@ class Scanner:
         self._update_local_scan_file(results)
     
     def _merge_scan_with_cloud(self, scan_data):
-        for ip, data in scan_data.items():
-            # Initialize entry and attempt cloud merge
+        items = list(scan_data.items())
+        for idx in range(0, len(items), self._cloud_batch_size):
+            yield from self._merge_batch(items[idx:idx + self._cloud_batch_size])
+
+    def _merge_batch(self, items: list[tuple[str, dict]]) -> list[dict]:
+        """One cloud request for a batch of (ip, scan data); devices already added are skipped."""
+        known = self._device_store.get_devices()
+        items = [(ip, data) for ip, data in items if data.get("id") not in known]
+        if not items:
+            return []
+        cloud_resp = self._tuya_cloud.get_devices([data.get("id") for _, data in items])
+        error = isinstance(cloud_resp, dict) and any(k in cloud_resp for k in ("Err", "Error"))
+        cloud_by_id = {} if error else {dev.get("id"): dev for dev in cloud_resp or []}
+        merged = []
+        for ip, data in items:
             dev_id = data.get("id")
-            if dev_id not in self._device_store.get_devices():
+            if error:
+                # Cloud error: keep only id and error info, product name from the cache
+                entry = {**cloud_resp, "id": dev_id}
+                product = self._cached_product(data.get("productKey"))
+                if product and product.get("product_name"):
+                    entry["product_name"] = product["product_name"]
+            else:
                 entry = {**data, "merge_with_cloud": False}
-                self._tuya_cloud.set_device_id(data.get("id"))
-                cloud_resp = self._tuya_cloud.tuya_cloud_request()
-
-                if isinstance(cloud_resp, dict) and any(k in cloud_resp for k in ("Err", "Error")):
-                    # Cloud error: keep only id and error info
-                    entry = {**cloud_resp, "id": data.get("id")}
-                else:
-                    # Merge with matching cloud device
-                    for cloud_dev in cloud_resp or []:
-                        if data.get("id") == cloud_dev.get("id"):
-                            entry["merge_with_cloud"] = True
-                            entry.update({
-                                "name": cloud_dev.get("name"),
-                                "product_name": cloud_dev.get("product_name"),
-                                "mac": cloud_dev.get("mac"),
-                                "icon": cloud_dev.get("icon"),
-                            })
-                            break
-                yield {ip: entry}
-        
+                cloud_dev = cloud_by_id.get(dev_id)
+                if cloud_dev:
+                    entry["merge_with_cloud"] = True
+                    entry.update({
+                        "name": cloud_dev.get("name"),
+                        "product_name": cloud_dev.get("product_name"),
+                        "mac": cloud_dev.get("mac"),
+                        "icon": cloud_dev.get("icon"),
+                    })
+            merged.append({ip: entry})
+        return merged
+
+    def _cloud_batcher(self, on_merged) -> "_CloudBatcher":
+        return _CloudBatcher(
+            self._merge_batch, on_merged, self._logger,
+            batch_size=self._cloud_batch_size, max_delay=self._cloud_batch_delay,
+        )
+
+    def _cached_product(self, product_key: str | None) -> dict | None:
+        cache = getattr(self._tuya_cloud, "cache", None)
+        if cache is None or not product_key:
+            return None
+        return cache.product(product_key)
+
     def _update_local_scan_file(self, local_scan_data):
-        saved_local_scan = self._device_store.read(const.LOCAL_SCAN_FILE)
-        if not saved_local_scan:
-            saved_local_scan = {}
+        saved_local_scan = self._device_store.load_local_scan()
         for ip, dev_data in local_scan_data.items():
             if ip not in saved_local_scan:
                 saved_local_scan[ip] = dev_data
         
-        self._device_store.write(const.LOCAL_SCAN_FILE, saved_local_scan)
+        self._device_store.save_local_scan(saved_local_scan)
         
     def _scan_local_network_gen(self, verbose=False, scantime=None, color=True, poll=True, forcescan=False, 
                    byID=False, show_timer=None, discover=True, wantips=None, 
@@ -209,91 +412,60 @@ class Scanner:
             return ("", "", "")
         
         # Enable UDP listeners
-        client = socket.socket(socket.AF_INET, socket.SOCK_DGRAM, socket.IPPROTO_UDP)
-        client.setsockopt(socket.SOL_SOCKET, socket.SO_BROADCAST, 1)
-        client.bind(("", UDPPORT))
-        
-        clients = socket.socket(socket.AF_INET, socket.SOCK_DGRAM, socket.IPPROTO_UDP)
-        clients.setsockopt(socket.SOL_SOCKET, socket.SO_BROADCAST, 1)
-        clients.bind(("", UDPPORTS))
-        
-        clientapp = socket.socket(socket.AF_INET, socket.SOCK_DGRAM, socket.IPPROTO_UDP)
-        clientapp.setsockopt(socket.SOL_SOCKET, socket.SO_BROADCAST, 1)
-        clientapp.bind(("", UDPPORTAPP))
-        
+        sockets = open_discovery_sockets()
+        client, clients, clientapp = sockets
+
         if scantime is None:
             scantime = tinytuya.SCANTIME
                     
-        scan_end_time = time.time() + scantime
-        broadcasted_devices = {}
-        
-        while time.time() < scan_end_time and not self._stop_scan_event.is_set():
-            try:
-                rd, _, _ = select.select([client, clients, clientapp], [], [], 1.0)
-            except KeyboardInterrupt:
-                print("\nScan stopped by user")
-                break
-            
-            for sock in rd:
-                if sock is client:
-                    tgt_port = UDPPORT
-                elif sock is clients:
-                    tgt_port = UDPPORTS
-                elif sock is clientapp:
-                    tgt_port = UDPPORTAPP
-                else:
-                    continue
-                    
+        try:
+            scan_end_time = time.time() + scantime
+            broadcasted_devices = {}
+
+            while time.time() < scan_end_time and not self._stop_scan_event.is_set():
                 try:
-                    data, addr = sock.recvfrom(4048)
-                    ip = addr[0]
-                    
-                    # Skip if we already processed this device
-                    if ip in broadcasted_devices:
+                    rd, _, _ = select.select(sockets, [], [], 1.0)
+                except KeyboardInterrupt:
+                    print("\nScan stopped by user")
+                    break
+
+                for sock in rd:
+                    if sock is client:
+                        tgt_port = UDPPORT
+                    elif sock is clients:
+                        tgt_port = UDPPORTS
+                    elif sock is clientapp:
+                        tgt_port = UDPPORTAPP
+                    else:
                         continue
-                        
+
                     try:
-                        result = tinytuya.decrypt_udp(data)
-                        result = json.loads(result)
-                    except:
-                        continue
-                    
-                    # Validate device info
-                    if 'gwId' not in result:
-                        continue
-                        
-                    # Get device details
-                    (dname, dkey, mac) = tuyaLookup(result['gwId'])
-                    result["name"] = dname
-                    result["key"] = dkey
-                    result["mac"] = mac
-                    result["ip"] = ip
-                    result["origin"] = "broadcast"
-                    
-                    if 'id' not in result:
-                        result['id'] = result['gwId']
-                        
-                    # Format 20-digit IDs
-                    if not mac and len(result['gwId']) == 20:
-                        try:
-                            mac = bytearray.fromhex(result['gwId'][-12:])
-                            result["mac"] = '%02x:%02x:%02x:%02x:%02x:%02x' % tuple(mac)
-                        except:
-                            pass
-                    
-                    # Add to found devices
-                    broadcasted_devices[ip] = result
-                    
-                    # Yield the device immediately
-                    if byID:
-                        yield {result['gwId']: result}
-                    else:
-                        yield {ip: result}
-                                                
-                except Exception as e:
-                    print(f"Error processing device: {e}")
-        
-        # Close sockets
-        client.close()
-        clients.close()
-        clientapp.close()
\ No newline at end of file
+                        data, addr = sock.recvfrom(4048)
+                        ip = addr[0]
+
+                        # Skip if we already processed this device
+                        if ip in broadcasted_devices:
+                            continue
+
+                        result = decode_discovery_packet(data)
+                        if result is None:
+                            continue
+
+                        # Get device details
+                        result = make_scan_entry(result, ip, tuyaLookup)
+
+                        # Add to found devices
+                        broadcasted_devices[ip] = result
+
+                        # Yield the device immediately
+                        if byID:
+                            yield {result['gwId']: result}
+                        else:
+                            yield {ip: result}
+
+                    except Exception as e:
+                        print(f"Error processing device: {e}")
+        finally:
+            # Close sockets, also when the consumer stops early or fails
+            for sock in sockets:
+                sock.close()
@@ -0,0 +1,134 @@
+"""
+Постоянный слушатель UDP-анонсов Tuya (6666/6667/6669).
+
+Устройства рассылают анонс раз в несколько секунд; слушатель держит индекс
+gwId → (ip, version, last_seen) и сообщает о новом или сменившемся адресе
+через ``on_seen``. Мост по нему переносит устройство на новый IP (DHCP) без
+облака и без полного скана. Пакеты разбираются тем же кодом, что и в
+``Scanner`` (``decode_discovery_packet``); сам ``Scanner`` отвечает на
+запросы скана из этого же индекса.
+"""
+import logging
+import select
+import threading
+import time
+from dataclasses import dataclass, field
+
+from .tuya_udp_device_scanner import decode_discovery_packet, open_discovery_sockets
+
+
+@dataclass
+class DiscoveredDevice:
+    gw_id: str
+    ip: str
+    version: str | None
+    last_seen: float
+    data: dict = field(default_factory=dict, repr=False)
+
+
+class DiscoveryListener:
+    def __init__(self, logger=None, on_seen=None, clock=time.time):
+        """
+        ``on_seen(device, old_ip)`` is called from the listener thread when a
+        gwId is announced for the first time (``old_ip`` is None) or from a
+        different address.
+        """
+        self._logger = logger or logging.getLogger("Discovery")
+        self._on_seen = on_seen
+        self._clock = clock
+        self._cond = threading.Condition()
+        self._index: dict[str, DiscoveredDevice] = {}
+        self._stop = threading.Event()
+        self._sockets = []
+        self._thread = None
+        self._started: float | None = None
+
+    def start(self) -> bool:
+        try:
+            self._sockets = open_discovery_sockets()
+        except OSError as exc:
+            self._logger.error(f"Discovery listener disabled, cannot bind UDP ports: {exc}")
+            return False
+        self._started = self._clock()
+        self._thread = threading.Thread(target=self._loop, daemon=True, name="TuyaDiscovery")
+        self._thread.start()
+        return True
+
+    def stop(self, timeout: float = 2.0):
+        self._stop.set()
+        self._started = None
+        if self._thread is not None:
+            self._thread.join(timeout)
+        for sock in self._sockets:
+            sock.close()
+        self._sockets = []
+
+    def get(self, gw_id: str) -> DiscoveredDevice | None:
+        with self._cond:
+            return self._index.get(gw_id)
+
+    def snapshot(self) -> dict[str, DiscoveredDevice]:
+        with self._cond:
+            return dict(self._index)
+
+    def now(self) -> float:
+        """Current time on the clock used for ``last_seen``."""
+        return self._clock()
+
+    def is_warm(self, warmup: float) -> bool:
+        """Listening for at least ``warmup`` s, i.e. every live device has announced itself."""
+        return self._started is not None and self._clock() - self._started >= warmup
+
+    def recent(self, max_age: float) -> list[DiscoveredDevice]:
+        """Devices heard within the last ``max_age`` seconds, in discovery order."""
+        oldest = self._clock() - max_age
+        with self._cond:
+            return [dev for dev in self._index.values() if dev.last_seen >= oldest]
+
+    def wait_new(self, known: set[str], since: float, timeout: float) -> list[DiscoveredDevice]:
+        """
+        Devices heard since ``since`` whose gwId is not in ``known``, waiting
+        up to ``timeout`` seconds for one to appear.
+        """
+        def _new():
+            return [dev for gw_id, dev in self._index.items()
+                    if gw_id not in known and dev.last_seen >= since]
+
+        with self._cond:
+            self._cond.wait_for(_new, timeout)
+            return _new()
+
+    def handle(self, result: dict, ip: str) -> DiscoveredDevice:
+        """Record one decoded announcement."""
+        gw_id = result["gwId"]
+        now = self._clock()
+        with self._cond:
+            known = self._index.get(gw_id)
+            old_ip = known.ip if known is not None else None
+            device = DiscoveredDevice(gw_id, ip, result.get("version"), now, result)
+            self._index[gw_id] = device
+            self._cond.notify_all()
+        if old_ip != ip:
+            if old_ip is not None:
+                self._logger.info(f"Device {gw_id} moved {old_ip} -> {ip}")
+            if self._on_seen is not None:
+                try:
+                    self._on_seen(device, old_ip)
+                except Exception as exc:
+                    self._logger.error(f"Discovery callback for {gw_id} failed: {exc}")
+        return device
+
+    def _loop(self):
+        while not self._stop.is_set():
+            try:
+                ready, _, _ = select.select(self._sockets, [], [], 1.0)
+            except (OSError, ValueError):
+                break           # sockets closed by stop()
+            for sock in ready:
+                try:
+                    data, addr = sock.recvfrom(4048)
+                except OSError:
+                    continue
+                result = decode_discovery_packet(data)
+                if result is not None:
+                    self.handle(result, addr[0])
@@ -14,7 +14,8 @@ class TinyLocalTransport(ILocalTransport):
         category=None,
         version="3.4",
         connection_timeout=5, connection_retry_limit=2,
-        connection_retry_delay=1
+        connection_retry_delay=1,
+        persistent=False
     ):
         kw = dict(
             dev_id=dev_id,
@@ -32,7 +33,7 @@ class TinyLocalTransport(ILocalTransport):
         else:
             self._dev = tinytuya.Device(**kw)
 
-        self._dev.set_socketPersistent(False)
+        self._dev.set_socketPersistent(persistent)
 
     # ---------- методы, требуемые TuyaDevice -----------------
     def status(self):
@@ -50,6 +51,21 @@ class TinyLocalTransport(ILocalTransport):
     def set_value(self, dp, value):
         return self._dev.set_value(dp, value)
 
+    # ---------- push-режим (постоянное соединение) ------------
+    def heartbeat(self):
+        return self._dev.heartbeat(nowait=True)
+
+    def receive(self):
+        return self._dev.receive()
+
+    def fileno(self) -> int | None:
+        """Socket of the persistent connection, None while not connected."""
+        sock = self._dev.socket
+        if not sock:
+            return None
+        fd = sock.fileno()
+        return fd if fd >= 0 else None
+
     # --- делегирование прочих вызовов (brightness, hsv, etc.) --
     def __getattr__(self, item):
         return getattr(self._dev, item)
@@ -27,6 +27,10 @@ MQTT_TOPIC_PREFIX = "/devices"
 # Service config files
 DEVICES_CONF_FILE = os.getenv("TUYA2MQTT_DEV_CONF_FILE")
 LOCAL_SCAN_FILE = os.getenv("TUYA2MQTT_LOCAL_SCAN_FILE")
+# cloud metadata cache (local keys!), next to LOCAL_SCAN_FILE if not set
+CLOUD_CACHE_FILE = os.getenv("TUYA2MQTT_CLOUD_CACHE_FILE")
+# SQLite registry ([store] backend = "sqlite"), next to DEVICES_CONF_FILE if not set
+DEVICES_DB_FILE = os.getenv("TUYA2MQTT_DEVICES_DB_FILE")
 EXTANSIONS_SETTINGS_FILE = os.getenv("TUYA2MQTT_EXTANSIONS_SETTINGS_FILE")
 
 # Polling interval (seconds)
@@ -3,14 +3,47 @@ import time
 import threading
 import queue
 import itertools
+import select
 
 # import tinytuya
 import core.tuya.tuya_constants as tinytuya
 from core.tuya.local.tinytuya_local_transport import TinyLocalTransport
 
+def _bright_to_percent(value):
+    """Tuya brightness 10-1000 -> 0-100 %."""
+    if not isinstance(value, (int, float)):
+        return value
+    if value < 10:
+        return 0
+    if value > 1000:
+        return 100
+    return int((value - 10) * 100 / (1000 - 10))
+
+
+def _temp_to_percent(value):
+    """Tuya colour temperature 0-1000 -> 0-100 %."""
+    if not isinstance(value, (int, float)):
+        return value
+    if value <= 0:
+        return 0
+    if value >= 1000:
+        return 100
+    return int(value / 10)
+
+
+# DP codes reported in raw Tuya units but published in percents
+_DP_TRANSFORMS = {
+    "bright_value": _bright_to_percent,
+    "bright_value_v2": _bright_to_percent,
+    "temp_value": _temp_to_percent,
+    "temp_value_v2": _temp_to_percent,
+}
+
+
 class TuyaDevice:
     def __init__(self, dev_id, ip=None, local_key=None, product_id=None,
-                 version="3.4", category="", mapping=None, friendly_name: str = None):
+                 version="3.4", category="", mapping=None, friendly_name: str = None,
+                 persistent: bool = False, engine=None, on_command=None, observer=None):
         self.dev_id = dev_id
         self.friendly_name = friendly_name
         self.ip = ip
@@ -21,18 +54,37 @@ class TuyaDevice:
         self.mapping = mapping if mapping else {}
         self.tuya_dev = None
         self.is_type_c = False
+        # persistent=True -> сокет держится открытым, устройство само присылает
+        # изменения DP (push-режим, см. core/device_push_listener.py)
+        self.persistent = persistent
+        self._push_pending = threading.Event()
+        # set while a status poll is queued or running - polls are coalesced
+        self._poll_pending = threading.Event()
 
         self._last_status = {}
 
         self._cmd_queue = queue.PriorityQueue()
         self._counter = itertools.count()
-        self._cmd_thread = threading.Thread(target=self._worker, daemon=True, name=f"TuyaDevice-{self.dev_id}-worker")
         self._stop_worker_flag = threading.Event()
+        # engine=None -> собственный поток-воркер (классический режим),
+        # иначе очередь устройства обслуживает общий движок (см. core/async_device_engine.py)
+        self._engine = engine
+        # вызывается на каждую команду управления (priority=0), например, чтобы
+        # планировщик опроса ускорил опрос устройства
+        self._on_command = on_command
+        # получает тайминги задач (observe_task) и сброшенные по TTL (record_drop),
+        # например, расширение метрик
+        self._observer = observer
+        self._cmd_thread = None
         if self.ip and self.local_key:
             self._init_tinytuya()
             self._detect_type_c()
-        
-        self._cmd_thread.start()
+
+        if self._engine is None:
+            self._cmd_thread = threading.Thread(target=self._worker, daemon=True, name=f"TuyaDevice-{self.dev_id}-worker")
+            self._cmd_thread.start()
+        else:
+            self._engine.attach(self)
         
     def _init_tinytuya(self):
         """Теперь создаём *адаптер*, а не прямой объект tinytuya."""
@@ -45,29 +97,114 @@ class TuyaDevice:
             connection_timeout=5,
             connection_retry_limit=2,
             connection_retry_delay=1,
+            persistent=self.persistent,
         )
-        self.tuya_dev.set_socketPersistent(False)
 
     def _worker(self):
         while not self._stop_worker_flag.is_set():
-            priority, _, function, args, callback, enq_time, ttl = self._cmd_queue.get()
-            
-            # check TTL
-            if time.monotonic() - enq_time > ttl:
-                # not fresh cmd - drop it
-                self._cmd_queue.task_done()
+            task = self._cmd_queue.get()
+            if self._drop_if_expired(task):
                 continue
-            try:
-                send_cmd_start = time.perf_counter()
-                feedback = function(*args)
-                time_to_send_cmd = time.perf_counter() - send_cmd_start
-            except Exception as e:
-                feedback = {"Error": e}
-                if callback:
-                    callback(self.dev_id, feedback)
-            if callback:
-                callback(self.dev_id, feedback, time_to_send_cmd)
+            self._run_task(task)
+
+    def _drop_if_expired(self, task) -> bool:
+        """Check TTL of a dequeued task; a stale task is marked done and dropped."""
+        _, _, function, _, _, enq_time, ttl = task
+        if time.monotonic() - enq_time > ttl:
+            # not fresh cmd - drop it
+            self._on_task_dropped(function)
+            if self._observer:
+                self._observer.record_drop(self.dev_id, self._task_kind(function))
             self._cmd_queue.task_done()
+            return True
+        return False
+
+    @staticmethod
+    def _task_kind(function) -> str:
+        return getattr(function, "__name__", "task").lstrip("_")
+
+    def _on_task_dropped(self, function):
+        """Reset per-task bookkeeping when a task is dropped by TTL."""
+        if function == self._update_status:
+            self._poll_pending.clear()
+        elif function == self._receive_push:
+            self._push_pending.clear()
+
+    def _run_task(self, task):
+        """Execute one dequeued task and pass the result to its callback."""
+        priority, _, function, args, callback, _, _ = task
+        merged = []
+        dps = self._control_dps(function, args) if priority == 0 else None
+        if dps is not None:
+            merged = self._merge_queued_control(dps)
+        dequeued = time.monotonic()
+        send_cmd_start = time.perf_counter()
+        try:
+            if dps is not None:
+                feedback = self._send_dps(dps)
+            else:
+                feedback = function(*args)
+        except Exception as e:
+            feedback = {"Error": e}
+        time_to_send_cmd = time.perf_counter() - send_cmd_start
+        if self._observer:
+            for t in [task] + merged:
+                wait = dequeued - t[5]
+                self._observer.observe_task(
+                    self.dev_id, self._task_kind(t[2]), wait, time_to_send_cmd, wait + time_to_send_cmd
+                )
+        try:
+            for cb in [callback] + [t[4] for t in merged]:
+                if cb:
+                    cb(self.dev_id, feedback, time_to_send_cmd)
+        finally:
+            for _ in range(1 + len(merged)):
+                self._cmd_queue.task_done()
+
+    # Control commands that are plain DP writes: method name -> builder of {dp: value}.
+    # Such commands queued back to back are merged into one CONTROL frame.
+    _DPS_BUILDERS = {
+        "_set_device_status": "_device_status_dps",
+        "_switch_state": "_switch_state_dps",
+        "_set_brightness_percent": "_brightness_dps",
+    }
+
+    def _control_dps(self, function, args) -> dict | None:
+        """DP writes of a control command, None if it is not a plain DP write."""
+        builder = self._DPS_BUILDERS.get(getattr(function, "__name__", ""))
+        if not builder or not self.tuya_dev:
+            return None
+        try:
+            return getattr(self, builder)(*args)
+        except Exception:
+            return None
+
+    def _merge_queued_control(self, dps: dict) -> list:
+        """
+        Pull the control commands queued right behind the current one into
+        ``dps`` (later writes of the same DP win). Stops at the first task
+        that is not a plain DP write, so command order is preserved.
+        Returns the merged tasks; the caller marks them done.
+        """
+        merged = []
+        while True:
+            with self._cmd_queue.mutex:
+                if not self._cmd_queue.queue:
+                    break
+                head = self._cmd_queue.queue[0]
+            if head[0] != 0:
+                break
+            head_dps = self._control_dps(head[2], head[3])
+            if head_dps is None:
+                break
+            # only this worker consumes the queue and new priority-0 tasks get a
+            # larger counter, so the head we peeked is what get_nowait() returns
+            task = self._cmd_queue.get_nowait()
+            if self._drop_if_expired(task):
+                continue
+            dps.update(head_dps)
+            merged.append(task)
+        return merged
 
     def stop_worker(self, timeout: float = 1.0):
         self._stop_worker_flag.set()
@@ -79,6 +216,10 @@ class TuyaDevice:
         except queue.Empty:
             pass
 
+        if self._engine is not None:
+            self._engine.detach(self)
+            return
+
         sentinel = (0, 0, lambda *a, **kw: None, (), None, 0.0, 0.0)
         self._cmd_queue.put(sentinel)
 
@@ -86,7 +227,8 @@ class TuyaDevice:
 
     
     def join(self, timeout: float | None = None):
-        self._cmd_thread.join(timeout)
+        if self._cmd_thread is not None:
+            self._cmd_thread.join(timeout)
     
     def _enqueue(self, fn, *args, callback=None, priority=0, ttl=None):
         """
@@ -100,6 +242,10 @@ class TuyaDevice:
         
         count = next(self._counter)
         self._cmd_queue.put((priority, count, fn, args, callback, enqueue_time, ttl))
+        if self._engine is not None:
+            self._engine.notify(self)
+        if priority == 0 and self._on_command:
+            self._on_command(self.dev_id)
 
     def to_dict(self):
         data = {
@@ -113,13 +259,51 @@ class TuyaDevice:
         }
         if self.friendly_name:
             data["friendly_name"] = self.friendly_name
+        if self.persistent:
+            data["persistent"] = True
         return data
 
     def get_mapping(self):
         return self.mapping
 
+    @property
+    def mapping(self) -> dict:
+        return self._mapping
+
+    @mapping.setter
+    def mapping(self, value):
+        self._mapping = value if value else {}
+        self._decoder = None        # recompiled by the next decode_dps()
+
+    def _compile_decoder(self) -> dict:
+        """dp number -> (output name, transform or None)."""
+        decoder = {}
+        for dp_num, desc in self._mapping.items():
+            name = desc.get("code", dp_num) if isinstance(desc, dict) else dp_num
+            decoder[dp_num] = (name, _DP_TRANSFORMS.get(name))
+        return decoder
+
+    def decode_dps(self, dps: dict) -> tuple[dict, list]:
+        """
+        Raw ``{dp number: value}`` -> ``({dp code: value}, unknown dp numbers)``.
+        DPs missing from the mapping are published under their number.
+        """
+        decoder = self._decoder
+        if decoder is None:
+            decoder = self._decoder = self._compile_decoder()
+        decoded, unknown = {}, []
+        for dp_num, value in dps.items():
+            entry = decoder.get(dp_num)
+            if entry is None:
+                unknown.append(dp_num)
+                decoded[dp_num] = value
+                continue
+            name, transform = entry
+            decoded[name] = transform(value) if transform and value else value
+        return decoded, unknown
+
     @staticmethod
-    def from_dict(d):
+    def from_dict(d, engine=None, on_command=None, observer=None):
         return TuyaDevice(
             dev_id=d["id"],
             ip=d.get("ip"),
@@ -128,9 +312,56 @@ class TuyaDevice:
             version=d.get("version", "3.4"),
             category=d.get("category", ""),
             mapping=d.get("mapping", {}),
-            friendly_name=d.get("friendly_name")
+            friendly_name=d.get("friendly_name"),
+            persistent=d.get("persistent", False),
+            engine=engine,
+            on_command=on_command,
+            observer=observer
         )
 
+    # ip, key, version, category, persistent - a change needs a new transport
+    def connection_of(self) -> tuple:
+        return (self.ip, self.local_key, self.version, self.category, self.persistent)
+
+    @staticmethod
+    def connection_from_dict(d) -> tuple:
+        return (d.get("ip"), d.get("key"), d.get("version", "3.4"),
+                d.get("category", ""), d.get("persistent", False))
+
+    def update_from_dict(self, d) -> bool:
+        """
+        Apply a changed config entry to the live device. Descriptive fields
+        change in place; new connection fields rebuild the transport on the
+        device's own queue, so the object (and Homie bridges holding it) stays
+        the same. Returns True if the transport is rebuilt.
+        """
+        self.friendly_name = d.get("friendly_name")
+        self.product_id = d.get("product_id")
+        mapping = d.get("mapping", {}) or {}
+        if mapping != self.mapping:
+            self.mapping = mapping
+            self.is_type_c = False
+            self._detect_type_c()
+        connection = self.connection_from_dict(d)
+        if connection == self.connection_of():
+            return False
+        self.ip, self.local_key, self.version, self.category, self.persistent = connection
+        # run before queued polls and never expire
+        self._enqueue(self._reconnect, priority=0, ttl=float("inf"))
+        return True
+
+    def _reconnect(self):
+        old, self.tuya_dev = self.tuya_dev, None
+        if old is not None:
+            try:
+                old.close()
+            except Exception:
+                pass
+        if self.ip and self.local_key:
+            self._init_tinytuya()
+            self._detect_type_c()
+        return {"reconnected": True}
+
     # High-priority commands (priority=0)
     def switch_state_async(self, payload):
         self._enqueue(self._switch_state, payload)
@@ -157,12 +388,54 @@ class TuyaDevice:
         self._enqueue(self._set_device_status, payload)
     
     # Low-priority command (status polling, priority=1)
-    def update_status_async(self, publish_fn):
-        self._enqueue(self._update_status, callback=publish_fn, priority=1)
+    def update_status_async(self, publish_fn) -> bool:
+        """
+        Queue a status poll. At most one poll per device is outstanding:
+        returns False (poll coalesced) while the previous one is still
+        queued or running.
+        """
+        if self._poll_pending.is_set():
+            return False
+        self._poll_pending.set()
+
+        def _poll_done(dev_id, feedback, elapsed):
+            self._poll_pending.clear()
+            publish_fn(dev_id, feedback, elapsed)
+        self._enqueue(self._update_status, callback=_poll_done, priority=1)
+        return True
+
+    # Push mode (persistent socket only, priority=1)
+    def receive_push_async(self, publish_fn, ttl: float = 5.0):
+        """Read an unsolicited frame; publish_fn gets only frames with DPs."""
+        if self._push_pending.is_set():
+            return
+        self._push_pending.set()
+
+        def _publish_if_dps(dev_id, feedback, elapsed):
+            if feedback:
+                publish_fn(dev_id, feedback, elapsed)
+        self._enqueue(self._receive_push, callback=_publish_if_dps, priority=1, ttl=ttl)
+
+    def heartbeat_async(self, ttl: float = 5.0):
+        self._enqueue(self._heartbeat, priority=1, ttl=ttl)
+
+    def push_fileno(self) -> int | None:
+        # called from the push listener thread: _reconnect may drop tuya_dev meanwhile
+        transport = self.tuya_dev
+        if not (self.persistent and transport) or self._push_pending.is_set():
+            return None
+        return transport.fileno()
     
     ####################################################
 
+    def _send_dps(self, data: dict):
+        payloadd = self.tuya_dev.generate_payload(tinytuya.CONTROL, data)
+        return self.tuya_dev.send(payloadd)
+
     def _set_device_status(self, payload):
+        self._send_dps(self._device_status_dps(payload))
+
+    def _device_status_dps(self, payload) -> dict:
         data = {}
         for dp_code_hrf, value in payload.items():
             for dp_code, mapping in self.mapping.items():
@@ -173,8 +446,7 @@ class TuyaDevice:
                         dp_type = mapping["type"]
                         dp_values = mapping["values"]
                         data[dp_code] = self._value_from_device_type(dp_type, dp_values, value)
-        payloadd = self.tuya_dev.generate_payload(tinytuya.CONTROL, data)
-        self.tuya_dev.send(payloadd)
+        return data
 
     def _value_from_device_type(self, type: str, values: dict, in_value):
         match type:
@@ -207,6 +479,35 @@ class TuyaDevice:
         self._last_status = data.get("dps", {})
         return data
 
+    def _receive_push(self):
+        try:
+            fd = self.tuya_dev.fileno() if self.tuya_dev else None
+            if fd is None:
+                return None
+            # the worker may have consumed the frame already (e.g. in status())
+            readable, _, _ = select.select([fd], [], [], 0)
+            if not readable:
+                return None
+            data = self.tuya_dev.receive()
+        finally:
+            self._push_pending.clear()
+        if not data:
+            return None
+        if "Error" in data:
+            return data
+        dps = data.get("dps")
+        if not dps:
+            return None             # heartbeat answer, ack etc.
+        # push frames carry only changed DPs - publish the full picture
+        self._last_status.update(dps)
+        return {"dps": dict(self._last_status)}
+
+    def _heartbeat(self):
+        # also (re)opens the socket if the device dropped the connection
+        if self.tuya_dev is None:
+            return None         # no ip/key yet or the transport is being rebuilt
+        self.tuya_dev.heartbeat()
+
     def _detect_type_c(self):
         try:
             dps = self.get_mapping()
@@ -221,11 +522,17 @@ class TuyaDevice:
         if not self.is_type_c:
             self.tuya_dev.set_brightness_percentage(brightness)
         else:
-            brightness_value = 0
-            if brightness <= 0: brightness_value = 10
-            elif brightness >= 100: brightness_value = 1000
-            else: brightness_value = int(10 + (1000 - 10) * brightness / 100)
-            self.tuya_dev.set_value(2, brightness_value)
+            self._send_dps(self._brightness_dps(brightness))
+
+    def _brightness_dps(self, brightness: int) -> dict | None:
+        # non type C bulbs: dp and range are detected by tinytuya itself
+        if not self.is_type_c:
+            return None
+        brightness_value = 0
+        if brightness <= 0: brightness_value = 10
+        elif brightness >= 100: brightness_value = 1000
+        else: brightness_value = int(10 + (1000 - 10) * brightness / 100)
+        return {"2": brightness_value}
     
     def _switch_state(self, payload):
         if isinstance(payload, bool):
@@ -238,6 +545,12 @@ class TuyaDevice:
             switch_num = payload["switch_num"]
             self.tuya_dev.set_status(state, switch_num)
 
+    def _switch_state_dps(self, payload) -> dict | None:
+        # plain on/off: the switch dp is detected by tinytuya (BulbDevice)
+        if isinstance(payload, dict):
+            return {str(payload["switch_num"]): payload["state"]}
+        return None
+
     def _toggle_switch_state(self, dp_code):
         status = self._last_status[dp_code]
         if status:
@@ -44,7 +44,8 @@ Once instantiated the object immediately publishes:
 
 1. `homie/5/<dev_id>/$state           = "init"   (QoS2, retained)`
 2. `homie/5/<dev_id>/$description     = <JSON>`    (QoS2, retained)
-3. subscribes to all `…/<node>/<prop>/set` topics (QoS0, **non‑retained**)
+3. subscribes to all `…/<node>/<prop>/set` topics (QoS0, **non‑retained**),
+   unless ``subscribe=False`` – then the owner routes them via ``handle_set``
 4. and finally flips `$state` from `init` → `ready`
 
 """
@@ -70,6 +71,7 @@ class HomieDevice:
         description: Dict[str, Any],
         on_set: Callable[[str, str, str], Any] | None = None,
         logger: logging.Logger | None = None,
+        subscribe: bool = True,
     ):
         self._mqtt = mqtt
         self.dev_id = dev_id
@@ -77,6 +79,14 @@ class HomieDevice:
         self._on_set_cb = on_set
         self._logger = logger or logging.getLogger(f"HomieDevice[{dev_id}]")
         self._base = _topic(dev_id)
+        self._set_topics: list[str] = []
+        # False - /set commands are routed by the owner through handle_set()
+        # from one shared wildcard subscription
+        self._subscribe = subscribe
+        self._settable: set[tuple[str, str]] = set()
+        # retained helper topics actually published ($target, $alert/...),
+        # property values and attributes are derived from the description
+        self._published: set[str] = set()
 
         # 1. announce ourselves → init
         self._publish_state("init")
@@ -93,6 +103,12 @@ class HomieDevice:
     def _publish_state(self, state: str):
         self._mqtt.publish(f"{self._base}/$state", state)
 
+    def set_state(self, state: str):
+        """Publish device \$state (``ready``, ``lost``, ``disconnected`` ...)."""
+        if state not in ("init", "ready", "disconnected", "sleeping", "lost"):
+            raise ValueError("Invalid Homie state")
+        self._publish_state(state)
+
     def publish_property(self, node_id: str, prop_id: str, value: str | int | float | bool):
         """Publish a regular property value (retained, QoS2)."""
         t = f"{self._base}/{node_id}/{prop_id}"
@@ -102,14 +118,19 @@ class HomieDevice:
         """Publish \$target helper (retained, QoS2)."""
         t = f"{self._base}/{node_id}/{prop_id}/$target"
         self._mqtt.publish(t, value)
+        self._published.add(t)
 
     # Alert / log helpers -------------------------------------------------
     def alert_set(self, alert_id: str, message: str):
-        self._mqtt.publish(f"{self._base}/$alert/{alert_id}", message)
+        t = f"{self._base}/$alert/{alert_id}"
+        self._mqtt.publish(t, message)
+        self._published.add(t)
 
     def alert_clear(self, alert_id: str):
         # Zero‑length payload = delete
-        self._mqtt.publish(f"{self._base}/$alert/{alert_id}", "", retain=True)
+        t = f"{self._base}/$alert/{alert_id}"
+        self._mqtt.publish(t, "", retain=True)
+        self._published.discard(t)
 
     def log(self, level: str, message: str):
         level = level.lower()
@@ -129,9 +150,20 @@ class HomieDevice:
         for node_id, node in nodes.items():
             for prop_id, prop in node.get("properties", {}).items():
                 if prop.get("settable"):
+                    self._settable.add((node_id, prop_id))
+                    if not self._subscribe:
+                        continue
                     topic_pattern = f"{self._base}/{node_id}/{prop_id}/set"
                     # non‑retained, QoS0 according to spec – our wrapper uses defaults
                     self._mqtt.update_topic_handlers({topic_pattern: self._make_handler(node_id, prop_id)})
+                    self._set_topics.append(topic_pattern)
+
+    def handle_set(self, node_id: str, prop_id: str, payload: str) -> bool:
+        """Dispatch a /set command received by a shared subscription."""
+        if (node_id, prop_id) not in self._settable:
+            return False
+        self._make_handler(node_id, prop_id)(f"{self._base}/{node_id}/{prop_id}/set", payload)
+        return True
 
     def _make_handler(self, node_id: str, prop_id: str):
         def _handler(topic: str, payload: str):
@@ -143,27 +175,32 @@ class HomieDevice:
                 self._logger.error(f"on_set callback raised: {exc}")
         return _handler
     
+    def retained_topics(self) -> list[str]:
+        """
+        Retained topics of the device tree, ``$state`` first: Homie 5 keeps
+        the whole description in ``$description``, so only property values
+        (from the description) and published ``$target``/``$alert`` helpers
+        exist besides it.
+        """
+        topics = [f"{self._base}/$state", f"{self._base}/$description"]
+        for node_id, node in self.description.get("nodes", {}).items():
+            for prop_id in node.get("properties", {}):
+                topics.append(f"{self._base}/{node_id}/{prop_id}")
+        topics.extend(sorted(self._published))
+        return topics
+
+    def release(self):
+        """Stop routing /set commands to this device (before its teardown)."""
+        if self._set_topics:
+            self._mqtt.remove_topic_handlers(self._set_topics)
+            self._set_topics = []
+
     def teardown(self):
-        """Remove retained topics for full tree (state, description, nodes, props)."""
-        # clear $state first
-        self._mqtt.publish(f"{self._base}/$state", "", retain=True)
-        # clear $description
-        self._mqtt.publish(f"{self._base}/$description", "", retain=True)
-        nodes = self.description.get("nodes", {})
-        for node_id, node in nodes.items():
-            # node attributes
-            for attr in ("$name", "$type", "$properties"):
-                self._mqtt.publish(f"{self._base}/{node_id}/{attr}", "", retain=True)
-            # properties
-            for prop_id, prop in node.get("properties", {}).items():
-                # property attributes
-                for attr in (
-                    "$name", "$datatype", "$settable", "$unit", "$format", "$target",
-                    "$retained"
-                ):
-                    self._mqtt.publish(f"{self._base}/{node_id}/{prop_id}/{attr}", "", retain=True)
-                # property value itself
-                self._mqtt.publish(f"{self._base}/{node_id}/{prop_id}", "", retain=True)
+        """Remove retained topics for full tree synchronously."""
+        self.release()
+        for topic in self.retained_topics():
+            self._mqtt.publish(topic, "", retain=True)
+        self._published.clear()
 
     def update_description(self, new_desc: Dict[str, Any]):
         """Publish new $description (+ version bump) while $state=init."""
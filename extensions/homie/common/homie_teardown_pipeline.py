@@ -0,0 +1,133 @@
+"""Background removal of retained Homie trees.
+
+``HomieDevice.teardown`` clears every retained topic of a device in the
+caller's thread. Removing or renaming many devices at once that way floods
+the broker and blocks the MQTT handler that asked for it, so the lifecycle
+extension hands the topics to :class:`TeardownPipeline` instead: one
+background thread publishes the empty retained payloads at a token-bucket
+rate, leaving room for live control traffic.
+"""
+from __future__ import annotations
+
+import collections
+import logging
+import threading
+import time
+from dataclasses import dataclass, field
+
+
+@dataclass
+class _Job:
+    homie_id: str
+    topics: collections.deque
+    total: int
+    started: float = field(default_factory=time.monotonic)
+
+
+class TokenBucket:
+    """``rate`` tokens per second, at most ``burst`` saved up."""
+
+    def __init__(self, rate: float, burst: int, clock=time.monotonic):
+        self.rate = rate
+        self.burst = burst
+        self._clock = clock
+        self._tokens = float(burst)
+        self._last = clock()
+
+    def take(self) -> float:
+        """Take one token; return 0 or the seconds to wait before retrying."""
+        now = self._clock()
+        self._tokens = min(self.burst, self._tokens + (now - self._last) * self.rate)
+        self._last = now
+        if self._tokens >= 1:
+            self._tokens -= 1
+            return 0.0
+        return (1 - self._tokens) / self.rate
+
+
+class TeardownPipeline:
+    # progress is logged every PROGRESS_STEP cleared topics of a device
+    PROGRESS_STEP = 100
+
+    def __init__(self, mqtt, logger: logging.Logger | None = None,
+                 rate: float = 100.0, burst: int = 20):
+        self._mqtt = mqtt
+        self._logger = logger or logging.getLogger("HomieTeardown")
+        self._bucket = TokenBucket(rate, burst)
+        self._jobs: collections.OrderedDict[str, _Job] = collections.OrderedDict()
+        self._cond = threading.Condition()
+        self._stop = False
+        self._thread = threading.Thread(target=self._loop, daemon=True, name="HomieTeardown")
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self, timeout: float = 2.0):
+        with self._cond:
+            self._stop = True
+            self._cond.notify()
+        self._thread.join(timeout)
+
+    def submit(self, homie_id: str, topics: list[str]) -> None:
+        """Queue the retained topics of a removed device for clearing."""
+        with self._cond:
+            job = self._jobs.get(homie_id)
+            if job is not None:
+                new = [t for t in topics if t not in job.topics]
+                job.topics.extend(new)
+                job.total += len(new)
+            else:
+                self._jobs[homie_id] = _Job(homie_id, collections.deque(topics), len(topics))
+            self._cond.notify()
+        self._logger.info(f"Teardown of homie/5/{homie_id} queued: {len(topics)} topic(s)")
+
+    def cancel(self, homie_id: str) -> bool:
+        """Forget a queued teardown, e.g. the device is being re-created under the same id."""
+        with self._cond:
+            return self._jobs.pop(homie_id, None) is not None
+
+    def pending(self) -> dict[str, tuple[int, int]]:
+        """homie_id -> (cleared, total) of queued teardowns."""
+        with self._cond:
+            return {hid: (job.total - len(job.topics), job.total) for hid, job in self._jobs.items()}
+
+    # ------------------------------------------------------------------ #
+    # Internals                                                          #
+    # ------------------------------------------------------------------ #
+    def _next_topic(self) -> tuple[_Job, str] | None:
+        with self._cond:
+            while not self._jobs and not self._stop:
+                self._cond.wait()
+            if self._stop:
+                return None
+            job = next(iter(self._jobs.values()))
+            topic = job.topics.popleft()
+            if not job.topics:
+                del self._jobs[job.homie_id]
+            return job, topic
+
+    def _loop(self):
+        while True:
+            delay = self._bucket.take()
+            if delay:
+                time.sleep(delay)
+                continue
+            item = self._next_topic()
+            if item is None:
+                break
+            job, topic = item
+            try:
+                self._mqtt.publish(topic, "", retain=True)
+            except Exception as exc:
+                self._logger.error(f"Teardown publish to {topic} failed: {exc}")
+            self._report(job)
+
+    def _report(self, job: _Job):
+        done = job.total - len(job.topics)
+        if done == job.total:
+            self._logger.info(
+                f"Teardown of homie/5/{job.homie_id} done: {job.total} topic(s) "
+                f"in {time.monotonic() - job.started:.1f}s"
+            )
+        elif done % self.PROGRESS_STEP == 0:
+            self._logger.debug(f"Teardown of homie/5/{job.homie_id}: {done}/{job.total}")
@@ -18,6 +18,7 @@ from typing import Dict, Any
 from core.mqtt_client_wrapper import MqttModule
 from extensions.homie.common.homie_device_model import HomieDevice
 from extensions.homie.common.homie_bridge_adapter import DeviceBridge
+from extensions.homie.common.homie_teardown_pipeline import TeardownPipeline
 from extensions.homie.common.tuya_to_homie_converter import TuyaHomieConverter, _sanitize_id
 from core.device_repository import DeviceStore
 from core.tuya import tuya_constants as const
@@ -30,20 +31,32 @@ class Extension(SyncExtension):
         device_store: DeviceStore,
         converter: TuyaHomieConverter,
         logger: logging.Logger | None = None,
+        teardown_rate: float = 100.0,
+        teardown_burst: int = 20,
     ):
         self._mqtt = mqtt
         self._store = device_store
         self._conv = converter
         self._logger = logger or logging.getLogger("HomieSync")
         self.device_bridges: Dict[str, DeviceBridge] = {}
+        # homie device id -> bridge, routes the shared /set subscription
+        self._by_homie_id: Dict[str, DeviceBridge] = {}
+        # retained trees of removed devices are cleared in the background
+        self._teardown = TeardownPipeline(
+            self._mqtt, self._logger, rate=teardown_rate, burst=teardown_burst
+        )
+        self._teardown.start()
 
         # create representations for already known devices
         for dev in self._store.get_devices().values():
             self._create_bridge(dev)
 
-        # subscribe to \$state deletions
-        topic_pat = "homie/5/+/$state"
-        self._mqtt.update_topic_handlers({topic_pat: self._on_homie_state})
+        # subscribe to \$state deletions and, with one filter for all
+        # devices, to /set commands of every settable property
+        self._mqtt.update_topic_handlers({
+            "homie/5/+/$state": self._on_homie_state,
+            "homie/5/+/+/+/set": self._on_homie_set,
+        })
 
     # ------------------------------------------------------------------ #
     # external API                                                       #
@@ -66,25 +79,40 @@ class Extension(SyncExtension):
             br.homie.update_description(desc)
             self._logger.debug(f"Republished description for {dev_id}")
 
+    def on_device_availability(self, dev_id: str, available: bool):
+        # circuit breaker of the device opened (lost) or closed (ready)
+        br = self.device_bridges.get(dev_id)
+        if br:
+            br.homie.set_state("ready" if available else "lost")
+
     def on_device_renamed(self, dev_id: str, new_name: str):
         # remove old Homie‑tree then create new one (Homie‑spec demands new id)
         self._drop_bridge(dev_id)
         self._create_bridge(self._store.get_devices(dev_id))
 
+    def on_bridge_stop(self, bridge):
+        pending = self._teardown.pending()
+        if pending:
+            self._logger.warning(f"Unfinished Homie teardowns on stop: {pending}")
+        self._teardown.stop()
+
     # ------------------------------------------------------------------ #
     # internals                                                          #
     # ------------------------------------------------------------------ #
     def _create_bridge(self, tuya_dev):
         try:
             homie_id, desc, mapping, strict = self._conv.convert_device(tuya_dev.to_dict())
+            # do not let a queued teardown wipe the tree we are about to publish
+            self._teardown.cancel(homie_id)
             holder = {}
             def _on_set(node, prop, val, _h=holder):
                 if 'bridge' in _h:
                     _h['bridge'].on_set(node, prop, val)
-            homie = HomieDevice(self._mqtt, homie_id, desc, on_set=_on_set)
+            homie = HomieDevice(self._mqtt, homie_id, desc, on_set=_on_set, subscribe=False)
             bridge = DeviceBridge(tuya_dev, homie, mapping=mapping, strict=strict, logger=self._logger)
             holder['bridge'] = bridge
             self.device_bridges[tuya_dev.dev_id] = bridge
+            self._by_homie_id[homie_id] = bridge
             self._logger.info(f"Homie device ready: Tuya {tuya_dev.dev_id} → homie/5/{homie_id}")
         except Exception as exc:
             self._logger.error(f"Failed to create Homie bridge for {tuya_dev.dev_id}: {exc}")
@@ -93,8 +121,11 @@ class Extension(SyncExtension):
         br = self.device_bridges.pop(dev_id, None)
         if not br:
             return
+        if self._by_homie_id.get(br.homie.dev_id) is br:
+            del self._by_homie_id[br.homie.dev_id]
         try:
-            br.homie.teardown()
+            br.homie.release()
+            self._teardown.submit(br.homie.dev_id, br.homie.retained_topics())
         except Exception as exc:
             self._logger.warning(f"Error during teardown of {dev_id}: {exc}")
         self._logger.info(f"Homie device removed for {dev_id}")
@@ -102,6 +133,13 @@ class Extension(SyncExtension):
     # ------------------------------------------------------------------ #
     # MQTT callbacks                                                     #
     # ------------------------------------------------------------------ #
+    def _on_homie_set(self, topic: str, payload: str):
+        """homie/5/<homie_id>/<node>/<prop>/set → HomieDevice of that device."""
+        _, _, homie_id, node_id, prop_id, _ = topic.split("/")
+        br = self._by_homie_id.get(homie_id)
+        if br is None or not br.homie.handle_set(node_id, prop_id, payload):
+            self._logger.debug(f"Ignored set for unknown property {topic}")
+
     def _on_homie_state(self, topic: str, payload: str):
         """Triggered when someone publishes to …/$state. We care only about *empty* retained payloads
         meaning *device removal* per convention."""
@@ -114,17 +152,13 @@ class Extension(SyncExtension):
             if br.homie.dev_id == homie_id:
                 self._logger.info(f"Received delete for homie/5/{homie_id}")
 
-                # 1. убираем из DeviceStore (если успело появиться)
+                # 1. убираем из DeviceStore (если успело появиться),
+                #    devices.json обновится из реестра сам
                 try:
                     self._store.remove_device(dev_id)
                 except KeyError:
                     pass
 
-                # 2. чистим devices.json
-                conf = self._store.read(const.DEVICES_CONF_FILE)
-                conf = [d for d in conf if d.get("id") != dev_id]
-                self._store.write(const.DEVICES_CONF_FILE, conf)
-
-                # 3. снимаем retained-ветку Homie
+                # 2. снимаем retained-ветку Homie
                 self._drop_bridge(dev_id)
                 break
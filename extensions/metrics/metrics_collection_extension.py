@@ -1,4 +1,5 @@
 from __future__ import annotations
+import bisect
 import json
 from collections import defaultdict
 from dataclasses import dataclass, field
@@ -6,16 +7,66 @@ import time
 import queue
 from extensions.base_extension_api import AsyncExtension, StatusPolled
 
+# Upper bounds (seconds) of latency histogram buckets, the last bucket is +inf
+LATENCY_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+@dataclass
+class LatencyHistogram:
+    counts: list = field(default_factory=lambda: [0] * (len(LATENCY_BUCKETS) + 1))
+    total: float = 0.0
+    max: float = 0.0
+
+    def observe(self, value: float):
+        idx = bisect.bisect_left(LATENCY_BUCKETS, value)
+        self.counts[idx] += 1
+        self.total += value
+        self.max = max(self.max, value)
+
+    def snapshot(self) -> dict:
+        n = sum(self.counts)
+        counts = list(self.counts)
+        while counts and counts[-1] == 0:
+            counts.pop()            # trailing empty buckets are implied
+        return {
+            "n": n,
+            "avg": round(self.total / n, 4) if n else 0,
+            "max": round(self.max, 4),
+            "counts": counts,
+        }
+
+
+@dataclass
+class TaskLatency:
+    """Latency of one command kind of one device."""
+    wait: LatencyHistogram = field(default_factory=LatencyHistogram)   # enqueue -> dequeue
+    exec: LatencyHistogram = field(default_factory=LatencyHistogram)   # transport call
+    e2e: LatencyHistogram = field(default_factory=LatencyHistogram)    # enqueue -> done
+    ttl_drops: int = 0
+
+    def snapshot(self) -> dict:
+        snap = {}
+        if any(self.e2e.counts):
+            snap = {"wait": self.wait.snapshot(), "exec": self.exec.snapshot(), "e2e": self.e2e.snapshot()}
+        if self.ttl_drops:
+            snap["ttl_drops"] = self.ttl_drops
+        return snap
+
+
 @dataclass
 class PollingMetrics:
     total: int = 0
     errors: dict = field(default_factory=lambda: defaultdict(int))
     slow: int = 0
+    coalesced: int = 0
+    overruns: int = 0
 
 class Extension(AsyncExtension):
     def __init__(self, publish_interval: float = 30.0):
         super().__init__()
         self.metrics = PollingMetrics()
+        # dev_id -> command kind -> TaskLatency, reset after every snapshot
+        self.latency: dict = defaultdict(lambda: defaultdict(TaskLatency))
         self._publish_interval = publish_interval
         self._last_publish = time.time()
 
@@ -26,10 +77,35 @@ class Extension(AsyncExtension):
             "total_polls": self.metrics.total,
             "error_stats": dict(self.metrics.errors),
             "slow_responses": self.metrics.slow,
+            "coalesced_polls": self.metrics.coalesced,
+            "cycle_overruns": self.metrics.overruns,
         })
         self.bridge._mqtt.mqtt_publish_value_to_topic(
             f"{self.bridge.service_id}/bridge/metrics", snapshot
         )
+        self._publish_latency_snapshot()
+
+    def _publish_latency_snapshot(self):
+        """
+        Per device and command kind histograms of the last publish interval:
+        {"buckets": [...], "devices": {"<id>": {"update_status": {"wait": {...}, ...}}}}
+        """
+        devices = {}
+        for dev_id, kinds in self.latency.items():
+            per_kind = {kind: lat.snapshot() for kind, lat in kinds.items()}
+            per_kind = {kind: snap for kind, snap in per_kind.items() if snap}
+            if per_kind:
+                devices[dev_id] = per_kind
+        self.latency.clear()
+        if not devices:
+            return
+        snapshot = json.dumps(
+            {"interval": self._publish_interval, "buckets": LATENCY_BUCKETS, "devices": devices},
+            separators=(",", ":"),
+        )
+        self.bridge._mqtt.mqtt_publish_value_to_topic(
+            f"{self.bridge.service_id}/bridge/metrics/latency", snapshot
+        )
 
     def handle(self, event):
         etype, data = event
@@ -37,6 +113,19 @@ class Extension(AsyncExtension):
             self.metrics.total += 1
         elif etype == "inc_slow":
             self.metrics.slow += 1
+        elif etype == "inc_coalesced":
+            self.metrics.coalesced += 1
+        elif etype == "overrun":
+            self.metrics.overruns += data
+        elif etype == "task":
+            dev_id, kind, wait, exec_time, e2e = data
+            lat = self.latency[dev_id][kind]
+            lat.wait.observe(wait)
+            lat.exec.observe(exec_time)
+            lat.e2e.observe(e2e)
+        elif etype == "ttl_drop":
+            dev_id, kind = data
+            self.latency[dev_id][kind].ttl_drops += 1
         elif etype == "error":
             self.metrics.errors[data] += 1
         elif etype == "status":
@@ -76,6 +165,19 @@ class Extension(AsyncExtension):
     def inc_slow(self):
         self.push(("inc_slow", None))
 
+    def inc_coalesced(self):
+        self.push(("inc_coalesced", None))
+
+    def record_overruns(self, count: int):
+        self.push(("overrun", count))
+
+    # TuyaDevice observer API
+    def observe_task(self, dev_id: str, kind: str, wait: float, exec_time: float, e2e: float):
+        self.push(("task", (dev_id, kind, wait, exec_time, e2e)))
+
+    def record_drop(self, dev_id: str, kind: str):
+        self.push(("ttl_drop", (dev_id, kind)))
+
     def record_error(self, err_type: str):
         self.push(("error", err_type))
 
@@ -0,0 +1,80 @@
+"""Shared test fixtures."""
+
+import json
+import time
+
+import pytest
+
+
+class IdleEngine:
+    """Device engine that never runs tasks: devices get no worker thread."""
+
+    def attach(self, device):
+        pass
+
+    def detach(self, device):
+        pass
+
+    def notify(self, device):
+        pass
+
+
+@pytest.fixture
+def idle_engine():
+    return IdleEngine()
+
+
+class FakeCloud:
+    """CloudAPI stand-in: answers every id but "ghost" after ``rtt`` seconds."""
+
+    cache = None
+
+    def __init__(self, rtt=0.0):
+        self.rtt = rtt
+        self.calls = []
+
+    def get_devices(self, dev_ids, force=False, allow_stale=True):
+        self.calls.append(list(dev_ids))
+        time.sleep(self.rtt)
+        return [{"id": i, "name": f"n-{i}", "product_name": "Plug"} for i in dev_ids if i != "ghost"]
+
+
+class FakeScanStore:
+    """DeviceStore stand-in for the scanner: one added device, in-memory local scan."""
+
+    def __init__(self):
+        self.scan = {}
+
+    def get_devices(self, dev_id=None):
+        return {"known": object()}
+
+    def load_local_scan(self):
+        return dict(self.scan)
+
+    def save_local_scan(self, scan):
+        self.scan = scan
+
+
+class FakeMqtt:
+    """Records ``(topic, decoded JSON)`` of every publish."""
+
+    def __init__(self):
+        self.published = []
+
+    def mqtt_publish_value_to_topic(self, topic, value):
+        self.published.append((topic, json.loads(value)))
+
+
+@pytest.fixture
+def fake_cloud():
+    return FakeCloud()
+
+
+@pytest.fixture
+def scan_store():
+    return FakeScanStore()
+
+
+@pytest.fixture
+def fake_mqtt():
+    return FakeMqtt()
@@ -0,0 +1,29 @@
+"""Tests for AsyncDeviceEngine serving TuyaDevice queues."""
+
+import logging
+import threading
+
+from core.async_device_engine import AsyncDeviceEngine
+from core.tuya_device_entity import TuyaDevice
+
+
+def test_engine_runs_device_tasks_in_order():
+    engine = AsyncDeviceEngine(logging.getLogger("test"), loops=1, io_threads=2)
+    device = TuyaDevice("dummy123", engine=engine)
+    done = threading.Event()
+    results = []
+
+    def _cb(dev_id, feedback, elapsed):
+        results.append((dev_id, feedback))
+        if len(results) == 3:
+            done.set()
+
+    for n in range(3):
+        device._enqueue(lambda n=n: n, callback=_cb)
+
+    assert done.wait(2.0)
+    assert results == [("dummy123", 0), ("dummy123", 1), ("dummy123", 2)]
+    assert device._cmd_thread is None
+
+    device.stop_worker()
+    engine.stop()
@@ -0,0 +1,44 @@
+"""Tests for the per-device CircuitBreaker."""
+
+import random
+
+from core.circuit_breaker import BreakerState, CircuitBreaker, DeviceBreakers
+
+
+def _breaker():
+    return CircuitBreaker(failure_threshold=3, base_delay=10.0, max_delay=40.0, jitter=0.0,
+                          rng=random.Random(1))
+
+
+def test_opens_after_threshold_and_closes_on_success():
+    br = _breaker()
+    assert br.record_failure(0.0) is None
+    assert br.record_failure(1.0) is None
+    assert br.record_failure(2.0) is BreakerState.OPEN
+    assert br.allow(5.0) is False
+    assert br.allow(12.0) is True
+    assert br.state is BreakerState.HALF_OPEN
+    assert br.record_success() is BreakerState.CLOSED
+    assert br.allow(12.0) is True
+
+
+def test_failed_probes_back_off_exponentially():
+    br = _breaker()
+    for t in range(3):
+        br.record_failure(float(t))
+    probes = []
+    now = 2.0
+    for _ in range(4):
+        now = br.next_probe
+        assert br.allow(now)
+        assert br.record_failure(now) is None      # still dead, no new transition
+        probes.append(br.next_probe - now)
+    assert probes == [20.0, 40.0, 40.0, 40.0]
+
+
+def test_only_unreachable_errors_count():
+    breakers = DeviceBreakers(failure_threshold=1, jitter=0.0)
+    assert breakers.on_failure("dev", "914") is None
+    assert breakers.state("dev") is BreakerState.CLOSED
+    assert breakers.on_failure("dev", "905") is BreakerState.OPEN
+    assert breakers.on_failure("dev", "914") is BreakerState.CLOSED
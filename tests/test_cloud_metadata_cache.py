@@ -0,0 +1,135 @@
+"""Tests for the Tuya Cloud metadata cache and CloudAPI.get_devices()."""
+
+import logging
+import threading
+import time
+
+from core.tuya import tuya_constants as const
+from core.tuya.cloud.cloud_metadata_cache import CloudMetadataCache
+from core.tuya.cloud.tuya_openapi_rest_client import CloudAPI
+
+MAPPING = {"1": {"code": "switch_1", "type": "Boolean"}}
+CLOUD = [
+    {"id": "dev1", "key": "k1", "name": "Plug", "product_id": "pk1", "product_name": "Smart Plug",
+     "mac": "aa", "icon": "i.png", "mapping": MAPPING},
+    {"id": "dev2", "key": "k2", "name": "Plug 2", "product_id": "pk1", "product_name": "Smart Plug",
+     "mapping": MAPPING},
+]
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class _FakeCloud:
+    token = None
+
+    def __init__(self, answer):
+        # shared with the per-request copies CloudAPI makes
+        self.state = {"answer": answer}
+        self.calls = []
+        self.apiDeviceID = ""
+
+    def getdevices(self, verbose=False, include_map=False):
+        self.calls.append(self.apiDeviceID)
+        return self.state["answer"]
+
+
+def _api(cache, answer, monkeypatch):
+    monkeypatch.setattr(CloudAPI, "_init_cloud", lambda self: None)
+    api = CloudAPI(logging.getLogger("test"), cache=cache)
+    api._cloud = _FakeCloud(answer)
+    return api
+
+
+def test_cache_ttl_product_index_and_persistence(tmp_path):
+    clock = _Clock()
+    path = tmp_path / "cloud_cache.json"
+    cache = CloudMetadataCache(str(path), ttl=60, clock=clock)
+    cache.put_many(CLOUD)
+    assert cache.get("dev1")["mapping"] == MAPPING and cache.get("dev1")["key"] == "k1"
+    assert cache.product("pk1")["product_name"] == "Smart Plug"
+
+    reloaded = CloudMetadataCache(str(path), ttl=60, clock=clock)
+    assert reloaded.get("dev2")["mapping"] == MAPPING
+    assert '"mapping"' in path.read_text() and path.read_text().count('"switch_1"') == 1
+
+    clock.now += 61
+    assert reloaded.get("dev1") is None and reloaded.get("dev1", stale=True)["name"] == "Plug"
+    reloaded.invalidate("dev1")
+    assert reloaded.lookup(["dev1", "dev2"], stale=True)[1] == ["dev1"]
+
+
+def test_cache_file_is_resolved_like_other_data_files(tmp_path, monkeypatch):
+    monkeypatch.setattr(const, "CLOUD_CACHE_FILE", None)
+    monkeypatch.setattr(const, "LOCAL_SCAN_FILE", str(tmp_path / "local_scan.json"))
+    assert CloudMetadataCache.resolve_path({}) == str(tmp_path / "cloud_cache.json")
+    assert CloudMetadataCache.resolve_path({"cache_file": "/data/cache.json"}) == "/data/cache.json"
+
+    monkeypatch.setattr(const, "CLOUD_CACHE_FILE", str(tmp_path / "env.json"))
+    assert CloudMetadataCache.resolve_path({"cache_file": "/data/cache.json"}) == str(tmp_path / "env.json")
+
+    monkeypatch.setattr(const, "CLOUD_CACHE_FILE", None)
+    monkeypatch.setattr(const, "LOCAL_SCAN_FILE", None)
+    assert CloudMetadataCache.from_config({}).path is None
+
+
+def test_get_devices_uses_cache_and_serves_stale_offline(monkeypatch):
+    clock = _Clock()
+    cache = CloudMetadataCache(None, ttl=60, clock=clock)
+    api = _api(cache, CLOUD, monkeypatch)
+
+    assert [d["id"] for d in api.get_devices(["dev1"])] == ["dev1"]
+    assert [d["id"] for d in api.get_devices(["dev2", "dev1"])] == ["dev2", "dev1"]
+    assert len(api._cloud.calls) == 1           # one answer covers the whole account
+
+    clock.now += 61
+    api._cloud.state["answer"] = {"Error": "Network Error", "Payload": None}
+    assert api.get_devices(["dev1"])[0]["key"] == "k1"
+    assert api.get_devices(["dev1"], force=True, allow_stale=False)["Error"] == "Network Error"
+
+    # only dev1 is cached: a partial answer for the scan, the error for add
+    assert [d["id"] for d in api.get_devices(["dev1", "dev3"])] == ["dev1"]
+    answer = api.get_devices(["dev1", "dev3"], partial=False)
+    assert answer["Error"] == "Network Error" and answer["Missing"] == ["dev3"]
+
+
+def test_concurrent_requests_do_not_share_device_ids(monkeypatch):
+    active, peak = [0], [0]
+    lock = threading.Lock()
+
+    class _EchoCloud(_FakeCloud):
+        token = "t0"
+
+        def getdevices(self, verbose=False, include_map=False):
+            ids = self.apiDeviceID
+            with lock:
+                active[0] += 1
+                peak[0] = max(peak[0], active[0])
+            time.sleep(0.02)
+            with lock:
+                active[0] -= 1
+            if ids == "dev7":
+                self.token = "t1"                   # renewed on this copy
+            return [{"id": i.strip()} for i in ids.split(",")]
+
+    monkeypatch.setattr(CloudAPI, "_init_cloud", lambda self: None)
+    api = CloudAPI(logging.getLogger("test"), max_concurrency=3)
+    api._cloud = _EchoCloud(None)
+    results = {}
+
+    def _call(idx):
+        results[idx] = api.get_devices([f"dev{idx}"])
+
+    threads = [threading.Thread(target=_call, args=(i,)) for i in range(10)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert all(results[i] == [{"id": f"dev{i}"}] for i in range(10))
+    assert 1 < peak[0] <= 3 and len(api._clients) <= 3
+    assert api._cloud.token == "t1" and api._cloud.apiDeviceID == ""
@@ -0,0 +1,84 @@
+"""Push mode: frames sent by persistent devices reach the status callback."""
+
+import json
+import logging
+import socket
+import threading
+
+from core.device_push_listener import PushListener
+from core.tuya_device_entity import TuyaDevice
+
+
+class _SocketTransport:
+    """Persistent connection stand-in: one end of a socketpair."""
+
+    def __init__(self):
+        self.sock, self.peer = socket.socketpair()
+        self.heartbeats = 0
+
+    def fileno(self):
+        return self.sock.fileno()
+
+    def receive(self):
+        return json.loads(self.sock.recv(4096))
+
+    def heartbeat(self):
+        self.heartbeats += 1
+
+    def close(self):
+        self.sock.close()
+        self.peer.close()
+
+
+class _Store:
+    def __init__(self, *devices):
+        self.devices = {dev.dev_id: dev for dev in devices}
+
+    def get_devices(self):
+        return self.devices
+
+
+class _Broken:
+    dev_id = "broken"
+    persistent = True
+
+    def push_fileno(self):
+        raise AttributeError("'NoneType' object has no attribute 'fileno'")
+
+    def heartbeat_async(self, ttl=5.0):
+        pass
+
+
+def test_push_frames_are_published_and_listener_survives_broken_devices():
+    device = TuyaDevice("push1", persistent=True)
+    transport = device.tuya_dev = _SocketTransport()
+    received = []
+    got = threading.Event()
+
+    def _on_status(dev_id, feedback, elapsed):
+        received.append((dev_id, feedback))
+        got.set()
+
+    listener = PushListener(_Store(_Broken(), device), _on_status, logging.getLogger("test"),
+                            heartbeat_interval=60.0)
+    listener.start()
+    try:
+        transport.peer.send(json.dumps({"dps": {"1": True}}).encode())
+        assert got.wait(3.0)
+        assert received == [("push1", {"dps": {"1": True}})]
+        assert transport.heartbeats == 1
+        assert listener._thread.is_alive()
+    finally:
+        listener.stop()
+        device.stop_worker()
+        transport.close()
+
+
+def test_heartbeat_without_transport_is_a_no_op():
+    device = TuyaDevice("push2", persistent=True)
+    try:
+        assert device.tuya_dev is None
+        assert device._heartbeat() is None
+        assert device.push_fileno() is None
+    finally:
+        device.stop_worker()
@@ -0,0 +1,147 @@
+"""Tests for the in-memory device registry and its write-behind snapshot."""
+
+import json
+import logging
+import os
+import stat
+import time
+
+import pytest
+
+from core.device_registry_backend import (
+    JsonRegistryBackend, SqliteRegistryBackend, atomic_write_json, resolve_sqlite_path,
+)
+from core.device_repository import DeviceStore
+
+
+RECORDS = [
+    {"id": "dev1", "key": "k1", "category": "kg", "mapping": {"1": {"code": "switch_1"}}, "name": "Plug"},
+    {"id": "dev2", "key": "k2", "category": "dj", "mapping": {}},
+]
+
+
+@pytest.fixture
+def make_store(tmp_path, idle_engine):
+    def _make(delay=60.0):
+        path = tmp_path / "devices.json"
+        path.write_text(json.dumps(RECORDS))
+        # local scan in tmp_path too, never the real TUYA2MQTT_LOCAL_SCAN_FILE
+        backend = JsonRegistryBackend(str(path), str(tmp_path / "local_scan.json"))
+        # idle engine - the devices get no worker threads to leak
+        store = DeviceStore(logging.getLogger("test"), engine=idle_engine,
+                            persist_delay=delay, backend=backend)
+        store.open()
+        return store, path
+
+    return _make
+
+
+def test_changes_stay_in_memory_until_flush(make_store):
+    store, path = make_store()
+    assert store.update_record("dev1", friendly_name="kitchen")
+    store.insert_unknown_dps("dev2", ["101"])
+    store.remove_device("dev1")
+    assert json.loads(path.read_text()) == RECORDS      # snapshot not written yet
+    assert store.get_devices("dev2").get_mapping()["101"]["type"] == "Unknown"
+
+    store.close()
+    saved = json.loads(path.read_text())
+    assert [r["id"] for r in saved] == ["dev2"]
+    assert saved[0]["mapping"]["101"]["code"] == "101"
+    assert not list(path.parent.glob(".tmp-*"))
+
+
+def test_writer_coalesces_in_background(make_store):
+    store, path = make_store(delay=0.05)
+    for idx in range(20):
+        store.update_record("dev2", friendly_name=f"name{idx}")
+    store._writer.join(0.3)         # writer keeps running, just give it time
+    assert json.loads(path.read_text())[1]["friendly_name"] == "name19"
+    store.close()
+
+
+def test_load_devices_reconciles_in_place(make_store):
+    store, _ = make_store()
+    dev1, dev2 = store.get_devices("dev1"), store.get_devices("dev2")
+    conf = store.records()
+    conf[0]["friendly_name"] = "kitchen"
+    conf[1]["ip"] = "10.0.0.2"
+    reconnects = []
+    dev2._enqueue = lambda fn, *a, **kw: reconnects.append(fn.__name__)
+    conf.append({"id": "dev3", "key": "k3", "mapping": {}})
+    store.load_devices(conf)
+    assert store.get_devices("dev1") is dev1 and dev1.friendly_name == "kitchen"
+    assert store.get_devices("dev2") is dev2 and reconnects == ["_reconnect"]
+
+    store.load_devices(conf[1:])
+    assert set(store.get_devices()) == {"dev2", "dev3"}
+    store.close()
+
+
+def test_sqlite_backend_roundtrip(tmp_path, idle_engine):
+    devices_json = tmp_path / "devices.json"
+    devices_json.write_text(json.dumps(RECORDS))
+    scan_json = tmp_path / "local_scan.json"
+    scan_json.write_text(json.dumps({"10.0.0.5": {"ip": "10.0.0.5", "gwId": "dev2"}}))
+
+    backend = SqliteRegistryBackend(str(tmp_path / "devices.db"))
+    assert backend.import_json(str(devices_json), str(scan_json)) == 2
+    store = DeviceStore(logging.getLogger("test"), engine=idle_engine, persist_delay=60.0, backend=backend)
+    store.open()
+    store.update_record("dev2", friendly_name="lamp", ip="10.0.0.5")
+    store.replace_records(store.records() + [{"id": "dev3", "mapping": {}}])
+    store.remove_device("dev1")
+    store.flush()
+
+    assert [r["id"] for r in backend.load_devices()] == ["dev2", "dev3"]
+    assert backend.load_devices()[0]["friendly_name"] == "lamp"
+    assert backend.load_local_scan()["10.0.0.5"]["gwId"] == "dev2"
+    assert store.load_local_scan() == json.loads(scan_json.read_text())
+
+    out = tmp_path / "export.json"
+    assert backend.export_json(str(out)) == 2
+    store.close()
+
+
+def test_sqlite_file_is_resolved_like_other_data_files(tmp_path):
+    conf = tmp_path / "conf"
+    devices_json = str(conf / "devices.json")
+    assert resolve_sqlite_path({}, devices_json) == str(conf / "devices.db")
+    assert resolve_sqlite_path({"sqlite_path": "db/reg.db"}, devices_json) == str(conf / "db" / "reg.db")
+    assert resolve_sqlite_path({"sqlite_path": "/data/reg.db"}, devices_json) == "/data/reg.db"
+    env_db = str(tmp_path / "env.db")
+    assert resolve_sqlite_path({"sqlite_path": "/data/reg.db"}, devices_json, env_db) == env_db
+    with pytest.raises(ValueError):
+        resolve_sqlite_path({}, None)
+
+
+def test_join_uses_gwid_index(make_store):
+    store, _ = make_store()
+    scan = {f"10.0.{i // 250}.{i % 250}": {"ip": f"10.0.{i // 250}.{i % 250}", "gwId": f"new{i}",
+                                            "version": "3.4"} for i in range(500)}
+    scan["10.9.9.9"] = {"Error": "timeout"}
+    store.save_local_scan(scan)
+    cloud = [{"id": f"new{i}", "key": "k", "mapping": {}} for i in range(500)]
+    cloud.append({"id": "not-scanned", "mapping": {}})
+
+    start = time.perf_counter()
+    new, joined = store.join_local_and_cloud_configs(cloud, [f"new{i}" for i in range(500)])
+    assert time.perf_counter() - start < 0.5
+    assert len(new) == 500 and new[7]["ip"] == "10.0.0.7"
+    assert [d["id"] for d in joined[:2]] == ["dev1", "dev2"] and len(joined) == 502
+    store.close()
+
+
+def test_atomic_write_keeps_file_mode(tmp_path):
+    target = tmp_path / "devices.json"
+    target.write_text("[]")
+    os.chmod(target, 0o640)
+    atomic_write_json(str(target), RECORDS)
+    assert stat.S_IMODE(os.stat(target).st_mode) == 0o640
+
+    umask = os.umask(0o022)
+    try:
+        atomic_write_json(str(tmp_path / "new.json"), [])
+    finally:
+        os.umask(umask)
+    assert stat.S_IMODE(os.stat(tmp_path / "new.json").st_mode) == 0o644
@@ -0,0 +1,113 @@
+"""Live discovery index and in-place relocation of devices after an IP change."""
+
+import json
+import logging
+import socket
+import threading
+import time
+
+import pytest
+
+from core.device_repository import DeviceStore
+from core.tuya.discovery import tuya_udp_device_scanner
+from core.tuya.discovery.tuya_udp_device_scanner import Scanner, open_discovery_sockets
+from core.tuya.discovery.tuya_udp_discovery_listener import DiscoveryListener
+
+
+def test_index_reports_new_and_moved_devices():
+    seen = []
+    clock = [100.0]
+    listener = DiscoveryListener(logging.getLogger("test"), on_seen=lambda d, old: seen.append((d.ip, old)),
+                                 clock=lambda: clock[0])
+    announce = {"gwId": "dev1", "version": "3.4", "productKey": "pk"}
+    listener.handle(announce, "10.0.0.5")
+    clock[0] += 5
+    listener.handle(announce, "10.0.0.5")
+    listener.handle(announce, "10.0.0.9")
+
+    assert seen == [("10.0.0.5", None), ("10.0.0.9", "10.0.0.5")]
+    entry = listener.get("dev1")
+    assert (entry.ip, entry.version, entry.last_seen) == ("10.0.0.9", "3.4", 105.0)
+
+
+def test_relocate_device_rebuilds_transport_in_place(tmp_path, idle_engine):
+    path = tmp_path / "devices.json"
+    path.write_text(json.dumps([{"id": "dev1", "key": "k1", "mapping": {}}]))
+    store = DeviceStore(logging.getLogger("test"), engine=idle_engine, persist_delay=60.0)
+    store.open(str(path))
+    dev = store.get_devices("dev1")
+    reconnects = []
+    dev._enqueue = lambda fn, *a, **kw: reconnects.append(fn.__name__)
+
+    assert store.relocate_device("dev1", "10.0.0.9")
+    assert not store.relocate_device("dev1", "10.0.0.9")
+    assert not store.relocate_device("unknown", "10.0.0.1")
+    assert store.get_devices("dev1") is dev and dev.ip == "10.0.0.9"
+    assert reconnects == ["_reconnect"]
+    store.close()
+    assert json.loads(path.read_text())[0]["ip"] == "10.0.0.9"
+
+
+def test_scan_is_answered_from_warm_discovery_cache(fake_cloud, fake_mqtt, scan_store):
+    listener = DiscoveryListener(logging.getLogger("test"))
+    listener._started = time.time() - 30            # listening long enough
+    listener.handle({"gwId": "dev1", "version": "3.4"}, "10.0.0.5")
+    listener.handle({"gwId": "known", "version": "3.3"}, "10.0.0.6")
+    mqtt, store = fake_mqtt, scan_store
+    scanner = Scanner(mqtt, fake_cloud, logging.getLogger("test"), store, discovery=listener)
+    scanner._scan_local_network_gen = None          # a UDP scan would fail the test
+
+    start = time.perf_counter()
+    scanner.scan_gen_local_network(None)
+    assert time.perf_counter() - start < 0.2
+    assert [list(p) for _, p in mqtt.published] == [["10.0.0.5"]]    # "known" is already added
+    entry = mqtt.published[0][1]["10.0.0.5"]
+    assert entry["name"] == "n-dev1" and entry["merge_with_cloud"] is True
+
+    mqtt.published.clear()
+    threading.Timer(0.1, listener.handle, ({"gwId": "dev2", "version": "3.5"}, "10.0.0.7")).start()
+    scanner.scan_gen_local_network(0.4, fresh=True)
+    assert [list(p) for _, p in mqtt.published] == [["10.0.0.5"], ["10.0.0.7"]]
+    assert set(store.scan) == {"10.0.0.5", "10.0.0.7"}
+
+
+@pytest.mark.skipif(not hasattr(socket, "SO_REUSEPORT"), reason="no SO_REUSEPORT")
+def test_listener_ports_stay_open_for_reuseport_binds():
+    listener_socks = open_discovery_sockets()
+    scan_socks = open_discovery_sockets()
+    # the way tinytuya.deviceScan() binds its listeners
+    tiny = socket.socket(socket.AF_INET, socket.SOCK_DGRAM, socket.IPPROTO_UDP)
+    tiny.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+    try:
+        tiny.bind(("", tuya_udp_device_scanner.UDPPORT))
+    finally:
+        for sock in listener_socks + scan_socks + [tiny]:
+            sock.close()
+
+
+def test_basic_scan_reports_socket_errors(monkeypatch, fake_cloud, fake_mqtt, scan_store):
+    def _busy():
+        raise OSError(98, "Address already in use")
+
+    monkeypatch.setattr(tuya_udp_device_scanner, "open_discovery_sockets", _busy)
+    scanner = Scanner(fake_mqtt, fake_cloud, logging.getLogger("test"), scan_store)
+    scanner.scan_local_network()
+    assert [p for _, p in fake_mqtt.published] == [
+        {"Error": "Local network scan failed", "Err": 98, "Payload": "[Errno 98] Address already in use"}
+    ]
+
+
+def test_basic_scan_does_not_inherit_scan_gen_time(fake_cloud, fake_mqtt, scan_store):
+    scanner = Scanner(fake_mqtt, fake_cloud, logging.getLogger("test"), scan_store)
+    scan_times = []
+
+    def _gen(scantime=None, **kwargs):
+        scan_times.append(scantime)
+        yield {"10.0.0.5": {"id": "dev1", "gwId": "dev1", "ip": "10.0.0.5"}}
+
+    scanner._scan_local_network_gen = _gen
+    scanner.scan_gen_local_network(0.4, fresh=True)
+    scanner.scan_local_network()
+    scanner.scan_gen_all_local_network(None)
+    assert scan_times == [0.4, 15, 15]
+    assert list(fake_mqtt.published[-2][1]) == ["10.0.0.5"]      # basic scan answer
@@ -0,0 +1,43 @@
+"""Tests for the background Homie teardown pipeline."""
+
+import threading
+
+from extensions.homie.common.homie_teardown_pipeline import TeardownPipeline, TokenBucket
+
+
+class _Mqtt:
+    def __init__(self):
+        self.sent = []
+        self.done = threading.Event()
+
+    def publish(self, topic, payload, retain=None):
+        self.sent.append((topic, payload, retain))
+        if topic.endswith("last"):
+            self.done.set()
+
+
+def test_token_bucket_limits_rate():
+    now = [0.0]
+    bucket = TokenBucket(rate=10.0, burst=2, clock=lambda: now[0])
+    assert bucket.take() == 0.0
+    assert bucket.take() == 0.0
+    assert abs(bucket.take() - 0.1) < 1e-9
+    now[0] += 0.1
+    assert bucket.take() == 0.0
+
+
+def test_pipeline_clears_topics_and_cancel():
+    mqtt = _Mqtt()
+    pipe = TeardownPipeline(mqtt, rate=1000.0, burst=1000)
+    pipe.submit("gone", ["homie/5/gone/$state", "homie/5/gone/$description"])
+    pipe.submit("back", ["homie/5/back/$state"])
+    assert pipe.cancel("back")
+    pipe.submit("z", ["homie/5/z/last"])
+    pipe.start()
+    assert mqtt.done.wait(2.0)
+    pipe.stop()
+    assert [t for t, _, _ in mqtt.sent] == [
+        "homie/5/gone/$state", "homie/5/gone/$description", "homie/5/z/last"
+    ]
+    assert all(p == "" and r is True for _, p, r in mqtt.sent)
+    assert pipe.pending() == {}
@@ -0,0 +1,20 @@
+"""Tests for latency histograms of the metrics extension."""
+
+from extensions.metrics.metrics_collection_extension import LatencyHistogram, TaskLatency
+
+
+def test_histogram_buckets_and_trailing_zeros():
+    h = LatencyHistogram()
+    for v in (0.005, 0.02, 0.02, 0.3):
+        h.observe(v)
+    snap = h.snapshot()
+    assert snap["n"] == 4
+    assert snap["counts"] == [1, 2, 0, 0, 0, 1]
+    assert snap["max"] == 0.3
+
+
+def test_task_latency_snapshot_only_drops():
+    lat = TaskLatency()
+    assert lat.snapshot() == {}
+    lat.ttl_drops += 2
+    assert lat.snapshot() == {"ttl_drops": 2}
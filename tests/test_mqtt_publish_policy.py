@@ -0,0 +1,37 @@
+"""Tests for the per topic class MQTT publish policy."""
+
+from core.mqtt_publish_policy import PublishPolicy, PublishPolicyTable
+
+
+def _table():
+    return PublishPolicyTable.from_config(
+        {
+            "status": {"qos": 0, "expiry": 600},
+            "homie-lifecycle": {"qos": 2},
+            "scan": {"topics": ["{service}/bridge/response/scan"], "qos": 1, "retain": False},
+        },
+        "tuya2mqtt",
+    )
+
+
+def test_classes_resolve_by_topic():
+    table = _table()
+    assert table.classify("tuya2mqtt/devices/abc/status") == (
+        "status", PublishPolicy(qos=0, retain=True, expiry=600)
+    )
+    assert table.classify("homie/5/abc/$state")[0] == "homie-lifecycle"
+    assert table.classify("homie/5/abc/switch/state")[0] == "homie-property"
+    assert table.classify("homie/5/abc/$log/error")[0] == "log"
+    # custom classes are matched before the built-in ones
+    assert table.classify("tuya2mqtt/bridge/response/scan")[0] == "scan"
+    assert table.classify("tuya2mqtt/bridge/response/add")[0] == "bridge-response"
+    assert table.classify("tuya2mqtt/bridge/request/add")[0] == "default"      # inbound only
+    assert table.resolve("some/other/topic") == PublishPolicy()
+
+
+def test_expiry_properties_are_shared():
+    table = _table()
+    assert table.properties(0) is None
+    props = table.properties(600)
+    assert props.MessageExpiryInterval == 600
+    assert table.properties(600) is props
@@ -0,0 +1,112 @@
+"""Batched SUBSCRIBE packets and routing of the shared Homie /set subscription."""
+
+import logging
+from types import SimpleNamespace
+
+import paho.mqtt.client as mqtt
+
+from core.mqtt_client_wrapper import MqttModule
+from extensions.homie.lifecycle.homie_lifecycle_extension import Extension
+
+
+class _Client:
+    """paho client stand-in recording SUBSCRIBE and PUBLISH calls."""
+
+    def __init__(self):
+        self.subscribes = []
+        self.published = []
+
+    def subscribe(self, topics):
+        self.subscribes.append([t for t, _ in topics])
+        return mqtt.MQTT_ERR_SUCCESS, len(self.subscribes)
+
+    def publish(self, topic, payload, qos=0, retain=False, properties=None):
+        self.published.append((topic, payload))
+
+    def is_connected(self):
+        return True
+
+    def loop_start(self):
+        pass
+
+
+def _module(topics=None):
+    module = MqttModule(topics, "test", logging.getLogger("test"))
+    module._client = _Client()
+    module._connect = lambda: True
+    return module
+
+
+def _message(topic, payload):
+    return SimpleNamespace(topic=topic, payload=payload.encode())
+
+
+def test_filters_are_subscribed_in_batches_at_start_and_on_reconnect():
+    filters = [f"tuya2mqtt/devices/dev{i}/set" for i in range(250)]
+    module = _module({f: lambda t, p: None for f in filters})
+    client = module._client
+
+    module.mqtt_module_start("daemon")
+    assert [len(batch) for batch in client.subscribes] == [100, 100, 50]
+    assert sorted(sum(client.subscribes, [])) == sorted(filters)
+
+    client.subscribes.clear()
+    module._on_connect(client, None, None, 0)
+    assert [len(batch) for batch in client.subscribes] == [100, 100, 50]
+
+    client.subscribes.clear()
+    module._on_connect(client, None, None, 5)       # refused - nothing to subscribe
+    module.update_topic_handlers({filters[0]: lambda t, p: None, "homie/5/+/$state": lambda t, p: None})
+    assert client.subscribes == [["homie/5/+/$state"]]
+
+
+class _Tuya:
+    def __init__(self, dev_id):
+        self.dev_id = dev_id
+        self.sent = []
+
+    def to_dict(self):
+        return {"id": self.dev_id}
+
+    def set_status_async(self, dps):
+        self.sent.append(dps)
+
+
+class _Store:
+    def __init__(self, *devices):
+        self.devices = {dev.dev_id: dev for dev in devices}
+
+    def get_devices(self, dev_id=None):
+        return self.devices if dev_id is None else self.devices.get(dev_id)
+
+
+class _Converter:
+    def convert_device(self, dev):
+        desc = {"nodes": {"light": {"properties": {
+            "power": {"datatype": "boolean", "settable": True},
+            "temp": {"datatype": "integer"},
+        }}}}
+        mapping = {("light", "power"): "switch_led", ("light", "temp"): "temp_value"}
+        return f"h-{dev['id']}", desc, mapping, True
+
+
+def test_shared_set_subscription_is_routed_by_homie_id():
+    module = _module()
+    lamp, plug = _Tuya("lamp"), _Tuya("plug")
+    ext = Extension(module, _Store(lamp, plug), _Converter(), logging.getLogger("test"))
+    try:
+        # one wildcard for all devices instead of one filter per property
+        assert module._client.subscribes == [["homie/5/+/$state", "homie/5/+/+/+/set"]]
+
+        module._on_message(None, None, _message("homie/5/h-lamp/light/power/set", "true"))
+        assert lamp.sent == [{"switch_led": True}] and plug.sent == []
+
+        module._on_message(None, None, _message("homie/5/h-lamp/light/temp/set", "10"))   # read-only
+        module._on_message(None, None, _message("homie/5/h-unknown/light/power/set", "true"))
+        assert lamp.sent == [{"switch_led": True}] and plug.sent == []
+
+        ext.on_device_removed("plug")
+        module._on_message(None, None, _message("homie/5/h-plug/light/power/set", "false"))
+        assert plug.sent == []
+    finally:
+        ext.on_bridge_stop(None)
@@ -0,0 +1,46 @@
+"""Tests for the trie based MQTT topic router."""
+
+import random
+
+import paho.mqtt.client as mqtt
+
+from core.mqtt_topic_router import TopicRouter
+
+
+FILTERS = [
+    "tuya2mqtt/bridge/request/add",
+    "tuya2mqtt/devices/+/set",
+    "homie/5/+/$state",
+    "homie/5/+/+/+/set",
+    "homie/5/dev1/light/power/set",
+    "homie/5/#",
+    "homie/#",
+    "#",
+    "+/+",
+]
+
+
+def _router():
+    return TopicRouter({f: f for f in FILTERS})
+
+
+def test_matches_like_paho():
+    router = _router()
+    topics = [
+        "tuya2mqtt/bridge/request/add", "tuya2mqtt/devices/abc/set", "homie/5/dev1/$state",
+        "homie/5/dev1/light/power/set", "homie/5", "homie", "a/b", "$SYS/broker", "x",
+    ]
+    for topic in topics:
+        expected = sorted(f for f in FILTERS if mqtt.topic_matches_sub(f, topic))
+        assert sorted(router.match(topic)) == expected, topic
+
+
+def test_remove_prunes_and_stops_matching():
+    router = _router()
+    order = FILTERS[:]
+    random.Random(3).shuffle(order)
+    for f in order:
+        assert router.remove(f)
+        assert f not in router.match("homie/5/dev1/light/power/set")
+    assert not router.remove("homie/5/#")
+    assert router._root.children == {} and not router._exact
@@ -0,0 +1,78 @@
+"""Tests for the adaptive per-device PollScheduler."""
+
+import random
+import time
+
+from core.poll_scheduler import PollPolicy, PollScheduler
+
+
+class _Dev:
+    def __init__(self, category=""):
+        self.category = category
+
+
+def _scheduler():
+    policy = PollPolicy(min_interval=1.0, max_interval=8.0, backoff_factor=2.0, error_interval=60.0)
+    sched = PollScheduler(policy, category_policies={"dj": PollPolicy(1.0, 2.0, 2.0, 60.0)})
+    sched.sync({"plug": _Dev("cz"), "lamp": _Dev("dj")})
+    return sched
+
+
+def test_new_devices_are_spread_over_first_interval():
+    sched = _scheduler()
+    now = time.monotonic()
+    assert sorted(sched.pop_due(now + 1.0)) == ["lamp", "plug"]
+    assert sched.pop_due(now + 1.0) == []
+    assert PollScheduler._phase("plug", 1.0) != PollScheduler._phase("lamp", 1.0)
+
+
+def test_late_dispatch_is_reported_as_overrun():
+    sched = _scheduler()
+    now = time.monotonic()
+    sched.pop_due(now + 5.0)
+    count, max_lag = sched.take_overruns()
+    assert count == 2 and max_lag > 1.0
+    assert sched.take_overruns() == (0, 0.0)
+
+
+def test_jitter_keeps_due_time_within_bounds():
+    policy = PollPolicy(10.0, 10.0)
+    sched = PollScheduler(policy, jitter=0.1, rng=random.Random(1))
+    for _ in range(100):
+        assert 9.0 <= sched._next_due(0.0, 10.0) <= 11.0
+
+
+def test_interval_grows_while_unchanged_and_resets_on_change():
+    sched = _scheduler()
+    sched.on_status("plug", {"1": True})
+    assert sched.interval("plug") == 1.0
+    for expected in (2.0, 4.0, 8.0, 8.0):
+        sched.on_status("plug", {"1": True})
+        assert sched.interval("plug") == expected
+    sched.on_status("plug", {"1": False})
+    assert sched.interval("plug") == 1.0
+
+
+def test_category_policy_caps_lights():
+    sched = _scheduler()
+    for _ in range(5):
+        sched.on_status("lamp", {"20": True})
+    assert sched.interval("lamp") == 2.0
+
+
+def test_unreachable_devices_back_off_hard():
+    sched = _scheduler()
+    sched.on_error("plug", "901")
+    assert sched.interval("plug") == 8.0
+    for _ in range(5):
+        sched.on_error("plug", "905")
+    assert sched.interval("plug") == 60.0
+    sched.on_command("plug")
+    assert sched.interval("plug") == 1.0
+
+
+def test_removed_devices_are_forgotten():
+    sched = _scheduler()
+    sched.sync({"plug": _Dev("cz")})
+    assert sched.pop_due(time.monotonic() + 1.0) == ["plug"]
+    assert sched.interval("lamp") is None
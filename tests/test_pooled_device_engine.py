@@ -0,0 +1,46 @@
+"""Tests for PooledDeviceEngine serving TuyaDevice queues."""
+
+import logging
+import threading
+
+from core.pooled_device_engine import PooledDeviceEngine
+from core.tuya_device_entity import TuyaDevice
+
+
+def test_pool_keeps_per_device_order_and_command_priority():
+    engine = PooledDeviceEngine(logging.getLogger("test"), workers=3)
+    device = TuyaDevice("dummy123", engine=engine)
+    release = threading.Event()
+    order = []
+
+    device._enqueue(release.wait, 2.0)  # keep the device busy
+    device._enqueue(lambda: order.append("poll"), priority=1, ttl=5.0)
+    for n in range(3):
+        device._enqueue(lambda n=n: order.append(f"cmd{n}"))
+    release.set()
+    device._cmd_queue.join()
+
+    assert order == ["cmd0", "cmd1", "cmd2", "poll"]
+    device.stop_worker()
+    engine.stop()
+
+
+def test_pool_serves_many_devices_with_few_threads():
+    engine = PooledDeviceEngine(logging.getLogger("test"), workers=2)
+    devices = [TuyaDevice(f"dev{n}", engine=engine) for n in range(20)]
+    done = []
+    lock = threading.Lock()
+
+    def _cb(dev_id, feedback, elapsed):
+        with lock:
+            done.append(dev_id)
+
+    for dev in devices:
+        dev._enqueue(lambda: None, callback=_cb)
+    for dev in devices:
+        dev._cmd_queue.join()
+
+    assert sorted(done) == sorted(d.dev_id for d in devices)
+    for dev in devices:
+        dev.stop_worker()
+    engine.stop()
@@ -0,0 +1,44 @@
+"""Scan results are merged with the cloud in batches, off the UDP loop."""
+
+import logging
+import time
+
+from core.tuya.discovery.tuya_udp_device_scanner import Scanner
+
+
+def _scanner(cloud, mqtt, store):
+    scanner = Scanner(mqtt, cloud, logging.getLogger("test"), store, cloud_batch_size=20,
+                      cloud_batch_delay=0.05)
+
+    def _gen(**kwargs):
+        for idx in range(45):
+            yield {f"10.0.0.{idx}": {"id": f"dev{idx}", "ip": f"10.0.0.{idx}"}}
+        yield {"10.0.1.1": {"id": "known", "ip": "10.0.1.1"}}
+        yield {"10.0.1.2": {"id": "ghost", "ip": "10.0.1.2"}}
+
+    scanner._scan_local_network_gen = _gen
+    return scanner
+
+
+def test_scan_gen_merges_in_batches_and_streams(fake_cloud, fake_mqtt, scan_store):
+    cloud, mqtt, store = fake_cloud, fake_mqtt, scan_store
+    cloud.rtt = 0.05
+    start = time.perf_counter()
+    _scanner(cloud, mqtt, store).scan_gen_local_network(1)
+    assert time.perf_counter() - start < 0.5          # not 46 x rtt
+    assert len(cloud.calls) == 3 and max(len(c) for c in cloud.calls) == 20
+
+    published = [value for topic, value in mqtt.published]
+    assert len(published) == 46                       # known device skipped
+    assert published[0]["10.0.0.0"]["name"] == "n-dev0"
+    assert published[-1]["10.0.1.2"]["merge_with_cloud"] is False
+    assert set(store.scan) == {f"10.0.0.{i}" for i in range(45)} | {"10.0.1.2"}
+
+
+def test_basic_scan_batches_cloud_requests(fake_cloud, fake_mqtt, scan_store):
+    cloud, mqtt, store = fake_cloud, fake_mqtt, scan_store
+    scanner = _scanner(cloud, mqtt, store)
+    scan = {f"10.0.0.{i}": {"id": f"dev{i}"} for i in range(45)}
+    scanner._process_basic_scan(scan, "tuya2mqtt/bridge/response/scan")
+    assert [len(c) for c in cloud.calls] == [20, 20, 5]
+    assert len(mqtt.published[0][1]) == 45
@@ -0,0 +1,65 @@
+"""Tests for change-only status publishing."""
+
+import json
+import logging
+
+from core.status_publisher import AggregateStatusPublisher, StatusPublisher
+
+
+class _Recorder:
+    def __init__(self):
+        self.sent = []
+
+    def __call__(self, topic, payload, **kw):
+        self.sent.append((topic, json.loads(payload) if payload else payload))
+        self.kw = kw
+
+
+def test_delta_mode_publishes_only_changes():
+    rec = _Recorder()
+    pub = StatusPublisher(rec, "t2m", mode="delta", refresh_interval=60.0, delta_topic=True)
+    assert pub.publish("d1", {"switch_1": False, "request_status_time": 0.2}, now=0.0)
+    assert not pub.publish("d1", {"switch_1": False, "request_status_time": 0.3}, now=1.0)
+    assert pub.publish("d1", {"switch_1": True, "request_status_time": 0.3}, now=2.0)
+    assert rec.sent[-1] == ("t2m/devices/d1/status/delta", {"switch_1": True})
+    # forced refresh without a change does not produce a delta
+    assert pub.publish("d1", {"switch_1": True, "request_status_time": 0.3}, now=70.0)
+    assert rec.sent[-1][0] == "t2m/devices/d1/status"
+
+
+def test_full_mode_publishes_every_poll():
+    rec = _Recorder()
+    pub = StatusPublisher(rec, "t2m")
+    pub.publish("d1", {"switch_1": False})
+    pub.publish("d1", {"switch_1": False})
+    assert len(rec.sent) == 2
+
+
+def test_aggregate_publishes_one_snapshot_per_flush():
+    rec = _Recorder()
+    agg = AggregateStatusPublisher(rec, "t2m", logging.getLogger("test"), shard="category")
+    for idx in range(10):
+        agg.update(f"d{idx}", {"switch_1": idx % 2 == 0}, "kg" if idx < 5 else "dj")
+    assert agg.flush() == 2
+    assert sorted(t for t, _ in rec.sent) == ["t2m/devices/statuses/dj", "t2m/devices/statuses/kg"]
+    assert agg.flush() == 0
+    agg.forget("d0")
+    assert agg.flush() == 1
+    assert "d0" not in rec.sent[-1][1]
+
+
+def test_aggregate_ignores_poll_time_and_clears_empty_shards():
+    rec = _Recorder()
+    agg = AggregateStatusPublisher(rec, "t2m", logging.getLogger("test"), shard="category")
+    agg.update("d1", {"switch_1": True, "request_status_time": 0.2}, "kg")
+    agg.update("d2", {"switch_1": True, "request_status_time": 0.2}, "dj")
+    assert agg.flush() == 2
+    agg.update("d1", {"switch_1": True, "request_status_time": 0.4}, "kg")
+    assert agg.flush() == 0
+    agg.update("d1", {"switch_1": False, "request_status_time": 0.5}, "kg")
+    assert agg.flush() == 1 and rec.sent[-1][1]["d1"]["request_status_time"] == 0.5
+
+    agg.forget("d2")
+    assert agg.flush() == 1
+    assert rec.sent[-1] == ("t2m/devices/statuses/dj", "") and rec.kw == {"retain": True}
+    assert agg.flush() == 0
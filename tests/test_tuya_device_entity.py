@@ -0,0 +1,71 @@
+"""Tests for TuyaDevice command queue behaviour."""
+
+import threading
+
+from core.tuya_device_entity import TuyaDevice
+
+
+def test_status_polls_are_coalesced():
+    device = TuyaDevice("dummy123")
+    release = threading.Event()
+    polled = threading.Event()
+    device._enqueue(release.wait, 2.0)  # keep the worker busy
+
+    def _on_status(dev_id, feedback, elapsed):
+        polled.set()
+
+    assert device.update_status_async(_on_status) is True
+    assert device.update_status_async(_on_status) is False
+
+    release.set()
+    assert polled.wait(2.0)
+    device._cmd_queue.join()
+    assert device.update_status_async(_on_status) is True
+
+    device.stop_worker()
+
+
+class _FakeTransport:
+    def __init__(self):
+        self.frames = []
+
+    def generate_payload(self, command, data):
+        return (command, dict(data))
+
+    def send(self, payload):
+        self.frames.append(payload)
+
+
+def test_queued_control_commands_are_merged_into_one_frame():
+    device = TuyaDevice(
+        "dummy123",
+        mapping={
+            "20": {"code": "switch_led", "type": "Boolean", "values": {}},
+            "22": {"code": "bright_value_v2", "type": "Integer", "values": {"min": 10, "max": 1000}},
+        },
+    )
+    device.tuya_dev = _FakeTransport()
+    release = threading.Event()
+    device._enqueue(release.wait, 2.0)  # keep the worker busy
+
+    device.set_status_async({"switch_led": True})
+    device.set_status_async({"bright_value_v2": 10})
+    device.set_status_async({"bright_value_v2": 100})
+    release.set()
+    device._cmd_queue.join()
+
+    assert device.tuya_dev.frames == [(7, {"20": True, "22": 1000})]
+    device.stop_worker()
+
+
+def test_decoder_maps_transforms_and_recompiles():
+    mapping = {"20": {"code": "switch_led"}, "22": {"code": "bright_value_v2"},
+               "23": {"code": "temp_value_v2"}}
+    device = TuyaDevice("dummy123", mapping=mapping)
+    decoded, unknown = device.decode_dps({"20": True, "22": 505, "23": 1000, "101": 7})
+    assert decoded == {"switch_led": True, "bright_value_v2": 50, "temp_value_v2": 100, "101": 7}
+    assert unknown == ["101"]
+
+    device.mapping = {**mapping, "101": {"code": "101", "type": "Unknown", "values": {}}}
+    assert device.decode_dps({"101": 7}) == ({"101": 7}, [])
+    device.stop_worker()
@@ -0,0 +1,63 @@
+"""
+Ручной замер пропускной способности публикации статусов на локальном брокере.
+
+Публикует ``--count`` статусов в ``tuya2mqtt/devices/<id>/status`` через
+MqttModule и ждёт подтверждения всех сообщений брокером. Сравнение
+legacy (QoS 2 + retain) и политики из settings/config.toml:
+
+    python -m tools.mqtt_publish_throughput --host 127.0.0.1 --count 20000
+"""
+
+import argparse
+import json
+import logging
+import time
+
+from core.mqtt_client_wrapper import MqttModule
+from core.mqtt_publish_policy import PublishPolicyTable
+from core.settings_loader import load_settings
+
+
+def run(host: str, port: int, count: int, devices: int, policy: PublishPolicyTable | None) -> float:
+    logger = logging.getLogger("throughput")
+    mqtt_mod = MqttModule({}, "throughput", logger, host, port, publish_policy=policy)
+    mqtt_mod.mqtt_module_start(run_method="daemon")
+    client = mqtt_mod._client
+    infos = []
+    orig_publish = client.publish
+
+    def _tracking_publish(*args, **kwargs):
+        info = orig_publish(*args, **kwargs)
+        infos.append(info)
+        return info
+
+    client.publish = _tracking_publish
+    payload = json.dumps({"switch_1": True, "countdown_1": 0, "request_status_time": 0.2})
+    start = time.perf_counter()
+    for idx in range(count):
+        mqtt_mod.publish(f"tuya2mqtt/devices/bench{idx % devices:04d}/status", payload)
+    for info in infos:
+        info.wait_for_publish(timeout=30)
+    elapsed = time.perf_counter() - start
+    mqtt_mod.stop()
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=1883)
+    parser.add_argument("--count", type=int, default=20000)
+    parser.add_argument("--devices", type=int, default=300)
+    args = parser.parse_args()
+
+    configured = PublishPolicyTable.from_config(
+        load_settings().get("mqtt", {}).get("policy", {}), "tuya2mqtt"
+    )
+    for name, policy in (("legacy qos2+retain", None), ("configured policy", configured)):
+        elapsed = run(args.host, args.port, args.count, args.devices, policy)
+        print(f"{name:>20}: {args.count} msgs in {elapsed:.2f}s -> {args.count / elapsed:.0f} msg/s")
+
+
+if __name__ == "__main__":
+    main()